@@ -1,11 +1,22 @@
-from flask import Flask
+import atexit
+from flask import Flask, jsonify
 from flask_cors import CORS
-from inventory_api import inventory_api
+from inventory_api import inventory_api, change_listener
+import db
+import singleflight
 
 app = Flask(__name__)
 CORS(app)
 
 app.register_blueprint(inventory_api)
+atexit.register(db.close_pool)
+
+@app.route("/api/health", methods=["GET"])
+def health():
+    status = db.health_check()
+    status["coalescing"] = singleflight.stats()  # calls collapsed into an in-flight request
+    status["change_stream"] = change_listener.stats()  # shared LISTEN connection, SSE subscribers
+    return jsonify(status), (200 if status["ok"] else 503)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
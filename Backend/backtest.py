@@ -0,0 +1,300 @@
+# backtest.py
+# ---------------------------------------
+# Rolling-origin backtest of the demand forecast (models/demand_agent_xgb.json)
+# - cutoffs every --step days back from the end of the history; at each cutoff every item
+#   with a row on that date is rolled forward --horizon days with the same lockstep rollout
+#   forecast_item serves, and compared with the Quantity_Consumed recorded on those days
+# - methods: xgb (raw model), xgb_shaped (model + the sine / seasonal shaping of the withss
+#   server) and sine (the flat-history heuristic alone, as the baseline to beat)
+# - the history is prepared once as plain arrays in a temporary directory and memory-mapped
+#   read-only by every worker of a process pool (one cutoff per task)
+# - MAPE (days with consumption > 0) and WAPE per method, overall / per horizon day /
+#   per Item_Type / per item, plus wall-clock, CPU time and forecasts per second
+# --max-wape / --min-forecasts-per-s make the exit code a gate for model updates.
+# Usage: python3 backtest.py [--cutoffs 12] [--step 7] [--horizon 14] [--workers 4]
+#                            [--model models/demand_agent_xgb.json] [--json report.json]
+# ---------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+from forecasting import ItemStates, LAG_COLUMNS, flat_history_adjust, rollout
+from historical_store import frame_columns, load_historical
+from xgb_inference import load_model
+
+MODEL_PATH = "models/demand_agent_xgb.json"
+METHODS = ("xgb", "xgb_shaped", "sine")
+MIN_HISTORY_DAYS = len(LAG_COLUMNS)  # a cutoff needs a week of lags behind it
+# Per group sums: absolute error, actual, APE (actual > 0), APE count, forecast days
+ABS_ERROR, ACTUAL, APE, APE_COUNT, POINTS = range(5)
+
+_worker = {}
+
+
+# ----------------------------
+# Shared history (prepared once, memory-mapped by every worker)
+# ----------------------------
+def prepare_history(historical, out_dir):
+    """
+    History sorted by (item, day) as .npy arrays in ``out_dir``; returns (item IDs, item types,
+    first day, last day). Day numbers are days since the epoch; duplicate dates keep the last row.
+    """
+    columns = ["Inventory_ID", "Item_Type", "Date", "Quantity_Consumed", "Opening_Stock", "Closing_Stock",
+               "Quantity_Restocked", "Lead_Time_Days", "lead_time_days", "min_stock_limit",
+               "max_capacity"] + LAG_COLUMNS
+    frame = frame_columns(historical, columns)
+    frame = frame.assign(Inventory_ID=frame["Inventory_ID"].astype(str), Date=pd.to_datetime(frame["Date"]))
+    frame = frame[frame["Date"].notna()]
+    day = frame["Date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    codes, item_ids = pd.factorize(frame["Inventory_ID"], sort=True)
+
+    order = np.lexsort((np.arange(len(frame)), day, codes))
+    keep = np.ones(len(order), dtype=bool)  # last row of every (item, day)
+    keep[:-1] = (codes[order][1:] != codes[order][:-1]) | (day[order][1:] != day[order][:-1])
+    order = order[keep]
+
+    first_day, last_day = (int(day.min()), int(day.max())) if len(day) else (0, 0)
+    span = last_day - first_day + 1
+    np.save(os.path.join(out_dir, "key.npy"), codes[order].astype(np.int64) * span + (day[order] - first_day))
+    np.save(os.path.join(out_dir, "actual.npy"),
+            pd.to_numeric(frame["Quantity_Consumed"], errors="coerce").to_numpy(dtype=np.float64)[order])
+    np.save(os.path.join(out_dir, "features.npy"), forecasting.feature_matrix(frame.iloc[order]))
+
+    if "Item_Type" in frame:
+        types = frame.iloc[order].groupby(codes[order])["Item_Type"].last().astype(str)
+        item_types = types.reindex(range(len(item_ids)), fill_value="Unknown").tolist()
+    else:
+        item_types = ["Unknown"] * len(item_ids)
+    return [str(i) for i in item_ids], item_types, first_day, last_day
+
+
+def _init_worker(data_dir, model_path, item_ids, first_day, last_day, horizon):
+    _worker.update(key=np.load(os.path.join(data_dir, "key.npy"), mmap_mode="r"),
+                   actual=np.load(os.path.join(data_dir, "actual.npy"), mmap_mode="r"),
+                   features=np.load(os.path.join(data_dir, "features.npy"), mmap_mode="r"),
+                   model=load_model(model_path, forecasting.FEATURE_COLUMNS),
+                   item_ids=np.asarray(item_ids, dtype=object), first_day=first_day,
+                   span=last_day - first_day + 1, horizon=horizon)
+
+
+# ----------------------------
+# One cutoff (runs in a worker)
+# ----------------------------
+def sine_rollout(states, periods):
+    """The flat-history heuristic on its own: what the shaped forecast emits for items without lags."""
+    flat = ItemStates(states.item_ids, states.found, states.last_date, states.closing_stock,
+                      states.quantity_restocked, states.lead_time_days, states.lead_time_days_alt,
+                      states.min_stock_limit, states.max_capacity, np.zeros_like(states.lags))
+    consumption = np.zeros((len(states), periods), dtype=np.float64)
+    for day in range(periods):
+        consumption[:, day] = flat_history_adjust(day, np.zeros(len(states)), consumption[:, :day], flat)
+    return consumption
+
+
+def forecast_method(method, model, states, periods):
+    if method == "sine":
+        return sine_rollout(states, periods)
+    return rollout(model, states, periods, adjust=forecasting.VARIANTS[method].get("adjust"))[0]
+
+
+def _error_sums(forecast, actual):
+    """Per-row and per-column error sums (rows x 5, columns x 5) over the days that have actuals."""
+    known = ~np.isnan(actual)
+    actual = np.where(known, actual, 0.0)
+    abs_error = np.where(known, np.abs(forecast - actual), 0.0)
+    positive = known & (actual > 0)
+    ape = np.where(positive, abs_error / np.where(positive, actual, 1.0), 0.0)
+    parts = (abs_error, actual, ape, positive, known)
+    return (np.column_stack([p.sum(axis=1) for p in parts]),
+            np.column_stack([p.sum(axis=0) for p in parts]).astype(np.float64))
+
+
+def evaluate_cutoff(cutoff, methods=METHODS):
+    """Forecast every item with a row on ``cutoff`` (day number); error sums per method."""
+    started = time.process_time()
+    w = _worker
+    key, horizon = w["key"], w["horizon"]
+    base = np.arange(len(w["item_ids"]), dtype=np.int64) * w["span"] + (cutoff - w["first_day"])
+
+    def rows_at(target):
+        pos = np.minimum(np.searchsorted(key, target), len(key) - 1)
+        return pos, key[pos] == target
+
+    pos, has_state = rows_at(base)
+    actual = np.full((len(base), horizon), np.nan)
+    for h in range(horizon):
+        # Clamp at the history end: a later day would alias the next item's first rows
+        if cutoff + h + 1 - w["first_day"] < w["span"]:
+            day_pos, found = rows_at(base + h + 1)
+            actual[found, h] = w["actual"][day_pos[found]]
+    items = np.flatnonzero(has_state & ~np.isnan(actual).all(axis=1))
+
+    X = np.asarray(w["features"][pos[items]])
+    states = ItemStates(w["item_ids"][items].tolist(), np.ones(len(items), dtype=bool),
+                        np.full(len(items), np.datetime64(int(cutoff), "D")).astype("datetime64[ns]"),
+                        X[:, 1], X[:, 2], X[:, 3], X[:, 4], X[:, 5], X[:, 6], X[:, 9:])
+    results = {}
+    for method in methods:
+        by_item, by_horizon = _error_sums(forecast_method(method, w["model"], states, horizon), actual[items])
+        results[method] = {"by_item": by_item, "by_horizon": by_horizon}
+    return {"cutoff": int(cutoff), "items": items, "results": results,
+            "forecasts": len(items) * len(methods), "cpu_s": time.process_time() - started}
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def cutoff_days(first_day, last_day, cutoffs, step, horizon):
+    """Most recent cutoff leaves ``horizon`` days of actuals; earlier ones every ``step`` days."""
+    latest = last_day - horizon
+    days = [latest - i * step for i in range(cutoffs)]
+    return sorted(d for d in days if d - first_day >= MIN_HISTORY_DAYS)
+
+
+def _metrics(sums):
+    sums = np.atleast_2d(sums)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mape = np.where(sums[:, APE_COUNT] > 0, 100 * sums[:, APE] / sums[:, APE_COUNT], np.nan)
+        wape = np.where(sums[:, ACTUAL] > 0, 100 * sums[:, ABS_ERROR] / sums[:, ACTUAL], np.nan)
+    return [{"MAPE": None if np.isnan(m) else round(float(m), 2),
+             "WAPE": None if np.isnan(wp) else round(float(wp), 2),
+             "Forecast_Days": int(n)} for m, wp, n in zip(mape, wape, sums[:, POINTS])]
+
+
+def run_backtest(historical, model_path=MODEL_PATH, cutoffs=12, step=7, horizon=14, workers=None,
+                 methods=METHODS, worst=20):
+    """Backtest report (dict): metrics per method overall / horizon / item type / item, and throughput."""
+    started = time.perf_counter()
+    workers = max(1, workers or os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory(prefix="backtest_") as data_dir:
+        item_ids, item_types, first_day, last_day = prepare_history(historical, data_dir)
+        days = cutoff_days(first_day, last_day, cutoffs, step, horizon)
+        prepare_s = time.perf_counter() - started
+
+        n_items = len(item_ids)
+        by_item = {m: np.zeros((n_items, 5)) for m in methods}
+        by_horizon = {m: np.zeros((horizon, 5)) for m in methods}
+        per_cutoff, forecasts, cpu_s = [], 0, 0.0
+        initargs = (data_dir, model_path, item_ids, first_day, last_day, horizon)
+        evaluate_started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            for part in pool.map(evaluate_cutoff, days, [methods] * len(days)):
+                for m in methods:
+                    by_item[m][part["items"]] += part["results"][m]["by_item"]
+                    by_horizon[m] += part["results"][m]["by_horizon"]
+                forecasts += part["forecasts"]
+                cpu_s += part["cpu_s"]
+                per_cutoff.append({"Cutoff": str(np.datetime64(part["cutoff"], "D")), "Items": len(part["items"]),
+                                   **{m: _metrics(part["results"][m]["by_horizon"].sum(axis=0))[0]
+                                      for m in methods}})
+        evaluate_s = time.perf_counter() - evaluate_started
+
+    type_names, type_codes = np.unique(np.asarray(item_types, dtype=object).astype(str), return_inverse=True)
+    by_type = {m: np.stack([np.bincount(type_codes, weights=by_item[m][:, c], minlength=len(type_names))
+                            for c in range(5)], axis=1) for m in methods}
+    evaluated = by_item[methods[0]][:, POINTS] > 0
+    item_metrics = {m: _metrics(by_item[m]) for m in methods}
+    ranked = np.flatnonzero(evaluated)
+    wape_first = np.array([item_metrics[methods[0]][i]["WAPE"] or 0.0 for i in ranked])
+    ranked = ranked[np.argsort(-wape_first, kind="stable")]
+
+    total_s = time.perf_counter() - started
+    return {"model": model_path,
+            "methods": list(methods),
+            "cutoffs": per_cutoff,
+            "horizon_days": horizon,
+            "items_evaluated": int(evaluated.sum()),
+            "overall": {m: _metrics(by_horizon[m].sum(axis=0))[0] for m in methods},
+            "by_horizon": {m: dict(zip(range(1, horizon + 1), _metrics(by_horizon[m]))) for m in methods},
+            "by_item_type": {m: dict(zip(type_names.tolist(), _metrics(by_type[m]))) for m in methods},
+            "worst_items": [{"Inventory_ID": item_ids[i], "Item_Type": item_types[i],
+                             **{m: item_metrics[m][i] for m in methods}} for i in ranked[:worst]],
+            "by_item": {item_ids[i]: {m: item_metrics[m][i] for m in methods} for i in np.flatnonzero(evaluated)},
+            "throughput": {"workers": workers,
+                           "prepare_s": round(prepare_s, 3),
+                           "evaluate_s": round(evaluate_s, 3),
+                           "total_s": round(total_s, 3),
+                           "cpu_s": round(cpu_s, 3),
+                           "forecasts": forecasts,
+                           "forecasts_per_s": round(forecasts / evaluate_s, 1) if evaluate_s else None,
+                           "forecast_days_per_s": round(forecasts * horizon / evaluate_s, 1) if evaluate_s else None}}
+
+
+def print_report(report):
+    methods = report["methods"]
+    t = report["throughput"]
+    print(f"📊 {len(report['cutoffs'])} cutoffs x {report['horizon_days']} days, "
+          f"{report['items_evaluated']} items, model {report['model']}")
+    print(f"{'':14}" + "".join(f"{m:>24}" for m in methods))
+    print(f"{'':14}" + "".join(f"{'MAPE %':>12}{'WAPE %':>12}" for _ in methods))
+
+    def line(label, metrics):
+        cells = "".join(f"{_fmt(metrics[m]['MAPE']):>12}{_fmt(metrics[m]['WAPE']):>12}" for m in methods)
+        print(f"{label:<14}{cells}")
+
+    line("overall", report["overall"])
+    for day in range(1, report["horizon_days"] + 1):
+        line(f"day {day}", {m: report["by_horizon"][m][day] for m in methods})
+    for item_type in report["by_item_type"][methods[0]]:
+        line(item_type[:14], {m: report["by_item_type"][m][item_type] for m in methods})
+    if report["worst_items"]:
+        print(f"worst items by {methods[0]} WAPE:")
+        for item in report["worst_items"][:5]:
+            line(f"  {item['Inventory_ID']}"[:14], item)
+    print(f"⏱️ {t['total_s']}s total ({t['prepare_s']}s prepare, {t['evaluate_s']}s on {t['workers']} workers, "
+          f"{t['cpu_s']}s CPU): {t['forecasts_per_s']} forecasts/s, {t['forecast_days_per_s']} forecast-days/s")
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def check_gates(report, method, max_wape=None, min_forecasts_per_s=None):
+    """Failed gate messages (empty when every gate passes)."""
+    failures = []
+    wape = report["overall"][method]["WAPE"]
+    if max_wape is not None and (wape is None or wape > max_wape):
+        failures.append(f"{method} WAPE {wape}% > {max_wape}%")
+    rate = report["throughput"]["forecasts_per_s"]
+    if min_forecasts_per_s is not None and (rate is None or rate < min_forecasts_per_s):
+        failures.append(f"{rate} forecasts/s < {min_forecasts_per_s}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the demand forecast")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--cutoffs", type=int, default=12, help="number of forecast origins")
+    parser.add_argument("--step", type=int, default=7, help="days between origins")
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = one per CPU)")
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--json", help="write the full report (incl. per-item metrics) here")
+    parser.add_argument("--max-wape", type=float, help="fail when the gated method's overall WAPE is higher")
+    parser.add_argument("--min-forecasts-per-s", type=float, help="fail when throughput is lower")
+    parser.add_argument("--gate-method", default="xgb", choices=METHODS)
+    args = parser.parse_args()
+
+    report = run_backtest(load_historical(), args.model, args.cutoffs, args.step, args.horizon,
+                          args.workers, tuple(args.methods))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f)
+        print(f"✅ report written to {args.json}")
+    if (args.max_wape is not None or args.min_forecasts_per_s is not None) \
+            and args.gate_method not in report["overall"]:
+        sys.exit(f"❌ gate method {args.gate_method} was not backtested")
+    failures = check_gates(report, args.gate_method, args.max_wape, args.min_forecasts_per_s)
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
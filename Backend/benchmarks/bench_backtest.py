@@ -0,0 +1,52 @@
+# bench_backtest.py
+# ---------------------------------------
+# Rolling-origin backtest (backtest.py) on synthetic history: wall-clock and throughput
+# per process-pool size, and a check that every pool size reports identical metrics
+# Usage: python3 benchmarks/bench_backtest.py --items 5000 --cutoffs 8 --workers 1 2 4
+# ---------------------------------------
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backtest
+from bench_historical_store import synthetic_history
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "models", "demand_agent_xgb.json")
+
+
+def main(args):
+    history = synthetic_history(args.items, args.days, np.random.default_rng(args.seed))
+    print(f"synthetic history: {len(history):,} rows, {args.items:,} items, {os.cpu_count()} CPUs")
+
+    reference, baseline_s = None, None
+    for workers in args.workers:
+        report = backtest.run_backtest(history, MODEL_PATH, cutoffs=args.cutoffs, step=args.step,
+                                       horizon=args.horizon, workers=workers)
+        t = report["throughput"]
+        baseline_s = baseline_s or t["evaluate_s"]
+        print(f"workers={workers:<3} evaluate {t['evaluate_s']:.2f}s (x{baseline_s / t['evaluate_s']:.2f}), "
+              f"{t['forecasts_per_s']:,.0f} forecasts/s, {t['forecast_days_per_s']:,.0f} forecast-days/s, "
+              f"prepare {t['prepare_s']:.2f}s")
+        metrics = (report["overall"], report["by_horizon"], report["by_item_type"], report["by_item"])
+        if reference is None:
+            reference = metrics
+        assert metrics == reference, f"workers={workers} reports different metrics"
+    print("overall: " + ", ".join(f"{m} WAPE {v['WAPE']}%" for m, v in reference[0].items()))
+    print(f"verify: identical metrics for workers {args.workers}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=120, help="history days per item")
+    parser.add_argument("--cutoffs", type=int, default=8)
+    parser.add_argument("--step", type=int, default=7)
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+# bench_fuzzy_match.py
+# ---------------------------------------
+# Latency / agreement benchmark: FuzzyNameIndex vs the previous full
+# process.extractOne(query, names, scorer=fuzz.token_sort_ratio) scan
+# Synthetic item names plus misspelled / reordered queries.
+# Usage: python3 benchmarks/bench_fuzzy_match.py --sizes 1000 10000 50000
+# ---------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from thefuzz import fuzz, process
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_index import FuzzyNameIndex
+
+WORDS = ["surgical", "gloves", "mask", "syringe", "bandage", "gauze", "saline", "iv", "cannula", "catheter",
+         "paracetamol", "ibuprofen", "amoxicillin", "insulin", "vial", "tablet", "capsule", "sterile", "nitrile",
+         "latex", "disposable", "cotton", "roll", "tape", "alcohol", "swab", "needle", "scalpel", "blade", "suture",
+         "oxygen", "tubing", "adult", "pediatric", "small", "medium", "large", "500mg", "250mg", "10ml", "5ml",
+         "pack", "box", "kit", "thermometer", "digital", "monitor", "electrode", "gown", "cap"]
+
+
+def synthetic_names(n, rng):
+    names = set()
+    while len(names) < n:
+        words = rng.choice(WORDS, rng.integers(2, 5), replace=False)
+        names.add(" ".join(words) + f" {rng.integers(1, 1000)}")
+    return sorted(names)
+
+
+def misspell(name, rng):
+    chars = list(name)
+    for _ in range(rng.integers(1, 3)):
+        i = rng.integers(0, len(chars))
+        op = rng.integers(0, 3)
+        if op == 0:
+            chars.pop(i)
+        elif op == 1:
+            chars.insert(i, chr(rng.integers(97, 123)))
+        else:
+            chars[i] = chr(rng.integers(97, 123))
+    words = "".join(chars).split()
+    if rng.random() < 0.3:
+        rng.shuffle(words)
+    return " ".join(words)
+
+
+def timed(fn, queries):
+    started = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def run(n, n_queries, threshold, seed):
+    rng = np.random.default_rng(seed)
+    names = synthetic_names(n, rng)
+    queries = [misspell(names[i], rng) for i in rng.choice(n, n_queries, replace=False)]
+
+    t0 = time.perf_counter()
+    index = FuzzyNameIndex(names)
+    build_s = time.perf_counter() - t0
+
+    def accepted(match):
+        return match[0] if match and match[1] >= threshold else None
+
+    full, full_ms = timed(lambda q: accepted(process.extractOne(q, names, scorer=fuzz.token_sort_ratio)), queries)
+    pruned, index_ms = timed(lambda q: accepted(index.extract_one(q)), queries)
+
+    agree = np.mean([a == b for a, b in zip(full, pruned)])
+    print(f"n={n:>6}  build {build_s:5.2f}s  |  full scan {full_ms:7.2f} ms  index {index_ms:6.2f} ms  "
+          f"({full_ms / max(index_ms, 1e-9):5.1f}x)  |  agreement @{threshold} {agree:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--threshold", type=int, default=55)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.queries, args.threshold, args.seed)
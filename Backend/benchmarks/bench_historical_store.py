@@ -0,0 +1,80 @@
+# bench_historical_store.py
+# ---------------------------------------
+# Startup benchmark: pd.read_csv + latest-row reduction (previous MCP startup)
+# vs opening the memory-mapped store from historical_store.py
+# Synthetic daily history (one row per item per day) with the forecasting columns.
+# Usage: python3 benchmarks/bench_historical_store.py --items 1000 5000 --days 365
+# ---------------------------------------
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from historical_store import HistoricalStore, convert_csv, frame_latest_rows
+
+
+def synthetic_history(n_items, days, rng):
+    n = n_items * days
+    item = np.repeat(np.arange(n_items), days)
+    consumed = rng.uniform(0, 20, n).round(2)
+    df = pd.DataFrame({
+        "Date": np.tile(pd.date_range("2023-01-01", periods=days).to_numpy(), n_items),
+        "Inventory_ID": [f"INV{i:06d}" for i in item],
+        "Item_Name": [f"item {i} {'syringe' if i % 3 else 'glove'}" for i in item],
+        "Item_Type": np.array(["Medication", "Consumable", "Equipment"])[item % 3],
+        "Opening_Stock": rng.integers(0, 600, n).astype(float),
+        "Quantity_Consumed": consumed,
+        "Quantity_Restocked": rng.integers(0, 3, n) * 10.0,
+        "Closing_Stock": rng.integers(0, 600, n).astype(float),
+        "lead_time_days": rng.integers(1, 10, n).astype(float),
+        "min_stock_limit": rng.integers(5, 60, n).astype(float),
+        "max_capacity": 600.0,
+    })
+    for k in range(1, 8):
+        df[f"lag_{k}"] = np.roll(consumed, k)
+    return df.sample(frac=1, random_state=0)  # CSV rows are not sorted by date
+
+
+def run(n_items, days, seed, workdir):
+    rng = np.random.default_rng(seed)
+    csv_path = os.path.join(workdir, f"hist_{n_items}.csv")
+    store_path = os.path.join(workdir, f"hist_{n_items}.store")
+    synthetic_history(n_items, days, rng).to_csv(csv_path, index=False)
+
+    t0 = time.perf_counter()
+    convert_csv(csv_path, store_path)
+    convert_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    df = pd.read_csv(csv_path, parse_dates=["Date"])
+    df["Inventory_ID"] = df["Inventory_ID"].astype(str)
+    expected = frame_latest_rows(df)
+    csv_s = time.perf_counter() - t0
+    frame_mb = df.memory_usage(deep=True).sum() / 1e6
+
+    t0 = time.perf_counter()
+    store = HistoricalStore(store_path)
+    latest = store.latest_rows()
+    store_s = time.perf_counter() - t0
+
+    same = latest.equals(expected)
+    print(f"items={n_items:>6} rows={len(df):>8}  |  csv+latest {csv_s:6.2f}s ({frame_mb:7.1f} MB frame)  "
+          f"store+latest {store_s:6.3f}s ({store.nbytes() / 1e6:6.1f} MB mapped)  "
+          f"({csv_s / max(store_s, 1e-9):5.1f}x)  |  convert {convert_s:5.2f}s  identical={same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[1_000, 5_000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_items in args.items:
+            run(n_items, args.days, args.seed, workdir)
@@ -0,0 +1,168 @@
+# bench_mcp_concurrency.py
+# ---------------------------------------
+# Load test: throughput and latency of MCP tool calls as concurrent agent sessions grow
+# - simulated (default): a predict_demand-shaped call (fuzzy resolve, DB round trips,
+#   XGBoost forecast) served the old way (sync tool body on the event loop) and the new
+#   way (async tool on the tool_pools.py worker pools), no server or database needed
+# - live: --url http://localhost:8000/sse drives a running MCP server with one
+#   fastmcp Client per session
+# Usage: python3 benchmarks/bench_mcp_concurrency.py --sessions 1 4 16 32 [--db-ms 5]
+#        python3 benchmarks/bench_mcp_concurrency.py --url http://localhost:8000/sse --tool check_stock
+# ---------------------------------------
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+import tool_pools
+from bench_historical_store import synthetic_history
+from fuzzy_index import FuzzyNameIndex
+from item_state_index import ItemStateIndex
+from xgb_inference import load_model
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "models", "demand_agent_xgb.json")
+
+
+def build_tool(n_items, db_ms, seed):
+    history = synthetic_history(n_items, 30, np.random.default_rng(seed))
+    states = ItemStateIndex.from_frame(history)
+    names = history.drop_duplicates("Inventory_ID").set_index("Item_Name")["Inventory_ID"].to_dict()
+    fuzzy = FuzzyNameIndex(list(names))
+    model = load_model(MODEL_PATH, forecasting.FEATURE_COLUMNS)
+
+    def resolve(query):
+        match = fuzzy.extract_one(query)
+        return names[match[0]] if match else None
+
+    def query_db():
+        time.sleep(db_ms / 1000)  # stands in for a psycopg2 round trip (socket wait, GIL released)
+
+    def predict(query):
+        item_id = resolve(query)
+        query_db()  # data versions
+        return forecasting.forecast_many(model, states, [item_id], 7)[item_id]
+
+    async def predict_sync(query):
+        # FastMCP calls a sync tool directly on the event loop
+        return predict(query)
+
+    limiter = tool_pools.ToolLimiter(tool_pools.TOOL_CONCURRENCY)
+
+    @limiter
+    async def predict_async(query):
+        item_id = await tool_pools.run_cpu(resolve, query)
+        await tool_pools.run_db(query_db)
+        return await tool_pools.run_cpu(lambda: forecasting.forecast_many(model, states, [item_id], 7)[item_id])
+
+    queries = [f"{name[:-2]} 7 days" for name in list(names)[:200]]
+    return predict_sync, predict_async, queries, limiter
+
+
+async def loop_stalls(stop, interval=0.005):
+    """Longest time the event loop could not run other sessions' work (the SSE-stall symptom)."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+
+async def drive(call, sessions, calls_per_session, queries):
+    latencies = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(loop_stalls(stop))
+    await asyncio.sleep(0)
+
+    async def session(s):
+        for c in range(calls_per_session):
+            started = time.perf_counter()
+            await call(queries[(s * calls_per_session + c) % len(queries)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(s) for s in range(sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lat = np.array(latencies) * 1000
+    return {"calls_per_s": len(lat) / elapsed, "p50_ms": np.percentile(lat, 50), "p95_ms": np.percentile(lat, 95),
+            "loop_stall_ms": await ticker}
+
+
+def live_call(url, tool, argument):
+    from fastmcp import Client
+
+    async def session_call(client, query):
+        return await client.call_tool(tool, {argument: query})
+
+    async def run(sessions, calls_per_session, queries):
+        clients = [Client(url) for _ in range(sessions)]
+        for client in clients:
+            await client.__aenter__()
+        try:
+            latencies = []
+
+            async def session(s):
+                for c in range(calls_per_session):
+                    started = time.perf_counter()
+                    await session_call(clients[s], queries[(s * calls_per_session + c) % len(queries)])
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(session(s) for s in range(sessions)))
+            elapsed = time.perf_counter() - started
+        finally:
+            for client in clients:
+                await client.__aexit__(None, None, None)
+        lat = np.array(latencies) * 1000
+        return {"calls_per_s": len(lat) / elapsed, "p50_ms": np.percentile(lat, 50), "p95_ms": np.percentile(lat, 95),
+                "loop_stall_ms": float("nan")}  # measured server-side, not here
+
+    return run
+
+
+def report(label, sessions, result):
+    print(f"{label:>6} {sessions:>9} {result['calls_per_s']:>10.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+          f"{result['loop_stall_ms']:>14.1f}")
+
+
+async def main(args):
+    print(f"{'mode':>6} {'sessions':>9} {'calls/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'loop stall ms':>14}")
+    if args.url:
+        run = live_call(args.url, args.tool, args.argument)
+        for sessions in args.sessions:
+            report("live", sessions, await run(sessions, args.calls, args.queries))
+        return
+
+    predict_sync, predict_async, queries, limiter = build_tool(args.items, args.db_ms, args.seed)
+    await predict_async(queries[0])  # warm the pools
+    for sessions in args.sessions:
+        report("sync", sessions, await drive(predict_sync, sessions, args.calls, queries))
+        report("async", sessions, await drive(predict_async, sessions, args.calls, queries))
+    print(f"(cpu workers={tool_pools.cpu_pool.workers}, db workers={tool_pools.db_pool.workers}, "
+          f"tool limit={tool_pools.TOOL_CONCURRENCY}, peak in flight="
+          f"{limiter.stats()['predict_async']['peak_in_flight']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--calls", type=int, default=20, help="sequential calls per session")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--db-ms", type=float, default=5.0, help="simulated latency per DB round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", default=None, help="live MCP server, e.g. http://localhost:8000/sse")
+    parser.add_argument("--tool", default="predict_demand")
+    parser.add_argument("--argument", default="inventory_id_or_name", help="the tool's query parameter")
+    parser.add_argument("--queries", nargs="+", default=["Syringes 7 days", "Bandages", "Nitrile gloves"])
+    args = parser.parse_args()
+    asyncio.run(main(args))
+    tool_pools.cpu_pool.shutdown()
+    tool_pools.db_pool.shutdown()
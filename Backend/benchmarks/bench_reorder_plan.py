@@ -0,0 +1,117 @@
+# bench_reorder_plan.py
+# ---------------------------------------
+# Catalogue-wide reorder plan (reorder_plan.py) on synthetic history and synthetic
+# REORDER_QUERY rows (no database needed): forecast, vectorized policy and per-vendor
+# purchase-order grouping; --verify checks order quantities and vendor totals against
+# a per-item Python loop
+# Usage: python3 benchmarks/bench_reorder_plan.py --items 100000 [--verify]
+# ---------------------------------------
+
+import argparse
+import math
+import os
+import sys
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+import reorder_plan
+from bench_historical_store import synthetic_history
+from item_state_index import ItemStateIndex
+from xgb_inference import load_model
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "models", "demand_agent_xgb.json")
+
+
+def synthetic_rows(item_ids, vendors, rng):
+    """Rows in REORDER_QUERY column order; a few items without vendor, capacity or lead time."""
+    rows = []
+    for i, item_id in enumerate(item_ids):
+        vendor = None if i % 97 == 0 else f"V{int(rng.integers(vendors)):04d}"
+        capacity = None if i % 53 == 0 else float(rng.integers(200, 800))
+        lead = None if i % 61 == 0 else int(rng.integers(1, 22))
+        rows.append((item_id, f"Item {i}", "Medication", vendor, vendor and f"Vendor {vendor}", None, "North", 4,
+                     float(rng.uniform(0, 400)), float(rng.choice([0, 0, 50])), float(rng.integers(5, 60)),
+                     capacity, lead, float(rng.uniform(0, 15)), float(rng.uniform(1, 50))))
+    return rows
+
+
+def loop_reference(rows, daily, lags, modeled, service_level, review_days):
+    """Per-item policy, written out directly: {inventory_id: quantity}, {vendor: (qty, cost)}."""
+    z = NormalDist().inv_cdf(service_level)
+    horizon = daily.shape[1]
+    quantities, vendors = {}, {}
+    for i, row in enumerate(rows):
+        lead = min(max(int(row[12] if row[12] is not None else reorder_plan.DEFAULT_LEAD_DAYS), 1),
+                   reorder_plan.MAX_LEAD_DAYS)
+        tail = sum(daily[i, -reorder_plan.TAIL_DAYS:]) / min(reorder_plan.TAIL_DAYS, horizon)
+        rate = [daily[i, d] if d < horizon else tail for d in range(lead + review_days)]
+        std = float(np.std(lags[i], ddof=1)) if modeled[i] else math.sqrt(row[13])
+        reorder_point = max(sum(rate[:lead]) + z * std * math.sqrt(lead), row[10])
+        position = row[8] + row[9]
+        if position > reorder_point:
+            continue
+        up_to = reorder_point + sum(rate[lead:])
+        if row[11] is not None:
+            up_to = min(up_to, row[11])
+        quantity = math.ceil(max(up_to - position, 0.0))
+        if quantity > 0:
+            quantities[row[0]] = quantity
+            qty, cost = vendors.get(row[3], (0, 0.0))
+            vendors[row[3]] = (qty + quantity, cost + quantity * row[14])
+    return quantities, vendors
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    t0 = time.perf_counter()
+    history = synthetic_history(args.items, args.days, rng)
+    states = ItemStateIndex.from_frame(history)
+    model = load_model(MODEL_PATH, forecasting.FEATURE_COLUMNS)
+    ids = states.ids()
+    # ~5% of the catalogue has no history (falls back to avg_daily_consumption)
+    rows = synthetic_rows(ids + [f"NEW{i}" for i in range(args.items // 20)], args.vendors, rng)
+    reorder_plan.fetch_reorder_inputs = lambda *_: rows
+    print(f"synthetic inputs: {len(history):,} history rows, {len(rows):,} items ({time.perf_counter() - t0:.1f}s)")
+
+    t0 = time.perf_counter()
+    plan = reorder_plan.reorder_plan(model, states, service_level=args.service_level,
+                                     review_days=args.review_days, limit=args.vendors + 1)
+    total_s = time.perf_counter() - t0
+    print(f"reorder plan:     {total_s:.2f}s for {plan['scanned']:,} items -> {plan['items_to_order']:,} lines, "
+          f"{plan['vendors']} vendor drafts, total {plan['total_cost']:,.2f}")
+    print(f"stages (ms):      {plan['timings_ms']}")
+
+    if args.verify:
+        horizon = int(min(max(r[12] or reorder_plan.DEFAULT_LEAD_DAYS for r in rows) + args.review_days,
+                          reorder_plan.MAX_FORECAST_DAYS))
+        item_ids = [r[0] for r in rows]
+        item_states = states.take(item_ids)
+        daily, modeled = forecasting.consumption_matrix(model, states, item_ids, horizon, states=item_states)
+        avg_daily = np.array([r[13] for r in rows])
+        daily[~modeled] = avg_daily[~modeled, None]
+        quantities, vendors = loop_reference(rows, daily, item_states.lags, modeled,
+                                             plan["service_level"], args.review_days)
+        lines = {line["Inventory_ID"]: line["Order_Quantity"]
+                 for po in plan["purchase_orders"] for line in po["Lines"]}
+        assert lines == quantities, f"{len(set(lines.items()) ^ set(quantities.items()))} order lines differ"
+        for po in plan["purchase_orders"]:
+            qty, cost = vendors[po["Vendor_ID"]]
+            assert po["Total_Quantity"] == qty and abs(po["Total_Cost"] - cost) < 0.01, po["Vendor_ID"]
+        print(f"verify: {len(lines):,} order lines and {len(vendors)} vendor totals match the loop reference")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=21, help="history days per item")
+    parser.add_argument("--vendors", type=int, default=200)
+    parser.add_argument("--service-level", type=float, default=0.95)
+    parser.add_argument("--review-days", type=int, default=7)
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
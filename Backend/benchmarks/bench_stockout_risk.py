@@ -0,0 +1,99 @@
+# bench_stockout_risk.py
+# ---------------------------------------
+# Whole-catalogue Monte Carlo stockout risk (risk_simulation.py) on synthetic history:
+# residual pool build (one-off, at load), point forecast, and the vectorized
+# items x paths x days simulation; --verify checks the probabilities against a
+# per-item Python loop on a sample of items
+# Usage: python3 benchmarks/bench_stockout_risk.py --items 20000 --paths 1000 [--verify]
+# ---------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+from bench_historical_store import synthetic_history
+from item_state_index import ItemStateIndex
+from risk_simulation import ResidualPool, simulate_stockouts
+from xgb_inference import load_model
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "models", "demand_agent_xgb.json")
+
+
+def loop_reference(mean, current, min_limit, lead_days, offsets, counts, residuals, paths, rng):
+    """Straightforward per-item / per-path loop with its own random draws."""
+    p_out = np.zeros(len(mean))
+    for i in range(len(mean)):
+        hits = 0
+        for _ in range(paths):
+            stock = current[i]
+            for day in range(lead_days[i]):
+                r = residuals[offsets[i] + int(rng.random() * counts[i])]
+                stock -= max(0.0, mean[i, day] + r)
+                if stock <= 0:
+                    hits += 1
+                    break
+        p_out[i] = hits / paths
+    return p_out
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    t0 = time.perf_counter()
+    history = synthetic_history(args.items, args.days, rng)
+    states = ItemStateIndex.from_frame(history)
+    model = load_model(MODEL_PATH, forecasting.FEATURE_COLUMNS)
+    print(f"synthetic history: {len(history):,} rows, {args.items:,} items ({time.perf_counter() - t0:.1f}s)")
+
+    t0 = time.perf_counter()
+    pool = ResidualPool.from_history(model, history)
+    print(f"residual pool:     {pool.stats()} in {time.perf_counter() - t0:.2f}s (once, at load)")
+
+    ids = states.ids()
+    lead_days = rng.integers(1, args.max_lead + 1, len(ids))
+    item_states = states.take(ids)
+    current = item_states.closing_stock
+    min_limit = item_states.min_stock_limit
+
+    t0 = time.perf_counter()
+    mean, _ = forecasting.consumption_matrix(model, states, ids, int(lead_days.max()))
+    forecast_s = time.perf_counter() - t0
+
+    offsets, counts, _ = pool.segments(ids)
+    t0 = time.perf_counter()
+    p_out, expected_day, p_below = simulate_stockouts(mean, current, min_limit, lead_days, offsets, counts,
+                                                      pool.residuals, paths=args.paths, seed=args.seed)
+    simulate_s = time.perf_counter() - t0
+    cells = int((lead_days * args.paths).sum())
+    print(f"point forecast:    {forecast_s:.2f}s ({int(lead_days.max())} days)")
+    print(f"simulation:        {simulate_s:.2f}s for {len(ids):,} items x {args.paths} paths "
+          f"({cells / simulate_s / 1e6:.0f}M path-days/s)")
+    print(f"total per call:    {forecast_s + simulate_s:.2f}s; "
+          f"items with P(stockout) >= 5%: {(p_out >= 0.05).sum():,}")
+
+    if args.verify:
+        sample = rng.choice(len(ids), size=min(50, len(ids)), replace=False)
+        ref = loop_reference(mean[sample], current[sample], min_limit[sample], lead_days[sample],
+                             offsets[sample], counts[sample], pool.residuals, args.paths, rng)
+        # Independent draws: agreement within Monte Carlo error (4 standard errors)
+        tolerance = 4 * np.sqrt(np.maximum(ref * (1 - ref), 1.0 / args.paths) / args.paths) * np.sqrt(2)
+        worst = np.abs(ref - p_out[sample]) - tolerance
+        assert (worst <= 0).all(), f"probabilities disagree beyond Monte Carlo error: {worst.max():.4f}"
+        print(f"verify: {len(sample)} items match the loop reference within Monte Carlo error "
+              f"(max |diff| {np.abs(ref - p_out[sample]).max():.4f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=120, help="history days per item")
+    parser.add_argument("--paths", type=int, default=1000)
+    parser.add_argument("--max-lead", type=int, default=14, help="lead times drawn from 1..max-lead days")
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
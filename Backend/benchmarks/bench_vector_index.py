@@ -0,0 +1,71 @@
+# bench_vector_index.py
+# ---------------------------------------
+# Recall / latency benchmark: IVFIndex vs the exact FlatIndex baseline
+# (and the old per-query brute force that recomputed every row norm)
+# Synthetic clustered 384-dim vectors stand in for item-name embeddings.
+# Usage: python3 benchmarks/bench_vector_index.py --sizes 10000 100000 300000 --k 5
+# ---------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_index import FlatIndex, IVFIndex
+
+
+def clustered_vectors(n, dim, n_clusters, rng):
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    return centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def brute_force(matrix, query):
+    # Previous semantic_search: norms recomputed on every call, argmax only
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return int(np.argmax(np.dot(matrix, query) / (norms + 1e-10)))
+
+
+def timed(fn, queries):
+    started = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def run(n, dim, k, n_queries, seed):
+    rng = np.random.default_rng(seed)
+    matrix = clustered_vectors(n, dim, max(16, n // 200), rng)
+    queries = matrix[rng.choice(n, n_queries, replace=False)] + 0.2 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    ids = [f"INV{i:07d}" for i in range(n)]
+
+    t0 = time.perf_counter()
+    flat = FlatIndex(ids, matrix)
+    t1 = time.perf_counter()
+    ivf = IVFIndex(ids, matrix)
+    t2 = time.perf_counter()
+
+    _, brute_ms = timed(lambda q: brute_force(matrix, q), queries[:min(50, n_queries)])
+    exact, flat_ms = timed(lambda q: flat.search(q, k), queries)
+    approx, ivf_ms = timed(lambda q: ivf.search(q, k), queries)
+
+    recall = np.mean([len({i for i, _ in a} & {i for i, _ in e}) / len(e) for a, e in zip(approx, exact)])
+    top1 = np.mean([a[0][0] == e[0][0] for a, e in zip(approx, exact)])
+    print(f"n={n:>7}  build flat {t1 - t0:6.2f}s ivf {t2 - t1:6.2f}s "
+          f"(lists={ivf.n_lists}, probe={ivf.n_probe})  |  "
+          f"brute {brute_ms:7.2f} ms  flat {flat_ms:7.2f} ms  ivf {ivf_ms:6.2f} ms  |  "
+          f"recall@{k} {recall:.3f}  top1 {top1:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.dim, args.k, args.queries, args.seed)
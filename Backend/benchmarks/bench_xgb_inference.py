@@ -0,0 +1,95 @@
+# bench_xgb_inference.py
+# ---------------------------------------
+# Latency benchmark: TreeEnsemble (xgb_inference.py) vs XGBRegressor.predict(pd.DataFrame(X))
+# on models/demand_agent_xgb.json, batch sizes 1 .. 10k. "served" is what load_model()
+# returns: NumPy up to XGB_NUMPY_MAX_ROWS rows, xgboost's predictor above that.
+# --verify also checks bit-identical float32 output on random rows, rows with missing
+# values, and rows that sit exactly on every split threshold.
+# Usage: python3 benchmarks/bench_xgb_inference.py --batches 1 10 100 1000 10000 --verify
+# ---------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forecasting import FEATURE_COLUMNS
+from xgb_inference import TreeEnsemble, load_model
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "demand_agent_xgb.json")
+
+
+def feature_rows(n, rng):
+    return np.column_stack([rng.uniform(0, 600, (n, 7)),        # stock, lead times, limits
+                            rng.integers(0, 7, n), rng.integers(1, 13, n),  # day_of_week, month
+                            rng.uniform(0, 25, (n, 7))])       # lags
+
+
+def xgb_predict(model, X):
+    return model.predict(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+
+
+def timed(fn, X, repeat):
+    fn(X)  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def verify(model, trees, served, rng):
+    X = feature_rows(50_000, rng)
+    with_missing = X.copy()
+    with_missing[rng.random(X.shape) < 0.1] = np.nan
+    is_split = np.isfinite(trees.threshold)
+    on_threshold = X[:is_split.sum()].copy()
+    on_threshold[np.arange(len(on_threshold)), trees.feature[is_split]] = trees.threshold[is_split]
+
+    for label, batch in [("random", X), ("missing", with_missing), ("on threshold", on_threshold)]:
+        expected = xgb_predict(model, batch)
+        for name, candidate in [("numpy", trees), ("served", served)]:
+            check(f"{label} ({name})", expected, candidate.predict(batch))
+    singles = X[:200]
+    check("single rows", np.concatenate([xgb_predict(model, row[None, :]) for row in singles]),
+          np.concatenate([trees.predict(row) for row in singles]))
+
+
+def check(label, expected, got):
+    identical = np.array_equal(expected.view(np.uint32), np.asarray(got, dtype=np.float32).view(np.uint32))
+    print(f"verify {label:<24} rows={len(expected):>6}  bit-identical={identical}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 10, 100, 1_000, 10_000])
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    model = XGBRegressor()
+    model.load_model(args.model)
+    trees = TreeEnsemble.from_json(args.model, FEATURE_COLUMNS)  # NumPy only
+    served = load_model(args.model, FEATURE_COLUMNS)
+    print(f"{len(trees)} trees, depth {trees.depth}, {int(np.isfinite(trees.threshold).sum())} splits")
+
+    if args.verify:
+        verify(model, trees, served, rng)
+
+    for batch in args.batches:
+        X = feature_rows(batch, rng)
+        repeat = max(3, min(500, 20_000 // batch))
+        xgb_ms = timed(lambda x: xgb_predict(model, x), X, repeat)
+        numpy_ms = timed(trees.predict, X, repeat)
+        served_ms = timed(served.predict, X, repeat)
+        print(f"batch={batch:>6}  xgboost {xgb_ms:8.3f} ms  numpy {numpy_ms:8.3f} ms  "
+              f"({xgb_ms / max(numpy_ms, 1e-9):5.1f}x)  served {served_ms:8.3f} ms  "
+              f"({xgb_ms / max(served_ms, 1e-9):5.1f}x)")
@@ -0,0 +1,66 @@
+# cache.py
+# ---------------------------------------
+# Small thread-safe LRU cache with per-entry TTL and hit/miss counters
+# ---------------------------------------
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 900.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """Drop every entry (or only keys matching ``predicate``); returns how many were dropped."""
+        with self._lock:
+            if predicate is None:
+                dropped = len(self._data)
+                self._data.clear()
+                return dropped
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data),
+                    "maxsize": self.maxsize,
+                    "ttl_seconds": self.ttl,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
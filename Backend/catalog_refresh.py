@@ -0,0 +1,199 @@
+# catalog_refresh.py
+# ---------------------------------------
+# Background refresh of the inventory_master name / embedding snapshot used by the MCP servers
+# - change detection: inventory_change_log rows from inventory_master (sql/003) plus
+#   embedding_updated_at (sql/004), woken early by LISTEN inventory_changes
+# - only inserted / renamed / deleted / re-embedded rows are fetched, applied to a copy
+#   of the snapshot, and handed to the on_change callback, which swaps the derived indexes
+# Requests keep being served from the previous snapshot until the swap. on_change returns
+# False when it cannot apply the snapshot yet (derived indexes not built); the snapshot is
+# then not published and the same delta is retried on the next refresh.
+# ---------------------------------------
+
+import os
+import select
+import threading
+import time
+
+import numpy as np
+
+import db
+
+REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))  # 0 disables the watcher
+CHANGE_CHANNEL = "inventory_changes"
+
+MASTER_VERSION_QUERY = """
+    SELECT (SELECT coalesce(max(version), 0) FROM inventory_change_log WHERE source = 'inventory_master'),
+           (SELECT max(embedding_updated_at) FROM inventory_master)
+"""
+
+CHANGED_ITEMS_QUERY = """
+    SELECT c.inventory_id, m.inventory_id IS NULL AS deleted, m.item_name, {embedding}
+    FROM (SELECT inventory_id FROM inventory_change_log
+          WHERE source = 'inventory_master' AND version > %(version)s
+          UNION
+          SELECT inventory_id FROM inventory_master
+          WHERE embedding_updated_at > coalesce(%(embedded_at)s::timestamptz, '-infinity')) c
+    LEFT JOIN inventory_master m ON m.inventory_id = c.inventory_id
+"""
+
+
+class CatalogSnapshot:
+    """Immutable view of inventory_master names (and embeddings) at one change-log version."""
+
+    def __init__(self, names, embeddings, version=0, embedded_at=None):
+        self.names = names            # Inventory_ID -> item_name
+        self.embeddings = embeddings  # Inventory_ID -> np.float32 vector
+        self.version = version
+        self.embedded_at = embedded_at
+
+    def master_map(self):
+        """item_name -> Inventory_ID, the shape the MCP modules have always used."""
+        return {name: inv_id for inv_id, name in self.names.items()}
+
+    def embedding_matrix(self, dim: int):
+        ids = list(self.embeddings)
+        matrix = np.stack([self.embeddings[i] for i in ids]) if ids else np.zeros((0, dim), dtype=np.float32)
+        return ids, matrix
+
+
+def _vector(emb):
+    return np.array(emb, dtype=np.float32) if emb else None
+
+
+class CatalogWatcher:
+    def __init__(self, on_change=None, with_embeddings: bool = True,
+                 interval: float = REFRESH_SECONDS, listen: bool = True):
+        self.on_change = on_change
+        self.with_embeddings = with_embeddings
+        self.interval = interval
+        self.listen = listen
+        self.snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+        self.last_refresh = None   # {"at", "upserted", "deleted", "seconds"}
+        self.last_error = None
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def current_version(self):
+        try:
+            version, embedded_at = db.fetch_one(MASTER_VERSION_QUERY)
+            return version, embedded_at
+        except Exception:
+            # Change-log migrations not applied: no deltas, a full reload detects nothing new
+            print("⚠️ inventory_change_log unavailable (sql/003, sql/004 not applied?); catalog hot reload disabled")
+            return None, None
+
+    def load(self):
+        """Full load; the starting point for incremental refreshes."""
+        with self._refresh_lock:
+            version, embedded_at = self.current_version()
+            columns = "inventory_id, item_name" + (", embedding" if self.with_embeddings else "")
+            names, embeddings = {}, {}
+            for row in db.fetch_all(f"SELECT {columns} FROM inventory_master"):
+                inv_id = str(row[0]).strip()
+                names[inv_id] = row[1] or ""
+                if self.with_embeddings:
+                    vec = _vector(row[2])
+                    if vec is not None:
+                        embeddings[inv_id] = vec
+            self.snapshot = CatalogSnapshot(names, embeddings, version, embedded_at)
+            return self.snapshot
+
+    def refresh(self):
+        """Apply inventory_master changes since the current snapshot; returns True if anything changed."""
+        with self._refresh_lock:
+            old = self.snapshot
+            if old is None or old.version is None:
+                return False
+            version, embedded_at = self.current_version()
+            if version is None or (version == old.version and embedded_at == old.embedded_at):
+                return False
+
+            started = time.perf_counter()
+            embedding = "m.embedding" if self.with_embeddings else "NULL"
+            rows = db.fetch_all(CHANGED_ITEMS_QUERY.format(embedding=embedding),
+                                {"version": old.version, "embedded_at": old.embedded_at})
+            names, embeddings = dict(old.names), dict(old.embeddings)
+            upserted = deleted = 0
+            for inv_id, is_deleted, item_name, emb in rows:
+                inv_id = str(inv_id).strip()
+                if is_deleted:
+                    names.pop(inv_id, None)
+                    embeddings.pop(inv_id, None)
+                    deleted += 1
+                    continue
+                names[inv_id] = item_name or ""
+                vec = _vector(emb)
+                if vec is not None:
+                    embeddings[inv_id] = vec
+                else:
+                    embeddings.pop(inv_id, None)
+                upserted += 1
+
+            new = CatalogSnapshot(names, embeddings, version, embedded_at)
+            # Build derived indexes before the snapshot is published
+            if self.on_change is not None and self.on_change(new) is False:
+                return False
+            self.snapshot = new
+            self.refreshes += 1
+            self.last_refresh = {"at": time.time(), "upserted": upserted, "deleted": deleted,
+                                 "version": version,
+                                 "seconds": round(time.perf_counter() - started, 3)}
+            return True
+
+    # ----------------------------
+    # Background loop
+    # ----------------------------
+    def _wait(self, listen_conn):
+        if listen_conn is None:
+            self._stop.wait(self.interval)
+            return
+        # NOTIFY wakes the loop early; the version check filters out inventory_daily changes
+        if select.select([listen_conn], [], [], self.interval) != ([], [], []):
+            listen_conn.poll()
+            listen_conn.notifies.clear()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.listen:
+                    with db.dedicated_connection() as listen_conn:
+                        with listen_conn.cursor() as cur:
+                            cur.execute(f"LISTEN {CHANGE_CHANNEL}")
+                        while not self._stop.is_set():
+                            self.refresh()
+                            self._wait(listen_conn)
+                else:
+                    self.refresh()
+                    self._wait(None)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Catalog refresh failed, retrying in {self.interval:.0f}s: {e}")
+                self._stop.wait(self.interval)
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {"running": self._thread is not None and self._thread.is_alive(),
+                "interval_seconds": self.interval,
+                "items": len(snapshot.names) if snapshot else 0,
+                "embeddings": len(snapshot.embeddings) if snapshot else 0,
+                "version": snapshot.version if snapshot else None,
+                "refreshes": self.refreshes,
+                "last_refresh": self.last_refresh,
+                "last_error": self.last_error}
@@ -0,0 +1,123 @@
+# change_listener.py
+# ---------------------------------------
+# One process-wide LISTEN on inventory_changes for the SSE change stream
+# - a single background thread holds the only dedicated (unpooled) connection and wakes
+#   every subscriber's queue on NOTIFY, so N dashboards cost one Postgres backend, not N
+# - wakes are coalesced per subscriber (queue of one), a busy client never blocks the fan-out
+# - subscribers are capped (SSE_MAX_SUBSCRIBERS); the thread starts with the first one and
+#   reconnects on errors, waking everyone so they catch up from the change log
+# ---------------------------------------
+
+import os
+import queue
+import select
+import threading
+
+import db
+
+MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", "100"))
+RECONNECT_SECONDS = 5.0
+POLL_SECONDS = 30.0  # select() timeout, only bounds how fast stop() is noticed
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class ChangeListener:
+    def __init__(self, channel: str, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.channel = channel
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.notifications = 0
+        self.rejected = 0
+        self.connected = False
+        self.last_error = None
+
+    # ----------------------------
+    # Subscribers
+    # ----------------------------
+    def subscribe(self):
+        """A wake-up queue for one client; raises TooManySubscribers at the cap."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                raise TooManySubscribers(f"{len(self._subscribers)} change stream subscribers (max {self.max_subscribers})")
+            wakes = queue.Queue(maxsize=1)
+            self._subscribers.add(wakes)
+        self.start()
+        return wakes
+
+    def unsubscribe(self, wakes):
+        with self._lock:
+            self._subscribers.discard(wakes)
+
+    @staticmethod
+    def wait(wakes, timeout: float):
+        """True when a change was signalled within ``timeout`` seconds."""
+        try:
+            wakes.get(timeout=timeout)
+            return True
+        except queue.Empty:
+            return False
+
+    def _wake_all(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for wakes in subscribers:
+            try:
+                wakes.put_nowait(True)
+            except queue.Full:
+                pass  # already has a pending wake
+
+    # ----------------------------
+    # Background loop
+    # ----------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with db.dedicated_connection() as listen_conn:
+                    with listen_conn.cursor() as cur:
+                        cur.execute(f"LISTEN {self.channel}")
+                    self.connected = True
+                    self._wake_all()  # anything committed while (re)connecting
+                    while not self._stop.is_set():
+                        if select.select([listen_conn], [], [], POLL_SECONDS) == ([], [], []):
+                            continue
+                        listen_conn.poll()
+                        if listen_conn.notifies:
+                            self.notifications += len(listen_conn.notifies)
+                            listen_conn.notifies.clear()
+                            self._wake_all()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Change stream LISTEN failed, reconnecting in {RECONNECT_SECONDS:.0f}s: {e}")
+            self.connected = False
+            self._wake_all()
+            self._stop.wait(RECONNECT_SECONDS)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {"running": self._thread is not None and self._thread.is_alive(),
+                "connected": self.connected,
+                "subscribers": subscribers,
+                "max_subscribers": self.max_subscribers,
+                "rejected": self.rejected,
+                "notifications": self.notifications,
+                "last_error": self.last_error}
@@ -0,0 +1,204 @@
+# db.py
+# ---------------------------------------
+# Shared PostgreSQL data-access layer for the Flask API and MCP servers
+# Bounded thread-safe connection pool, per-call cursors, health checks
+# and reconnect. Connection settings come from the environment (PG* vars).
+# ---------------------------------------
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extras
+from psycopg2 import pool
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# ----------------------------
+# Configuration
+# ----------------------------
+POOL_MIN = int(os.getenv("PGPOOL_MIN", "1"))
+POOL_MAX = int(os.getenv("PGPOOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("PGPOOL_TIMEOUT", "30"))
+# Connections idle longer than this are pinged before being handed out
+HEALTH_CHECK_AFTER = float(os.getenv("PGPOOL_HEALTH_CHECK_AFTER", "60"))
+
+DISCONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def db_config():
+    config = {"host": os.getenv("PGHOST", "localhost"),
+              "port": os.getenv("PGPORT", "5432"),
+              "dbname": os.getenv("PGDATABASE", "vectordb"),
+              "user": os.getenv("PGUSER"),
+              "password": os.getenv("PGPASSWORD"),
+              "connect_timeout": int(os.getenv("PGCONNECT_TIMEOUT", "10")),
+              "application_name": os.getenv("PGAPPNAME", "inventory-backend")}
+    return {k: v for k, v in config.items() if v not in (None, "")}
+
+# ----------------------------
+# Pool
+# ----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_MAX)
+_last_used = {}  # id(conn) -> monotonic time it was returned to the pool
+
+
+def _get_pool():
+    global _pool
+    if _pool is None or _pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                _pool = pool.ThreadedConnectionPool(POOL_MIN, POOL_MAX, **db_config())
+    return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < HEALTH_CHECK_AFTER:
+        return True  # freshly opened or recently used
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except DISCONNECT_ERRORS:
+        return False
+
+
+def _checkout():
+    # The semaphore bounds concurrent users: callers wait instead of getting PoolError
+    if not _slots.acquire(timeout=POOL_TIMEOUT):
+        raise pool.PoolError(f"No database connection available within {POOL_TIMEOUT}s")
+    try:
+        for _ in range(2):
+            db_pool = _get_pool()
+            conn = db_pool.getconn()
+            if _is_healthy(conn):
+                return conn
+            _last_used.pop(id(conn), None)
+            db_pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+    except Exception:
+        _slots.release()
+        raise
+
+
+def _checkin(conn, discard=False):
+    try:
+        if discard or conn.closed:
+            _last_used.pop(id(conn), None)
+            _get_pool().putconn(conn, close=True)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+            _get_pool().putconn(conn)
+    finally:
+        _slots.release()
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; commits on success, rolls back on error."""
+    conn = _checkout()
+    discard = False
+    try:
+        yield conn
+        conn.commit()
+    except DISCONNECT_ERRORS:
+        discard = True
+        raise
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        _checkin(conn, discard=discard)
+
+
+@contextmanager
+def cursor(dict_rows: bool = False):
+    """Per-call cursor on a pooled connection (RealDictCursor when ``dict_rows``)."""
+    factory = psycopg2.extras.RealDictCursor if dict_rows else None
+    with connection() as conn:
+        with conn.cursor(cursor_factory=factory) as cur:
+            yield cur
+
+# ----------------------------
+# Query helpers (retry once after a dropped connection)
+# ----------------------------
+def _run(fn, retries: int = 1):
+    for attempt in range(retries + 1):
+        try:
+            with cursor() as cur:
+                return fn(cur)
+        except DISCONNECT_ERRORS:
+            if attempt == retries:
+                raise
+
+
+def fetch_all(query, params=None):
+    def run(cur):
+        cur.execute(query, params)
+        return cur.fetchall()
+    return _run(run)
+
+
+def fetch_one(query, params=None):
+    def run(cur):
+        cur.execute(query, params)
+        return cur.fetchone()
+    return _run(run)
+
+
+def fetch_dicts(query, params=None):
+    def run(cur):
+        cur.execute(query, params)
+        columns = [desc[0] for desc in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+    return _run(run)
+
+@contextmanager
+def dedicated_connection(autocommit: bool = True):
+    """Unpooled connection for long-lived work such as LISTEN; closed on exit."""
+    conn = psycopg2.connect(**db_config())
+    conn.autocommit = autocommit
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+# ----------------------------
+# Health / lifecycle
+# ----------------------------
+def health_check():
+    started = time.perf_counter()
+    try:
+        fetch_one("SELECT 1")
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e)
+    status = {"ok": ok,
+              "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+              "pool": {"min": POOL_MIN, "max": POOL_MAX,
+                       "in_use": len(_pool._used) if _pool is not None and not _pool.closed else 0}}
+    if error:
+        status["error"] = error
+    return status
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+        _last_used.clear()
@@ -0,0 +1,221 @@
+# feature_store.py
+# ---------------------------------------
+# Forecast features from the SQL feature store (sql/009_inventory_features.sql)
+# instead of the static CSV snapshot's lag / stock columns
+# - FeatureStateIndex.take() only reads the latest feature row per item; a background
+#   thread (start()) drains the dirty-item queue every FEATURE_REFRESH_SECONDS, so forecasts
+#   see today's inventory_daily rows without a CSV rebuild or restart, and reads never
+#   take the write transaction
+# - refresh_items() recomputes just the requested dirty items; the forecast cache calls it
+#   on a miss, so a forecast cached under an item's new data version uses its new features
+# - items the store does not know (or a database without sql/009) fall back to the
+#   CSV-backed ItemStateIndex
+# Usage: python3 feature_store.py [--watch 60]   (drain the refresh queue / backfill)
+# ---------------------------------------
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+import db
+from forecasting import ItemStates, LAG_COLUMNS, states_from_frame
+
+REFRESH_SECONDS = float(os.getenv("FEATURE_REFRESH_SECONDS", "60"))  # 0 disables the background refresh
+REFRESH_QUERY = "SELECT public.refresh_inventory_features(%s, %s)"
+# Still queued after a refresh: claimed (SKIP LOCKED) by a refresh that has not committed yet
+PENDING_QUERY = "SELECT inventory_id FROM inventory_features_dirty WHERE inventory_id = ANY(%s)"
+
+# Latest feature row per requested item; limits from inventory_stock_limits (sql/012, the
+# definition the low-stock scan and reorder plan use too), under the CSV's column names
+LATEST_FEATURES_QUERY = f"""
+    SELECT ids.inventory_id, f.date, f.closing_stock, f.quantity_restocked, f.lead_time_days,
+           lim.lead_time_days, lim.min_stock_limit, lim.max_capacity,
+           {', '.join('f.' + c for c in LAG_COLUMNS)}
+    FROM unnest(%s::text[]) AS ids(inventory_id)
+    JOIN LATERAL (
+        SELECT * FROM inventory_features
+        WHERE inventory_id = ids.inventory_id
+        ORDER BY date DESC
+        LIMIT 1
+    ) f ON true
+    LEFT JOIN inventory_stock_limits lim ON lim.inventory_id = ids.inventory_id
+"""
+FEATURE_COLUMNS = ["Inventory_ID", "Date", "Closing_Stock", "Quantity_Restocked", "Lead_Time_Days",
+                   "lead_time_days", "min_stock_limit", "max_capacity"] + LAG_COLUMNS
+
+# Database without the feature store (sql/009) or stock limits (sql/012) migration
+MISSING_OBJECT_ERRORS = (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedFunction)
+
+
+def refresh(item_ids=None, limit: int = 5000):
+    """Recompute up to ``limit`` dirty items (only ``item_ids`` when given); returns the count."""
+    (count,) = db.fetch_one(REFRESH_QUERY, (list(item_ids) if item_ids is not None else None, limit))
+    return count
+
+
+def refresh_all(limit: int = 5000):
+    total = 0
+    while True:
+        count = refresh(limit=limit)
+        total += count
+        if count < limit:
+            return total
+
+
+def merge_states(primary, secondary):
+    """Rows of ``primary`` where it found the item, ``secondary`` elsewhere (same item order)."""
+    use = primary.found
+    row = use[:, None]
+    return ItemStates(primary.item_ids, primary.found | secondary.found,
+                      np.where(use, primary.last_date, secondary.last_date),
+                      np.where(use, primary.closing_stock, secondary.closing_stock),
+                      np.where(use, primary.quantity_restocked, secondary.quantity_restocked),
+                      np.where(use, primary.lead_time_days, secondary.lead_time_days),
+                      np.where(use, primary.lead_time_days_alt, secondary.lead_time_days_alt),
+                      np.where(use, primary.min_stock_limit, secondary.min_stock_limit),
+                      np.where(use, primary.max_capacity, secondary.max_capacity),
+                      np.where(row, primary.lags, secondary.lags))
+
+
+class FeatureStateIndex:
+    """Drop-in for ItemStateIndex.take()/ids() that reads the SQL feature store first."""
+
+    def __init__(self, fallback=None, refresh_seconds: float = REFRESH_SECONDS):
+        self.fallback = fallback
+        self.refresh_seconds = refresh_seconds
+        self.available = True
+        self.store_items = 0
+        self.fallback_items = 0
+        self.refreshed_items = 0
+        self.last_refresh = None   # {"at", "items", "seconds"}
+        self.errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def latest_frame(self, item_ids):
+        rows = db.fetch_all(LATEST_FEATURES_QUERY, (item_ids,))
+        frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+        frame["Inventory_ID"] = frame["Inventory_ID"].astype(str)
+        return frame.set_index("Inventory_ID")
+
+    def _fallback_take(self, item_ids):
+        if self.fallback is None:
+            return states_from_frame(pd.DataFrame(), item_ids)
+        return self.fallback.take(item_ids)
+
+    def take(self, item_ids):
+        item_ids = [str(i) for i in item_ids]
+        if not self.available or not item_ids:
+            return self._fallback_take(item_ids)
+        try:
+            states = states_from_frame(self.latest_frame(item_ids), item_ids)
+        except MISSING_OBJECT_ERRORS as e:
+            self.available = False
+            self.last_error = str(e)
+            print("⚠️ inventory_features not found (sql/009, sql/012 not applied?); using the historical CSV features")
+            return self._fallback_take(item_ids)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return self._fallback_take(item_ids)
+
+        self.store_items += int(states.found.sum())
+        if states.found.all():
+            return states
+        self.fallback_items += int((~states.found).sum())
+        return merge_states(states, self._fallback_take(item_ids))
+
+    def refresh_items(self, item_ids):
+        """
+        Recompute the dirty ones among ``item_ids`` now (one short write, only on forecast
+        cache misses); returns the IDs whose features are still being refreshed elsewhere.
+        """
+        item_ids = [str(i) for i in item_ids]
+        if not self.available or not item_ids:
+            return set()
+        try:
+            self.refreshed_items += refresh(item_ids, len(item_ids))
+            pending = {str(r[0]) for r in db.fetch_all(PENDING_QUERY, (item_ids,))}
+        except MISSING_OBJECT_ERRORS as e:
+            self.available = False
+            self.last_error = str(e)
+            return set()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return set(item_ids)  # freshness unknown
+        return pending
+
+    def ids(self):
+        ids = self.fallback.ids() if self.fallback is not None else []
+        if self.available:
+            try:
+                rows = db.fetch_all("SELECT DISTINCT inventory_id FROM inventory_features")
+                ids = list(dict.fromkeys(ids + [str(r[0]) for r in rows]))
+            except Exception as e:
+                self.last_error = str(e)
+        return ids
+
+    # ----------------------------
+    # Background refresh
+    # ----------------------------
+    def _run(self):
+        while self.available and not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                count = refresh_all()
+                self.refreshed_items += count
+                self.last_refresh = {"at": time.time(), "items": count,
+                                     "seconds": round(time.perf_counter() - started, 3)}
+            except MISSING_OBJECT_ERRORS as e:
+                self.available = False
+                self.last_error = str(e)
+                print("⚠️ inventory_features not found (sql/009 not applied?); feature refresh stopped")
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Feature refresh failed, retrying in {self.refresh_seconds:.0f}s: {e}")
+            self._stop.wait(self.refresh_seconds)
+
+    def start(self):
+        if self.refresh_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="feature-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {"available": self.available,
+                "refresh_running": self._thread is not None and self._thread.is_alive(),
+                "refresh_seconds": self.refresh_seconds,
+                "store_items": self.store_items,
+                "fallback_items": self.fallback_items,
+                "refreshed_items": self.refreshed_items,
+                "last_refresh": self.last_refresh,
+                "errors": self.errors,
+                "last_error": self.last_error}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the inventory_features refresh queue")
+    parser.add_argument("--limit", type=int, default=5000, help="items recomputed per transaction")
+    parser.add_argument("--watch", type=float, default=0, help="keep draining every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        started = time.perf_counter()
+        count = refresh_all(args.limit)
+        if count or not args.watch:
+            print(f"✅ Refreshed features for {count} items in {time.perf_counter() - started:.2f}s")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,150 @@
+# forecast_batch.py
+# ---------------------------------------
+# Nightly batch forecast for the MCP tools (read back by forecast_store.py)
+# - every item of the historical dataset and the feature store (sql/009), for every forecast
+#   variant, over --horizon days; the feature refresh queue is drained first
+# - items are rolled forward in lockstep chunks (forecasting.forecast_many), one COPY per chunk
+# - rows land in the run date's partition of demand_forecast (sql/007); a run is published
+#   atomically: its rows and the finished run marker commit in the same transaction
+# - partitions older than --retention-days are dropped
+# Usage: python3 forecast_batch.py [--horizon 30] [--variants xgb xgb_shaped] [--chunk-size 5000]
+# Schedule nightly, e.g. cron: 0 2 * * * cd Backend && python3 forecast_batch.py
+# ---------------------------------------
+
+import argparse
+import datetime as dt
+import io
+import json
+import os
+import time
+
+import db
+import feature_store
+import forecasting
+from forecast_cache import fetch_data_versions
+from feature_store import FeatureStateIndex
+from forecast_store import pack_rows
+from historical_store import load_historical
+from item_state_index import ItemStateIndex
+from xgb_inference import load_model
+
+MODEL_PATH = "models/demand_agent_xgb.json"
+HORIZON = int(os.getenv("FORECAST_HORIZON", "30"))
+RETENTION_DAYS = int(os.getenv("FORECAST_RETENTION_DAYS", "7"))
+
+
+def partition_name(run_date):
+    return f"demand_forecast_{run_date:%Y%m%d}"
+
+
+def ensure_partition(cur, run_date):
+    # Bounds as plain literals: older servers reject expressions (e.g. '...'::date) here
+    cur.execute(f"CREATE TABLE IF NOT EXISTS public.{partition_name(run_date)} "
+                f"PARTITION OF public.demand_forecast "
+                f"FOR VALUES FROM ('{run_date.isoformat()}') TO ('{run_date + dt.timedelta(days=1)}')")
+
+
+def drop_expired_partitions(cur, keep_from):
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.demand_forecast'::regclass
+    """)
+    dropped = []
+    for (name,) in cur.fetchall():
+        try:
+            day = dt.datetime.strptime(name.rsplit("_", 1)[-1], "%Y%m%d").date()
+        except ValueError:
+            continue  # not one of ours
+        if day < keep_from:
+            cur.execute(f"DROP TABLE IF EXISTS public.{name}")
+            dropped.append(name)
+    cur.execute("DELETE FROM demand_forecast_run WHERE run_date < %s", (keep_from,))
+    return dropped
+
+
+def _copy_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_forecasts(cur, run_date, variant, forecasts, versions):
+    buf = io.StringIO()
+    for item_id, rows in forecasts.items():
+        packed = json.dumps(pack_rows(rows), separators=(",", ":"))
+        buf.write(f"{run_date.isoformat()}\t{_copy_escape(variant)}\t{_copy_escape(item_id)}\t"
+                  f"{versions.get(item_id, 0)}\t{_copy_escape(packed)}\n")
+    buf.seek(0)
+    cur.copy_expert("COPY demand_forecast (run_date, variant, inventory_id, data_version, forecast) "
+                    "FROM STDIN", buf)
+
+
+def run_variant(model, state_index, variant, run_date, horizon, chunk_size, versions):
+    item_ids = state_index.ids()
+    compute_seconds = write_seconds = 0.0
+    with db.cursor() as cur:
+        ensure_partition(cur, run_date)
+        cur.execute("DELETE FROM demand_forecast WHERE run_date = %s AND variant = %s", (run_date, variant))
+        cur.execute("""
+            INSERT INTO demand_forecast_run (run_date, variant, horizon) VALUES (%s, %s, %s)
+            ON CONFLICT (variant, run_date) DO UPDATE
+            SET horizon = EXCLUDED.horizon, items = 0, started_at = now(), finished_at = NULL
+        """, (run_date, variant, horizon))
+
+        for start in range(0, len(item_ids), chunk_size):
+            chunk = item_ids[start:start + chunk_size]
+            t0 = time.perf_counter()
+            forecasts = forecasting.forecast_many(model, state_index, chunk, horizon,
+                                                  **forecasting.VARIANTS[variant])
+            t1 = time.perf_counter()
+            copy_forecasts(cur, run_date, variant, forecasts, versions)
+            t2 = time.perf_counter()
+            compute_seconds += t1 - t0
+            write_seconds += t2 - t1
+            print(f"  {variant}: {start + len(chunk)}/{len(item_ids)} items")
+
+        cur.execute("UPDATE demand_forecast_run SET items = %s, finished_at = now() "
+                    "WHERE variant = %s AND run_date = %s", (len(item_ids), variant, run_date))
+    return {"variant": variant, "items": len(item_ids),
+            "compute_seconds": round(compute_seconds, 3), "write_seconds": round(write_seconds, 3)}
+
+
+def run_batch(variants=None, horizon: int = HORIZON, chunk_size: int = 5000, run_date=None,
+              retention_days: int = RETENTION_DAYS):
+    run_date = run_date or dt.date.today()
+    variants = variants or list(forecasting.VARIANTS)
+    started = time.perf_counter()
+
+    try:
+        refreshed = feature_store.refresh_all()  # drain the inventory_features queue first
+        print(f"  features: refreshed {refreshed} items")
+    except Exception as e:
+        print(f"⚠️ Feature store refresh skipped: {e}")
+    # No background refresh (start()) here: the queue was just drained
+    state_index = FeatureStateIndex(ItemStateIndex.from_frame(load_historical()))
+    model = load_model(MODEL_PATH, forecasting.FEATURE_COLUMNS)
+    # Versions are read before forecasting: a change during the run makes the item stale, not wrong
+    versions = fetch_data_versions(state_index.ids()) or {}
+
+    results = [run_variant(model, state_index, variant, run_date, horizon, chunk_size, versions)
+               for variant in variants]
+    with db.cursor() as cur:
+        dropped = drop_expired_partitions(cur, run_date - dt.timedelta(days=retention_days))
+    return {"run_date": run_date.isoformat(), "horizon": horizon, "variants": results,
+            "dropped_partitions": dropped, "total_seconds": round(time.perf_counter() - started, 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute demand forecasts into demand_forecast")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="days forecast per item")
+    parser.add_argument("--variants", nargs="+", choices=list(forecasting.VARIANTS), default=None)
+    parser.add_argument("--chunk-size", type=int, default=5000, help="items forecast and written per COPY")
+    parser.add_argument("--run-date", type=dt.date.fromisoformat, default=None, help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    args = parser.parse_args()
+
+    stats = run_batch(args.variants, args.horizon, args.chunk_size, args.run_date, args.retention_days)
+    for v in stats["variants"]:
+        print(f"✅ {v['variant']}: {v['items']} items x {stats['horizon']} days "
+              f"(compute {v['compute_seconds']}s, write {v['write_seconds']}s)")
+    if stats["dropped_partitions"]:
+        print(f"🧹 Dropped expired partitions: {', '.join(stats['dropped_partitions'])}")
+    print(f"✅ Forecast run {stats['run_date']} published in {stats['total_seconds']}s")
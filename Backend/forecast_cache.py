@@ -0,0 +1,94 @@
+# forecast_cache.py
+# ---------------------------------------
+# Versioned forecast result cache
+# Key: (Inventory_ID, periods, data version). The data version advances whenever
+# consumption / inventory_daily rows change for the item (sql/001_inventory_data_version.sql),
+# so stale entries are never served; old versions simply age out of the LRU.
+# Misses are single-flight per key: concurrent requests for the same item / periods /
+# version (a dashboard refresh plus several agent sessions) share one computation.
+# The version moves as soon as a row is written, the forecast features (feature_store.py)
+# only when recomputed: refresh_fn brings the missed items' features up to date first, and
+# items it reports as still refreshing are computed but not cached.
+# ---------------------------------------
+
+import db
+from cache import TTLCache
+from singleflight import SingleFlight
+from forecasting import method_map
+
+
+def fetch_data_versions(item_ids):
+    """Current data version per item (0 if it never changed), or None when versions can't be read."""
+    item_ids = [str(i) for i in item_ids]
+    try:
+        versions = dict(db.fetch_all("SELECT inventory_id, version FROM inventory_data_version "
+                                     "WHERE inventory_id = ANY(%s)", (item_ids,)))
+    except Exception:
+        return None
+    return {i: versions.get(i, 0) for i in item_ids}
+
+
+class ForecastCache:
+    def __init__(self, version_fn, maxsize: int = 2048, ttl: float = 900.0, name: str = "forecasts",
+                 refresh_fn=None):
+        self.version_fn = version_fn
+        self.refresh_fn = refresh_fn  # item_ids -> IDs whose inputs are not current yet
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.in_flight = SingleFlight(name)
+        self.bypassed = 0
+        self.uncached = 0
+
+    def _refresh(self, item_ids):
+        return self.refresh_fn(item_ids) if self.refresh_fn is not None else set()
+
+    def forecast_many(self, item_ids, periods, methods, compute):
+        """
+        Serve cached forecasts where the (item, periods, version) key is present and
+        compute every miss in one batched ``compute(item_ids, periods, methods)`` call;
+        misses another caller is already computing are waited on instead.
+        """
+        item_ids = list(dict.fromkeys(str(i) for i in item_ids))
+        methods = method_map(item_ids, methods)
+        versions = self.version_fn(item_ids)
+        if versions is None:
+            self.bypassed += 1
+            self._refresh(item_ids)
+            return compute(item_ids, periods, methods)
+
+        cached, misses = {}, []
+        for item_id in item_ids:
+            rows = self.results.get((item_id, periods, versions[item_id]))
+            if rows is None:
+                misses.append(item_id)
+            else:
+                cached[item_id] = rows
+
+        if misses:
+            def compute_missing(keys):
+                ids = [key[0] for key in keys]
+                pending = self._refresh(ids)
+                fresh = compute(ids, periods, methods)
+                for key in keys:
+                    if key[0] in pending:
+                        self.uncached += 1
+                    else:
+                        self.results.set(key, fresh[key[0]])
+                return {key: fresh[key[0]] for key in keys}
+
+            keys = [(item_id, periods, versions[item_id]) for item_id in misses]
+            shared = self.in_flight.do_many(keys, compute_missing)
+            for key in keys:
+                cached[key[0]] = shared[key]
+
+        # Copies, so callers can annotate rows without touching the cache
+        return {item_id: [dict(row, Search_Method=methods[item_id]) for row in cached[item_id]]
+                for item_id in item_ids}
+
+    def invalidate(self, item_id=None):
+        if item_id is None:
+            return self.results.invalidate()
+        return self.results.invalidate(lambda key: key[0] == str(item_id))
+
+    def stats(self):
+        return dict(self.results.stats(), bypassed=self.bypassed, uncached=self.uncached,
+                    single_flight=self.in_flight.stats())
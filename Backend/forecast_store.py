@@ -0,0 +1,92 @@
+# forecast_store.py
+# ---------------------------------------
+# Read path for the nightly demand_forecast table (sql/007, written by forecast_batch.py)
+# An item is served from the latest published run of its forecast variant when
+#   - the run is at most FORECAST_MAX_AGE_DAYS old and covers the requested horizon
+#   - the item's data version (sql/001) has not moved since the run
+# in a single indexed read; every other item is computed live in one batch, as before.
+# ---------------------------------------
+
+import os
+
+import db
+from forecasting import method_map
+
+MAX_AGE_DAYS = int(os.getenv("FORECAST_MAX_AGE_DAYS", "1"))
+
+# Stored per day as [Date, Predicted_Consumption, Available_Stock, Stock_Warning]
+# (jsonb does not keep object key order, arrays keep the tools' row layout intact)
+ROW_FIELDS = ("Date", "Predicted_Consumption", "Available_Stock", "Stock_Warning")
+
+PRECOMPUTED_QUERY = """
+    WITH run AS (
+        SELECT run_date, horizon FROM demand_forecast_run
+        WHERE variant = %(variant)s AND finished_at IS NOT NULL
+          AND run_date >= current_date - %(max_age)s
+        ORDER BY run_date DESC
+        LIMIT 1
+    )
+    SELECT f.inventory_id, f.forecast
+    FROM run
+    JOIN demand_forecast f ON f.run_date = run.run_date AND f.variant = %(variant)s
+    LEFT JOIN inventory_data_version v ON v.inventory_id = f.inventory_id
+    WHERE run.horizon >= %(periods)s
+      AND f.inventory_id = ANY(%(ids)s)
+      AND f.data_version = coalesce(v.version, 0)
+"""
+
+
+def pack_rows(rows):
+    return [[row[field] for field in ROW_FIELDS] for row in rows]
+
+
+def unpack_rows(item_id, packed, method):
+    return [{"Date": date, "Inventory_ID": item_id, "Predicted_Consumption": consumption,
+             "Available_Stock": available, "Stock_Warning": warning, "Search_Method": method}
+            for date, consumption, available, warning in packed]
+
+
+class PrecomputedForecasts:
+    def __init__(self, variant: str, max_age_days: int = MAX_AGE_DAYS):
+        self.variant = variant
+        self.max_age_days = max_age_days
+        self.served = 0
+        self.computed = 0
+        self.errors = 0
+        self.last_error = None
+
+    def fetch(self, item_ids, periods: int):
+        """{Inventory_ID: packed rows} for the items the latest fresh run can answer."""
+        try:
+            rows = db.fetch_all(PRECOMPUTED_QUERY, {"variant": self.variant, "max_age": self.max_age_days,
+                                                    "periods": periods, "ids": list(item_ids)})
+        except Exception as e:
+            # Table not migrated (sql/007) or DB unavailable: live compute only
+            self.errors += 1
+            self.last_error = str(e)
+            return {}
+        return {inv_id: packed[:periods] for inv_id, packed in rows}
+
+    def forecast_many(self, item_ids, periods, methods, compute):
+        """
+        Same contract as ForecastCache.forecast_many: precomputed rows where available,
+        one batched ``compute(item_ids, periods, methods)`` call for the rest.
+        """
+        item_ids = list(dict.fromkeys(str(i) for i in item_ids))
+        methods = method_map(item_ids, methods)
+        found = self.fetch(item_ids, periods)
+        misses = [item_id for item_id in item_ids if item_id not in found]
+        fresh = compute(misses, periods, methods) if misses else {}
+        self.served += len(found)
+        self.computed += len(misses)
+        return {item_id: unpack_rows(item_id, found[item_id], methods[item_id]) if item_id in found
+                else fresh[item_id]
+                for item_id in item_ids}
+
+    def stats(self):
+        return {"variant": self.variant,
+                "max_age_days": self.max_age_days,
+                "served_items": self.served,
+                "computed_items": self.computed,
+                "errors": self.errors,
+                "last_error": self.last_error}
@@ -0,0 +1,284 @@
+# forecasting.py
+# ---------------------------------------
+# Batched lockstep demand forecasting engine
+# Every requested item is rolled forward together:
+# one feature matrix + one XGBoost predict call per horizon step
+# ---------------------------------------
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from xgb_inference import TreeEnsemble
+
+# ----------------------------
+# Model feature layout (order matches models/demand_agent_xgb.json)
+# ----------------------------
+LAG_COLUMNS = [f"lag_{lag}" for lag in range(1, 8)]
+FEATURE_COLUMNS = ["Opening_Stock", "Closing_Stock", "Quantity_Restocked",
+                   "Lead_Time_Days", "lead_time_days", "min_stock_limit", "max_capacity",
+                   "day_of_week", "month"] + LAG_COLUMNS
+
+STATE_DEFAULTS = {"Closing_Stock": 100.0, "Quantity_Restocked": 0.0, "Lead_Time_Days": 3.0,
+                  "lead_time_days": 3.0, "min_stock_limit": 10.0, "max_capacity": 500.0}
+
+# ----------------------------
+# Per-item starting state (one row per item, plain NumPy arrays)
+# ----------------------------
+class ItemStates:
+    def __init__(self, item_ids, found, last_date, closing_stock, quantity_restocked,
+                 lead_time_days, lead_time_days_alt, min_stock_limit, max_capacity, lags):
+        self.item_ids = list(item_ids)
+        self.found = np.asarray(found, dtype=bool)
+        self.last_date = np.asarray(last_date, dtype="datetime64[ns]")
+        self.closing_stock = np.asarray(closing_stock, dtype=np.float64)
+        self.quantity_restocked = np.asarray(quantity_restocked, dtype=np.float64)
+        self.lead_time_days = np.asarray(lead_time_days, dtype=np.float64)
+        self.lead_time_days_alt = np.asarray(lead_time_days_alt, dtype=np.float64)
+        self.min_stock_limit = np.asarray(min_stock_limit, dtype=np.float64)
+        self.max_capacity = np.asarray(max_capacity, dtype=np.float64)
+        self.lags = np.asarray(lags, dtype=np.float64).reshape(len(self.item_ids), len(LAG_COLUMNS))
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def subset(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return ItemStates([i for i, keep in zip(self.item_ids, mask) if keep], self.found[mask],
+                          self.last_date[mask], self.closing_stock[mask], self.quantity_restocked[mask],
+                          self.lead_time_days[mask], self.lead_time_days_alt[mask],
+                          self.min_stock_limit[mask], self.max_capacity[mask], self.lags[mask])
+
+
+def _column(frame, col, default, fallback=None):
+    if col in frame:
+        values = pd.to_numeric(frame[col], errors="coerce")
+    elif fallback is not None and fallback in frame:
+        values = pd.to_numeric(frame[fallback], errors="coerce")
+    else:
+        return np.full(len(frame), default, dtype=np.float64)
+    if fallback is not None and fallback in frame:
+        values = values.fillna(pd.to_numeric(frame[fallback], errors="coerce"))
+    return values.fillna(default).to_numpy(dtype=np.float64)
+
+
+def states_from_frame(latest, item_ids):
+    """Build ItemStates for ``item_ids`` from a frame holding one (latest) row per Inventory_ID."""
+    item_ids = [str(i) for i in item_ids]
+    # Set lookup: np.isin on object (str) arrays compares every pair, quadratic in catalogue size
+    present = set(latest.index.astype(str))
+    found = np.fromiter((i in present for i in item_ids), dtype=bool, count=len(item_ids))
+    latest = latest.reindex(item_ids)
+    lags = np.column_stack([_column(latest, c, 0.0) for c in LAG_COLUMNS]) if item_ids else np.zeros((0, 7))
+    if "Date" in latest:
+        last_date = pd.to_datetime(latest["Date"]).to_numpy()
+    else:
+        last_date = np.full(len(item_ids), np.datetime64("NaT"))
+    return ItemStates(
+        item_ids, found, last_date,
+        _column(latest, "Closing_Stock", STATE_DEFAULTS["Closing_Stock"]),
+        _column(latest, "Quantity_Restocked", STATE_DEFAULTS["Quantity_Restocked"]),
+        _column(latest, "Lead_Time_Days", STATE_DEFAULTS["Lead_Time_Days"], fallback="lead_time_days"),
+        _column(latest, "lead_time_days", STATE_DEFAULTS["lead_time_days"], fallback="Lead_Time_Days"),
+        _column(latest, "min_stock_limit", STATE_DEFAULTS["min_stock_limit"]),
+        _column(latest, "max_capacity", STATE_DEFAULTS["max_capacity"]),
+        lags)
+
+
+def feature_matrix(frame):
+    """Model features (FEATURE_COLUMNS order) for historical rows, state defaults filling gaps."""
+    dates = pd.DatetimeIndex(pd.to_datetime(frame["Date"]))
+    return np.column_stack(
+        [_column(frame, "Opening_Stock", STATE_DEFAULTS["Closing_Stock"], fallback="Closing_Stock"),
+         _column(frame, "Closing_Stock", STATE_DEFAULTS["Closing_Stock"]),
+         _column(frame, "Quantity_Restocked", STATE_DEFAULTS["Quantity_Restocked"]),
+         _column(frame, "Lead_Time_Days", STATE_DEFAULTS["Lead_Time_Days"], fallback="lead_time_days"),
+         _column(frame, "lead_time_days", STATE_DEFAULTS["lead_time_days"], fallback="Lead_Time_Days"),
+         _column(frame, "min_stock_limit", STATE_DEFAULTS["min_stock_limit"]),
+         _column(frame, "max_capacity", STATE_DEFAULTS["max_capacity"]),
+         np.nan_to_num(np.asarray(dates.dayofweek, dtype=np.float64), nan=0.0),
+         np.nan_to_num(np.asarray(dates.month, dtype=np.float64), nan=1.0)]
+        + [_column(frame, c, 0.0) for c in LAG_COLUMNS])
+
+
+def seeded_uniform(keys, low, high):
+    """Deterministic U(low, high) draw per key (e.g. item|date), stable across runs and processes."""
+    u = np.fromiter((zlib.crc32(str(k).encode()) for k in keys), dtype=np.float64, count=len(keys))
+    return low + (high - low) * (u / 2**32)
+
+# ----------------------------
+# Lockstep rollout
+# ----------------------------
+def predict_matrix(model, X):
+    """One predict call for the whole batch; a failing model yields zero demand (as before)."""
+    try:
+        if isinstance(model, TreeEnsemble):  # NumPy trees take the matrix as-is
+            return model.predict(X).astype(np.float64)
+        return np.asarray(model.predict(pd.DataFrame(X, columns=FEATURE_COLUMNS)), dtype=np.float64)
+    except Exception:
+        return np.zeros(len(X), dtype=np.float64)
+
+
+def _calendar(last_date, day):
+    dates = pd.DatetimeIndex(last_date) + pd.Timedelta(days=day + 1)
+    day_of_week = np.asarray(dates.dayofweek, dtype=np.float64)
+    month = np.asarray(dates.month, dtype=np.float64)
+    return dates, np.nan_to_num(day_of_week, nan=0.0), np.nan_to_num(month, nan=1.0)
+
+
+def rollout(model, states, periods, adjust=None):
+    """
+    Recursive multi-step forecast for all items at once.
+
+    ``adjust(day, y_pred, previous, states)`` may post-process the clipped model output of each
+    step; ``previous`` holds the already-emitted predictions (items x day).
+    Returns (consumption, available_stock, dates), each shaped items x periods.
+    """
+    n = len(states)
+    consumption = np.zeros((n, periods), dtype=np.float64)
+    available_stock = np.zeros((n, periods), dtype=np.float64)
+    dates = []
+
+    available = states.closing_stock.copy()
+    lags = states.lags.copy()
+    X = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+    X[:, 2] = states.quantity_restocked
+    X[:, 3] = states.lead_time_days
+    X[:, 4] = states.lead_time_days_alt
+    X[:, 5] = states.min_stock_limit
+    X[:, 6] = states.max_capacity
+
+    for day in range(periods):
+        step_dates, day_of_week, month = _calendar(states.last_date, day)
+        dates.append(step_dates)
+        X[:, 0] = available
+        X[:, 1] = available
+        X[:, 7] = day_of_week
+        X[:, 8] = month
+        X[:, 9:] = lags
+
+        y_pred = np.maximum(0.0, predict_matrix(model, X)) if n else np.zeros(0)
+        if adjust is not None:
+            y_pred = adjust(day, y_pred, consumption[:, :day], states)
+
+        consumption[:, day] = y_pred
+        available_stock[:, day] = available
+
+        lags[:, 1:] = lags[:, :-1]
+        lags[:, 0] = y_pred
+        available = np.maximum(0.0, available - y_pred)
+
+    return consumption, available_stock, dates
+
+def consumption_matrix(model, state_index, item_ids, periods, adjust=None, states=None):
+    """
+    Predicted daily consumption (items x periods) for ``item_ids`` without per-row formatting,
+    plus the mask of items that have history (rows of the others stay zero). Starting states
+    come from ``state_index`` unless given.
+    """
+    if states is None:
+        states = state_index.take(item_ids)
+    consumption = np.zeros((len(states), periods), dtype=np.float64)
+    if states.found.any():
+        consumption[states.found] = rollout(model, states.subset(states.found), periods, adjust=adjust)[0]
+    return consumption, states.found
+
+# ----------------------------
+# Prediction shaping (semantic-search MCP agent)
+# ----------------------------
+def flat_history_adjust(day, y_pred, previous, states):
+    """
+    Non-flat prediction shaping applied on top of the XGBoost output each step:
+    synthetic variation for items with all-zero lags, a mild seasonal factor, and a
+    nudge whenever a prediction repeats the previous day's value.
+    """
+    # Jitter is seeded per item and date so repeated calls (and cached results) agree
+    dates = (states.last_date.astype("datetime64[D]") + day + 1).astype(str)
+    flat_history = states.lags.sum(axis=1) == 0
+    if flat_history.any():
+        noise = seeded_uniform([f"{i}|{d}|flat" for i, d in zip(states.item_ids, dates)], 0.2, 0.8)
+        synthetic = np.round(1 + np.sin(day) + noise, 2)
+        y_pred = np.where(flat_history, synthetic, y_pred)
+
+    seasonal_factor = 1 + 0.1 * np.sin(day)
+    y_pred = np.round(y_pred * seasonal_factor, 2)
+
+    if day > 0:
+        repeated = y_pred == np.round(previous[:, -1], 2)
+        if repeated.any():
+            nudge = seeded_uniform([f"{i}|{d}|repeat" for i, d in zip(states.item_ids, dates)], 0.1, 0.5)
+            y_pred = y_pred + np.where(repeated, nudge, 0.0)
+    return y_pred
+
+
+def synthetic_forecast(item_id, periods, method):
+    # No historical data → mild synthetic consumption pattern
+    base = 2
+    return [{"Date": None,
+             "Inventory_ID": item_id,
+             "Predicted_Consumption": round(base + np.sin(d) + seeded_uniform([f"{item_id}|{d}|synthetic"], 0, 0.5)[0], 2),
+             "Available_Stock": 0,
+             "Stock_Warning": True,
+             "Search_Method": method} for d in range(periods)]
+
+# ----------------------------
+# Public entry point
+# ----------------------------
+def missing_item_forecast(item_id, periods, method):
+    return [{"Date": None, "Inventory_ID": item_id, "Predicted_Consumption": 0,
+             "Available_Stock": 0, "Stock_Warning": True, "Search_Method": method,
+             "error": f"No historical data found for Inventory_ID '{item_id}'"}]
+
+
+def format_forecasts(states, consumption, available_stock, dates, methods):
+    warnings = (available_stock - consumption) < states.min_stock_limit[:, None]
+    date_strings = [[d.strftime("%Y-%m-%d") if pd.notna(d) else None for d in step] for step in dates]
+    results = {}
+    for row, item_id in enumerate(states.item_ids):
+        method = methods.get(item_id, "Unknown")
+        results[item_id] = [{"Date": date_strings[day][row],
+                             "Inventory_ID": item_id,
+                             "Predicted_Consumption": round(float(consumption[row, day]), 2),
+                             "Available_Stock": round(float(available_stock[row, day]), 2),
+                             "Stock_Warning": bool(warnings[row, day]),
+                             "Search_Method": method}
+                            for day in range(consumption.shape[1])]
+    return results
+
+
+def method_map(item_ids, methods):
+    if isinstance(methods, dict):
+        return {str(k): v for k, v in methods.items()}
+    return {i: methods or "Unknown" for i in item_ids}
+
+
+def forecast_many(model, state_index, item_ids, periods=7, methods=None, adjust=None,
+                  on_missing=missing_item_forecast, states=None):
+    """
+    Forecast ``periods`` days for every item in ``item_ids`` in lockstep.
+
+    Returns {Inventory_ID: [daily forecast rows]} with the same row layout ``forecast_item``
+    has always produced. ``methods`` is a Search_Method string or a per-item dict;
+    starting states come from ``state_index`` (an ItemStateIndex) unless given.
+    """
+    item_ids = list(dict.fromkeys(str(i) for i in item_ids))
+    methods = method_map(item_ids, methods)
+    if states is None:
+        states = state_index.take(item_ids)
+
+    known = states.subset(states.found)
+    consumption, available_stock, dates = rollout(model, known, periods, adjust=adjust)
+    forecasts = format_forecasts(known, consumption, available_stock, dates, methods)
+
+    return {item_id: forecasts[item_id] if item_id in forecasts
+            else on_missing(item_id, periods, methods.get(item_id, "Unknown"))
+            for item_id in item_ids}
+
+# Forecast flavours of the MCP agents, by name (forecast_batch.py precomputes them by the same name)
+# xgb_shaped is not value-compatible with the old per-item forecast_item of the semantic-search
+# agent: that one built 15 features (no lead_time_days), so the 16-feature model raised and every
+# known item forecast 0 before shaping, and its jitter came from the unseeded np.random. Here the
+# model sees the full FEATURE_COLUMNS row and the jitter is a crc32 draw per item and date.
+VARIANTS = {"xgb": {},
+            "xgb_shaped": {"adjust": flat_history_adjust, "on_missing": synthetic_forecast}}
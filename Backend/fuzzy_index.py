@@ -0,0 +1,123 @@
+# fuzzy_index.py
+# ---------------------------------------
+# Candidate-pruned fuzzy name matcher
+# A character-trigram inverted index over the (processed) names prunes each query to a
+# small candidate set, which is then scored with rapidfuzz's C token_sort_ratio.
+# extract_one() keeps thefuzz's process.extractOne(..., scorer=fuzz.token_sort_ratio)
+# semantics: same preprocessing, integer scores, first-listed name wins ties.
+# ---------------------------------------
+
+from collections import defaultdict
+
+import numpy as np
+from thefuzz import utils
+
+try:
+    from rapidfuzz import fuzz as rfuzz, process as rprocess
+except ImportError:  # thefuzz < 0.20 without rapidfuzz
+    rfuzz = rprocess = None
+    from thefuzz import fuzz, process
+
+
+def process_name(s):
+    # Preprocessing thefuzz applies to query and choices for token_sort_ratio
+    return utils.full_process(s, force_ascii=True)
+
+
+def trigrams(processed):
+    grams = set()
+    for token in processed.split():
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FuzzyNameIndex:
+    def __init__(self, names, max_candidates: int = 256):
+        self.names = list(dict.fromkeys(names))
+        self.processed = [process_name(n) for n in self.names]
+        self.max_candidates = max_candidates
+
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(self.names), dtype=np.float32)
+        for idx, processed in enumerate(self.processed):
+            grams = trigrams(processed)
+            gram_counts[idx] = len(grams)
+            for gram in grams:
+                postings[gram].append(idx)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = gram_counts
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, processed_query):
+        """Indexes of the names sharing the most trigrams with the query (Dice-ranked), in list order."""
+        grams = trigrams(processed_query)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return np.zeros(0, dtype=np.int32)
+        ids, overlap = np.unique(np.concatenate(hits), return_counts=True)
+        if len(ids) > self.max_candidates:
+            dice = 2.0 * overlap / (len(grams) + self.gram_counts[ids])
+            ids = ids[np.argpartition(-dice, self.max_candidates - 1)[:self.max_candidates]]
+        return np.sort(ids)
+
+    def extract(self, query, limit: int = 5, score_cutoff: int = 0):
+        """Ranked [(name, score, index), ...] (best first, list order on ties) among the candidates."""
+        processed_query = process_name(query)
+        if not processed_query:
+            return []
+        cand = self.candidates(processed_query)
+        if len(cand) == 0:
+            return []
+
+        if rprocess is not None:
+            scored = [(score, pos) for _, score, pos in
+                      rprocess.extract(processed_query, [self.processed[i] for i in cand],
+                                       scorer=rfuzz.token_sort_ratio, processor=None, limit=None)]
+        else:
+            scored = [(fuzz.token_sort_ratio(processed_query, self.processed[i]), pos) for pos, i in enumerate(cand)]
+        # Rank on the unrounded score like extractOne, list order on ties
+        scored.sort(key=lambda sp: (-sp[0], sp[1]))
+
+        out = []
+        for score, pos in scored[:limit]:
+            score = int(round(score))
+            if score < score_cutoff:
+                break
+            idx = int(cand[pos])
+            out.append((self.names[idx], score, idx))
+        return out
+
+    def extract_one(self, query, score_cutoff: int = 0):
+        """Best (name, score, index) for ``query``, or None if no candidate reaches ``score_cutoff``."""
+        processed_query = process_name(query)
+        if not processed_query:
+            return None
+        cand = self.candidates(processed_query)
+        if len(cand) == 0:
+            return None
+
+        if rprocess is not None:
+            match = rprocess.extractOne(processed_query, [self.processed[i] for i in cand],
+                                        scorer=rfuzz.token_sort_ratio, processor=None)
+            if match is None:
+                return None
+            _, score, pos = match
+            score = int(round(score))
+        else:
+            scores = [fuzz.token_sort_ratio(processed_query, self.processed[i]) for i in cand]
+            pos = int(np.argmax(scores))
+            score = scores[pos]
+
+        if score < score_cutoff:
+            return None
+        idx = int(cand[pos])
+        return self.names[idx], score, idx
+
+    def score(self, query, name):
+        """token_sort_ratio of ``query`` against one name, with the same preprocessing."""
+        if rfuzz is not None:
+            return int(round(rfuzz.token_sort_ratio(process_name(query), process_name(name))))
+        return fuzz.token_sort_ratio(query, name)
@@ -0,0 +1,254 @@
+# historical_store.py
+# ---------------------------------------
+# Columnar, memory-mapped copy of models/demand_forecast_base.csv
+# - one .npy file per column, opened with mmap_mode="r" so every MCP process on a host
+#   shares the same page-cache pages instead of holding its own pandas copy
+# - string columns stored as categorical codes + a categories list; numeric columns
+#   downcast only where the round trip is exact, so forecasts are unchanged
+# - the two reductions the servers need at startup (latest row per item, rows that
+#   determine the name maps) are precomputed as row-index arrays at conversion time
+# Usage: python3 historical_store.py [models/demand_forecast_base.csv] [models/demand_forecast_base.store]
+# ---------------------------------------
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+HISTORICAL_CSV = "models/demand_forecast_base.csv"
+HISTORICAL_STORE = "models/demand_forecast_base.store"
+FORMAT_VERSION = 1
+
+_NAT_DAYS = np.iinfo(np.int32).min
+
+
+# ----------------------------
+# DataFrame reductions (also the reference behaviour for the store)
+# ----------------------------
+def frame_latest_rows(historical_df):
+    """Latest row per Inventory_ID, computed with one stable sort over the whole frame."""
+    inv_ids = historical_df["Inventory_ID"].astype(str)
+    frame = historical_df.assign(Inventory_ID=inv_ids)
+    latest = frame.sort_values("Date", kind="mergesort").drop_duplicates("Inventory_ID", keep="last")
+    return latest.set_index("Inventory_ID")
+
+
+def latest_rows(historical):
+    """Latest row per Inventory_ID of a DataFrame or HistoricalStore, indexed by Inventory_ID."""
+    if isinstance(historical, HistoricalStore):
+        return historical.latest_rows()
+    return frame_latest_rows(historical)
+
+
+def frame_columns(historical, columns):
+    """The given columns (those that exist) of a DataFrame or HistoricalStore as a DataFrame."""
+    if isinstance(historical, HistoricalStore):
+        return historical.to_frame([c for c in columns if c in historical.columns])
+    return historical[[c for c in columns if c in historical.columns]]
+
+
+def name_rows(historical):
+    """
+    Rows (Item_Name, Inventory_ID, in file order) that yield the same name -> ID maps and ID set
+    as the full history: first/last row of every name plus the first row of every ID.
+    """
+    if isinstance(historical, HistoricalStore):
+        return historical.name_rows()
+    return historical
+
+# ----------------------------
+# Conversion
+# ----------------------------
+def _downcast_numeric(values):
+    """Smallest dtype that reproduces ``values`` exactly (NaN-aware); decoded back to the source dtype."""
+    values = np.asarray(values)
+    if values.dtype.kind == "f" and values.size and not np.isnan(values).any() \
+            and np.array_equal(values, np.trunc(values)) and np.abs(values).max() < 2**31:
+        values = values.astype(np.int64)  # whole-number floats (stock counts, limits, lead times)
+    if values.dtype.kind in "iu":
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(dtype)
+        return values
+    if values.dtype.kind == "f":
+        as_f32 = values.astype(np.float32)
+        if np.array_equal(as_f32.astype(values.dtype), values, equal_nan=True):
+            return as_f32
+    return values
+
+
+def _encode_dates(values):
+    ns = pd.to_datetime(values).to_numpy(dtype="datetime64[ns]")
+    nat = np.isnat(ns)
+    days = ns.astype("datetime64[D]")
+    if np.array_equal(days[~nat].astype("datetime64[ns]"), ns[~nat]):
+        out = days.astype(np.int64)
+        out[nat] = _NAT_DAYS
+        return out.astype(np.int32), "date_days"
+    return ns.astype(np.int64), "datetime_ns"
+
+
+def _sort_key_dates(days_or_ns, kind):
+    # pandas sorts NaT last, so a NaT row counts as the newest
+    key = days_or_ns.astype(np.int64)
+    missing = days_or_ns == (_NAT_DAYS if kind == "date_days" else np.iinfo(np.int64).min)
+    key[missing] = np.iinfo(np.int64).max
+    return key
+
+
+def _first_index(codes):
+    _, first = np.unique(codes, return_index=True)
+    return first
+
+
+def _last_index(codes):
+    _, first_reversed = np.unique(codes[::-1], return_index=True)
+    return len(codes) - 1 - first_reversed
+
+
+def convert_csv(csv_path: str = HISTORICAL_CSV, out_dir: str = HISTORICAL_STORE):
+    """One-time CSV -> columnar store conversion; returns the manifest."""
+    df = pd.read_csv(csv_path, parse_dates=["Date"])
+    os.makedirs(out_dir, exist_ok=True)
+    n = len(df)
+
+    columns, codes_by_name = [], {}
+    for pos, name in enumerate(df.columns):
+        series = df[name]
+        entry = {"name": name, "file": f"col{pos:03d}.npy"}
+        if name == "Date":
+            values, entry["kind"] = _encode_dates(series)
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values, entry["kind"] = _downcast_numeric(series.to_numpy()), "numeric"
+        elif pd.api.types.is_bool_dtype(series):
+            values, entry["kind"] = series.to_numpy(dtype=bool), "bool"
+        else:
+            cat = pd.Categorical(series)
+            values = cat.codes.astype(np.int32 if len(cat.categories) > 32767 else np.int16)
+            entry["kind"] = "categorical"
+            entry["categories"] = [str(c) for c in cat.categories]
+            codes_by_name[name] = values
+        np.save(os.path.join(out_dir, entry["file"]), values)
+        entry["dtype"] = str(values.dtype)
+        entry["source_dtype"] = str(series.dtype)
+        columns.append(entry)
+
+    # Precomputed reductions (row indexes into the store, file order preserved)
+    id_codes = codes_by_name.get("Inventory_ID")
+    if id_codes is None:
+        id_codes = pd.Categorical(df["Inventory_ID"].astype(str)).codes
+    date_entry = next(c for c in columns if c["name"] == "Date")
+    date_key = _sort_key_dates(np.load(os.path.join(out_dir, date_entry["file"])), date_entry["kind"])
+
+    order = np.lexsort((np.arange(n), date_key, id_codes))
+    last_in_group = np.ones(n, dtype=bool)
+    last_in_group[:-1] = id_codes[order][1:] != id_codes[order][:-1]
+    latest = order[last_in_group]
+    latest = latest[np.lexsort((latest, date_key[latest]))]  # same order as the pandas stable sort
+
+    name_codes = codes_by_name.get("Item_Name")
+    if name_codes is None:
+        name_codes = pd.Categorical(df["Item_Name"].astype(str)).codes
+    names = np.unique(np.concatenate([_first_index(name_codes), _last_index(name_codes), _first_index(id_codes)]))
+
+    np.save(os.path.join(out_dir, "latest_rows.npy"), latest.astype(np.int64))
+    np.save(os.path.join(out_dir, "name_rows.npy"), names.astype(np.int64))
+
+    manifest = {"format_version": FORMAT_VERSION,
+                "source": os.path.abspath(csv_path),
+                "source_mtime": os.path.getmtime(csv_path),
+                "rows": n,
+                "columns": columns}
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+# ----------------------------
+# Memory-mapped store
+# ----------------------------
+class HistoricalStore:
+    def __init__(self, path: str = HISTORICAL_STORE):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported historical store format in {path}; re-run historical_store.py")
+        self.columns = {c["name"]: c for c in self.manifest["columns"]}
+        self._arrays = {name: np.load(os.path.join(path, c["file"]), mmap_mode="r")
+                        for name, c in self.columns.items()}
+        self._latest = np.load(os.path.join(path, "latest_rows.npy"))
+        self._name_rows = np.load(os.path.join(path, "name_rows.npy"))
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def column(self, name):
+        """Raw memory-mapped array (categorical codes / encoded dates for those kinds)."""
+        return self._arrays[name]
+
+    def _decode(self, name, rows):
+        c, values = self.columns[name], self._arrays[name][rows]
+        if c["kind"] == "categorical":
+            return pd.Series(pd.Categorical.from_codes(values, c["categories"])).astype(c["source_dtype"])
+        if c["kind"] == "date_days":
+            out = values.astype("datetime64[D]").astype("datetime64[ns]")
+            out[values == _NAT_DAYS] = np.datetime64("NaT")
+            return out.astype(c["source_dtype"])
+        if c["kind"] == "datetime_ns":
+            return values.astype("datetime64[ns]").astype(c["source_dtype"])
+        if c["kind"] == "numeric":
+            return values.astype(c["source_dtype"])
+        return np.asarray(values)
+
+    def rows(self, rows, columns=None):
+        """Materialize the given row positions as a DataFrame with the CSV's dtypes."""
+        rows = np.asarray(rows, dtype=np.int64)
+        names = columns or list(self.columns)
+        return pd.DataFrame({name: self._decode(name, rows) for name in names})
+
+    def to_frame(self, columns=None):
+        return self.rows(np.arange(len(self)), columns)
+
+    def latest_rows(self):
+        latest = self.rows(self._latest)
+        latest["Inventory_ID"] = latest["Inventory_ID"].astype(str)
+        return latest.set_index("Inventory_ID")
+
+    def name_rows(self):
+        return self.rows(self._name_rows, ["Item_Name", "Inventory_ID"])
+
+    def nbytes(self):
+        return sum(a.nbytes for a in self._arrays.values())
+
+
+def load_historical(csv_path: str = HISTORICAL_CSV, store_path: str = HISTORICAL_STORE):
+    """
+    The historical dataset for forecasting and name resolution: the memory-mapped store when
+    it exists and is not older than the CSV, otherwise the CSV parsed with pandas.
+    """
+    if os.path.exists(os.path.join(store_path, "manifest.json")):
+        store = HistoricalStore(store_path)
+        if not os.path.exists(csv_path) or os.path.getmtime(csv_path) <= store.manifest["source_mtime"]:
+            return store
+        print(f"⚠️ {csv_path} is newer than {store_path}; loading the CSV (re-run historical_store.py)")
+    historical_df = pd.read_csv(csv_path, parse_dates=['Date'])
+    historical_df['Inventory_ID'] = historical_df['Inventory_ID'].astype(str)
+    return historical_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the historical CSV to a memory-mapped columnar store")
+    parser.add_argument("csv", nargs="?", default=HISTORICAL_CSV)
+    parser.add_argument("out", nargs="?", default=HISTORICAL_STORE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = convert_csv(args.csv, args.out)
+    store = HistoricalStore(args.out)
+    print(f"✅ {manifest['rows']} rows, {len(manifest['columns'])} columns -> {args.out} "
+          f"({store.nbytes() / 1e6:.1f} MB on disk vs {os.path.getsize(args.csv) / 1e6:.1f} MB CSV, "
+          f"{time.perf_counter() - started:.1f}s)")
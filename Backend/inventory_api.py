@@ -1,48 +1,489 @@
 # inventory_api.py
 
-from flask import Blueprint, jsonify
-import psycopg2
-import pandas as pd
+import base64
+import gzip
+import hashlib
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+import db
+from change_listener import ChangeListener, TooManySubscribers
+import forecasting
+from historical_store import load_historical
+from item_state_index import ItemStateIndex
+from feature_store import FeatureStateIndex
+from lazy import LazyResource
+from singleflight import SingleFlight
+from reorder_plan import reorder_plan
+from stock_scan import scan_low_stock
+from xgb_inference import load_model
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 inventory_api = Blueprint('inventory_api', __name__)
 
-def get_db_connection():
-   return psycopg2.connect(
-    host="localhost",
-    port="5432",
-    dbname="vectordb",
-    user="meghanarendrasimha",
-    password="Welcome@123"
-)
+# ----------------------------
+# Response helpers (JSON straight from DB rows, ETag, compression)
+# ----------------------------
+INVENTORY_FIELDS = ["inventory_id", "item_type", "item_name", "vendor_id", "lead_time_days",
+                    "avg_daily_consumption", "minimum_required", "maximum_capacity", "initial_stock",
+                    "unit_cost", "expiry_date"]
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_ROWS = 2000  # rows per cursor fetch and per streamed chunk
+MIN_COMPRESS_BYTES = 1024
+TRUE_VALUES = {"1", "true", "yes", "on"}
+MASTER_VERSION_QUERY = """
+    SELECT coalesce(max(version), 0) FROM inventory_change_log WHERE source = 'inventory_master'
+"""
+
+# Identical concurrent requests (dashboard refreshes, alert bursts) share one computation;
+# each caller still gets its own ETag / compression handling
+page_flight = SingleFlight("api_inventory")
+stats_flight = SingleFlight("api_inventory_stats")
+scan_flight = SingleFlight("api_low_stock")
+reorder_flight = SingleFlight("api_reorder_plan")
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(value):
+    return json.dumps(value, default=json_default, separators=(",", ":"))
+
+
+def json_response(body: bytes, status: int = 200):
+    """Send pre-serialized JSON with a weak ETag (304 on If-None-Match) and br/gzip compression."""
+    etag = hashlib.sha1(body).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    accepted = request.accept_encodings
+    encoding = None
+    if len(body) >= MIN_COMPRESS_BYTES:
+        if brotli is not None and accepted["br"]:
+            body, encoding = brotli.compress(body, quality=5), "br"
+        elif accepted["gzip"]:
+            body, encoding = gzip.compress(body, compresslevel=6), "gzip"
+
+    response = Response(body, status=status, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def stream_response(chunks, etag=None):
+    """Stream JSON chunks as they are produced, gzip-compressed incrementally when accepted."""
+    if request.accept_encodings["gzip"]:
+        def compressed():
+            encoder = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            for chunk in chunks:
+                data = encoder.compress(chunk)
+                if data:
+                    yield data
+            yield encoder.flush()
+
+        response = Response(stream_with_context(compressed()), mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(stream_with_context(chunks), mimetype="application/json")
+    if etag:
+        response.set_etag(etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def catalogue_etag(key):
+    """
+    Weak ETag for an inventory_master read from the change log head (sql/003, index in
+    sql/006), known before any row is fetched; None without the change log.
+    """
+    try:
+        (version,) = db.fetch_one(MASTER_VERSION_QUERY)
+    except Exception:
+        return None
+    return hashlib.sha1(f"{version}|{key}".encode()).hexdigest()
+
+
+def encode_cursor(item_name, inventory_id):
+    return base64.urlsafe_b64encode(dumps([item_name, inventory_id]).encode()).decode()
+
+
+def decode_cursor(token):
+    item_name, inventory_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    return item_name, inventory_id
+
 
+def _flag(name):
+    return request.args.get(name, "").strip().lower() in TRUE_VALUES
+
+
+def inventory_filters(args):
+    """WHERE clauses + params for the item_type / low_stock / name prefix filters."""
+    clauses, params = [], []
+    if args.get("item_type"):
+        clauses.append("item_type = %s")
+        params.append(args["item_type"])
+    if _flag("low_stock"):
+        clauses.append("coalesce(initial_stock, 0) <= coalesce(minimum_required, 0)")
+    prefix = args.get("name_prefix") or args.get("q")
+    if prefix:
+        escaped = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append("lower(item_name) LIKE %s")
+        params.append(escaped + "%")
+    return clauses, params
+
+# ----------------------------
+# Routes
+# ----------------------------
 @inventory_api.route('/api/inventory', methods=['GET'])
 def get_inventory():
+    """
+    Inventory catalogue ordered by (item_name, inventory_id).
+
+    Query params: limit (page size, max 1000; omit for the whole catalogue), cursor
+    (next_cursor of the previous page), fields (comma-separated projection), item_type,
+    low_stock, name_prefix.
+    """
     try:
-        conn = get_db_connection()
-
-        query = """
-            SELECT 
-                inventory_id,
-                item_type,
-                item_name,
-                vendor_id,
-                lead_time_days,
-                avg_daily_consumption,
-                minimum_required,
-                maximum_capacity,
-                initial_stock,
-                unit_cost,
-                expiry_date
+        fields = INVENTORY_FIELDS
+        if request.args.get("fields"):
+            fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+            unknown = sorted(set(fields) - set(INVENTORY_FIELDS))
+            if unknown:
+                return jsonify({"success": False, "error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+        limit = request.args.get("limit", type=int)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        clauses, params = inventory_filters(request.args)
+        if request.args.get("cursor"):
+            try:
+                clauses.append("(item_name, inventory_id) > (%s, %s)")
+                params.extend(decode_cursor(request.args["cursor"]))
+            except (ValueError, TypeError):
+                return jsonify({"success": False, "error": "Invalid cursor"}), 400
+
+        # Keyset columns are always selected so the next cursor can be built
+        columns = list(dict.fromkeys(fields + ["item_name", "inventory_id"]))
+        query = f"""
+            SELECT {', '.join(columns)}
             FROM inventory_master
-            ORDER BY item_name ASC;
+            {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+            ORDER BY item_name ASC, inventory_id ASC
+            {'LIMIT %s' if limit else ''}
         """
+        if limit:
+            params.append(limit + 1)
+
+        def page_chunks():
+            """The page as JSON chunks, one per cursor fetch (cursor.itersize rows)."""
+            count, last, has_more = 0, None, False
+            yield b'{"success":true,"items":['
+            with db.connection() as conn:
+                with conn.cursor(name="inventory_page") as cur:
+                    cur.itersize = STREAM_CHUNK_ROWS
+                    cur.execute(query, params)
+                    parts = []
+                    for row in cur:
+                        if limit and count == limit:
+                            has_more = True
+                            break
+                        record = dict(zip(columns, row))
+                        parts.append(dumps({f: record[f] for f in fields}))
+                        last = (record["item_name"], record["inventory_id"])
+                        count += 1
+                        if len(parts) == STREAM_CHUNK_ROWS:
+                            yield ((',' if count > len(parts) else '') + ",".join(parts)).encode()
+                            parts = []
+                    if parts:
+                        yield ((',' if count > len(parts) else '') + ",".join(parts)).encode()
+
+            next_cursor = encode_cursor(*last) if has_more and last else None
+            yield ('],"count":' + str(count) + ',"next_cursor":' + dumps(next_cursor) + '}').encode()
+
+        key = tuple(sorted(request.args.items(multi=True)))
+
+        # Whole-catalogue dumps stream straight from the cursor (gzip on the fly when accepted).
+        # Their ETag is the inventory_master change-log head, so an unchanged catalogue is a
+        # 304 without scanning it. Pages (<= MAX_PAGE_SIZE rows) are buffered for a body-hash
+        # ETag and request coalescing.
+        if not limit:
+            etag = catalogue_etag(key)
+            if etag and request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+            return stream_response(page_chunks(), etag)
 
-        df = pd.read_sql(query, conn)
-        conn.close()
+        return json_response(page_flight.do(key, lambda: b"".join(page_chunks())))
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
 
-        items = df.to_dict(orient='records')
 
-        return jsonify({"success": True, "items": items})
+STATS_QUERY = """
+    WITH inv AS (
+        SELECT inventory_id,
+               item_name,
+               coalesce(item_type, 'Unknown') AS category,
+               coalesce(initial_stock, 0) AS quantity,
+               coalesce(minimum_required, 0) AS threshold
+        FROM inventory_master
+    )
+    SELECT json_build_object(
+        'totals', (
+            SELECT json_build_object(
+                'total_items', count(*),
+                'in_stock', count(*) FILTER (WHERE quantity > threshold),
+                'low_stock', count(*) FILTER (WHERE quantity > 0 AND quantity <= threshold),
+                'out_of_stock', count(*) FILTER (WHERE quantity = 0),
+                'low_stock_alerts', count(*) FILTER (WHERE quantity <= threshold),
+                'total_quantity', coalesce(sum(quantity), 0))
+            FROM inv),
+        'categories', (
+            SELECT coalesce(json_agg(c ORDER BY c.name), '[]'::json)
+            FROM (SELECT category AS name, sum(quantity) AS quantity, count(*) AS items
+                  FROM inv GROUP BY category) c),
+        'low_stock_alerts', (
+            SELECT coalesce(json_agg(a ORDER BY a.quantity - a.threshold, a.name), '[]'::json)
+            FROM (SELECT inventory_id AS id, item_name AS name, category, quantity, threshold
+                  FROM inv
+                  WHERE quantity <= threshold
+                  ORDER BY quantity - threshold, item_name
+                  LIMIT %s) a)
+    )
+"""
+
+
+@inventory_api.route('/api/inventory/stats', methods=['GET'])
+def get_inventory_stats():
+    """
+    Dashboard aggregates computed in SQL: stock status counts, total quantity, per-category
+    breakdown and the most urgent low-stock alerts (alerts_limit, default 50, max 500).
+    Quantity is initial_stock and the threshold minimum_required, as on the dashboards.
+    """
+    try:
+        alerts_limit = max(0, min(request.args.get("alerts_limit", 50, type=int), 500))
+
+        def build_stats():
+            (stats,) = db.fetch_one(STATS_QUERY, (alerts_limit,))
+            return dumps({"success": True, **stats}).encode()
+
+        return json_response(stats_flight.do(alerts_limit, build_stats))
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
+
+
+# ----------------------------
+# Fleet-wide low-stock scan (stock_scan.py, sql/008_stock_scan_indexes.sql)
+# ----------------------------
+MAX_SCAN_HORIZON = 90
+MAX_SCAN_ITEMS = 5000
+
+# Forecast inputs are only needed by this route, so they load on the first scan
+scan_model = LazyResource("xgb_model", lambda: load_model("models/demand_agent_xgb.json",
+                                                          forecasting.FEATURE_COLUMNS))
+scan_states = LazyResource("feature_states",
+                           lambda: FeatureStateIndex(ItemStateIndex.from_frame(load_historical())).start())
+
+
+@inventory_api.route('/api/inventory/low-stock', methods=['GET'])
+def get_low_stock():
+    """
+    Items below, or forecast to fall below, their minimum stock within ``horizon`` days,
+    most urgent first. Query params: item_type, department (code or name), horizon
+    (default 7, max 90), limit (default 100, max 5000), include_ok (rank every item).
+    """
+    try:
+        horizon = max(1, min(request.args.get("horizon", 7, type=int), MAX_SCAN_HORIZON))
+        limit = max(1, min(request.args.get("limit", 100, type=int), MAX_SCAN_ITEMS))
+        item_type, department = request.args.get("item_type"), request.args.get("department")
+        include_ok = _flag("include_ok")
+
+        def build_scan():
+            result = scan_low_stock(scan_model.get(), scan_states.get(), item_type=item_type,
+                                    department=department, horizon=horizon, limit=limit, include_ok=include_ok)
+            return dumps({"success": True, **result}).encode()
+
+        key = (item_type, department, horizon, limit, include_ok)
+        return json_response(scan_flight.do(key, build_scan))
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+# ----------------------------
+# Reorder plan / purchase-order drafts per vendor (reorder_plan.py)
+# ----------------------------
+MAX_REORDER_DRAFTS = 1000
+
+
+@inventory_api.route('/api/inventory/reorder-plan', methods=['GET'])
+def get_reorder_plan():
+    """
+    Reorder point, safety stock and order quantity per item, grouped into purchase-order
+    drafts per vendor. Query params: item_type, department (code or name), vendor (ID or
+    name), service_level (default 0.95), review_days (default 7), limit (drafts, default 50).
+    """
+    try:
+        item_type, department, vendor = (request.args.get("item_type"), request.args.get("department"),
+                                         request.args.get("vendor"))
+        service_level = request.args.get("service_level", 0.95, type=float)
+        review_days = max(0, min(request.args.get("review_days", 7, type=int), 60))
+        limit = max(1, min(request.args.get("limit", 50, type=int), MAX_REORDER_DRAFTS))
+
+        def build_plan():
+            result = reorder_plan(scan_model.get(), scan_states.get(), item_type=item_type, department=department,
+                                  vendor=vendor, service_level=service_level, review_days=review_days, limit=limit)
+            return dumps({"success": True, **result}).encode()
+
+        key = (item_type, department, vendor, service_level, review_days, limit)
+        return json_response(reorder_flight.do(key, build_plan))
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+# ----------------------------
+# Change feed (sql/003_inventory_change_log.sql)
+# ----------------------------
+CHANGE_CHANNEL = "inventory_changes"
+MAX_CHANGES_PAGE = 5000
+SSE_HEARTBEAT_SECONDS = 15
+
+# One LISTEN connection for every SSE client of this process
+change_listener = ChangeListener(CHANGE_CHANNEL)
+changes_flight = SingleFlight("api_changes")
+
+CHANGES_QUERY = f"""
+    WITH changed AS (
+        SELECT inventory_id, max(version) AS version
+        FROM inventory_change_log
+        WHERE version > %s
+        GROUP BY inventory_id
+        ORDER BY max(version)
+        LIMIT %s
+    )
+    SELECT c.version, c.inventory_id, m.inventory_id IS NULL AS deleted,
+           {', '.join('m.' + f for f in INVENTORY_FIELDS)},
+           d.closing_stock, d.date AS stock_date
+    FROM changed c
+    LEFT JOIN inventory_master m ON m.inventory_id = c.inventory_id
+    LEFT JOIN LATERAL (
+        SELECT closing_stock, date
+        FROM inventory_daily
+        WHERE inventory_id = c.inventory_id
+        ORDER BY date DESC
+        LIMIT 1
+    ) d ON true
+    ORDER BY c.version
+"""
+
+
+def head_version():
+    (version,) = db.fetch_one("SELECT coalesce(max(version), 0) FROM inventory_change_log")
+    return version
+
+
+def fetch_changes(since: int, limit: int = 500):
+    """
+    Current rows of every item changed after ``since`` (oldest change first).
+    Returns a dict with items, deleted IDs, the version to resume from and has_more.
+    """
+    rows = db.fetch_all(CHANGES_QUERY, (since, limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items, deleted = [], []
+    for version, inv_id, is_deleted, *values in rows:
+        if is_deleted:
+            deleted.append(inv_id)
+            continue
+        item = dict(zip(INVENTORY_FIELDS + ["closing_stock", "stock_date"], values))
+        item["change_version"] = version
+        items.append(item)
+
+    return {"items": items,
+            "deleted": deleted,
+            "version": rows[-1][0] if rows else since,
+            "has_more": has_more}
+
+
+@inventory_api.route('/api/inventory/changes', methods=['GET'])
+def get_inventory_changes():
+    """
+    Delta feed: rows whose stock, thresholds or metadata changed after ``since``.
+    Without ``since`` only the current version is returned, to start following from.
+    """
+    try:
+        since = request.args.get("since", type=int)
+        if since is None:
+            return jsonify({"success": True, "version": head_version(), "items": [], "deleted": [],
+                            "has_more": False})
+        limit = max(1, min(request.args.get("limit", 500, type=int), MAX_CHANGES_PAGE))
+        return json_response(dumps({"success": True, **fetch_changes(since, limit)}).encode())
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+def _sse(event, version, payload):
+    return f"event: {event}\nid: {version}\ndata: {dumps(payload)}\n\n"
+
+
+@inventory_api.route('/api/inventory/stream', methods=['GET'])
+def stream_inventory_changes():
+    """
+    Server-Sent Events push of the change feed. Woken by the process-wide LISTEN on
+    inventory_changes (change_listener.py); resumes from Last-Event-ID (or ?since=) after
+    a reconnect. 503 once SSE_MAX_SUBSCRIBERS streams are open.
+    """
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", type=int)
+    try:
+        wakes = change_listener.subscribe()  # before the first read, so no NOTIFY is missed
+    except TooManySubscribers as e:
+        return jsonify({"success": False, "error": str(e)}), 503, {"Retry-After": str(SSE_HEARTBEAT_SECONDS)}
+
+    def events(since):
+        try:
+            if since is None:
+                since = head_version()
+                yield _sse("ready", since, {"version": since})
+
+            while True:
+                # Clients at the same version after a NOTIFY share one query
+                changes = changes_flight.do(since, lambda: fetch_changes(since))
+                if changes["items"] or changes["deleted"]:
+                    since = changes["version"]
+                    yield _sse("changes", since, changes)
+                    if changes["has_more"]:
+                        continue
+
+                if not change_listener.wait(wakes, SSE_HEARTBEAT_SECONDS):
+                    yield ": heartbeat\n\n"
+        finally:
+            change_listener.unsubscribe(wakes)
+
+    response = Response(stream_with_context(events(since)), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: change_listener.unsubscribe(wakes))  # also when never iterated
+    return response
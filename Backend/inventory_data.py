@@ -0,0 +1,102 @@
+# inventory_data.py
+# ---------------------------------------
+# Inventory detail fetch shared by skillsgetalldata.py and the combined MCPs
+# One SQL statement returns master, daily, consumption, finance, department
+# mapping and vendor data for any number of items (child rows aggregated to JSON)
+# Single-item fetches are coalesced: concurrent requests for the same item share one query
+# ---------------------------------------
+
+import copy
+
+import db
+from singleflight import SingleFlight
+
+DETAILS_QUERY = """
+    WITH ids AS (
+        SELECT DISTINCT unnest(%s::text[]) AS inventory_id
+    )
+    SELECT
+        ids.inventory_id,
+        (SELECT row_to_json(m) FROM (
+            SELECT inventory_id, item_name, item_type, maximum_capacity, initial_stock,
+                   unit_cost, expiry_date, lead_time_days, avg_daily_consumption, minimum_required, vendor_id
+            FROM inventory_master
+            WHERE inventory_id = ids.inventory_id
+        ) m) AS master,
+        (SELECT coalesce(json_agg(d ORDER BY d.date DESC), '[]'::json) FROM (
+            SELECT date, opening_stock, closing_stock, quantity_consumed, quantity_restocked,
+                   lead_time_days, department_count
+            FROM inventory_daily
+            WHERE inventory_id = ids.inventory_id
+            ORDER BY date DESC
+            LIMIT %s
+        ) d) AS daily,
+        (SELECT coalesce(json_agg(c ORDER BY c.date DESC), '[]'::json) FROM (
+            SELECT date, quantity_consumed, remaining_stock, department, transaction_id,
+                   batch_lot, staff_id, shift, consumption_reason
+            FROM consumption
+            WHERE inventory_id = ids.inventory_id
+            ORDER BY date DESC
+            LIMIT %s
+        ) c) AS consumption,
+        (SELECT coalesce(json_agg(f ORDER BY f.purchase_date DESC), '[]'::json) FROM (
+            SELECT purchase_date, delivery_date, quantity, unit_cost, total_cost, account_code,
+                   vendor_id, invoice_id, payment_status
+            FROM finance
+            WHERE inventory_id = ids.inventory_id
+            ORDER BY purchase_date DESC
+            LIMIT %s
+        ) f) AS finance,
+        (SELECT coalesce(json_agg(dm), '[]'::json) FROM (
+            SELECT department_code, department_name, team_member, team_member_email, manager,
+                   manager_email, min_stock_limit, max_capacity, lead_time_days, vendor_id
+            FROM inventory_department_mapping
+            WHERE inventory_id = ids.inventory_id
+        ) dm) AS department_mapping,
+        (SELECT row_to_json(v) FROM (
+            SELECT vm.vendor_id, vm.vendor_name, vm.contact_number, vm.region, vm.vendor_rating,
+                   vm.default_lead_time_days
+            FROM inventory_master im
+            JOIN vendor_master vm ON vm.vendor_id = im.vendor_id
+            WHERE im.inventory_id = ids.inventory_id
+        ) v) AS vendor
+    FROM ids
+"""
+
+
+def _clean_id(inventory_id):
+    return str(inventory_id).strip().upper()
+
+
+def fetch_inventory_data_many(inventory_ids, daily_limit: int = 7, consumption_limit: int = 7,
+                              finance_limit: int = 5):
+    """
+    Details for many items in a single query. Returns {Inventory_ID: details}; unknown
+    IDs map to {"error": ...} exactly like ``fetch_inventory_data``.
+    """
+    ids = list(dict.fromkeys(_clean_id(i) for i in inventory_ids))
+    if not ids:
+        return {}
+    rows = db.fetch_all(DETAILS_QUERY, (ids, daily_limit, consumption_limit, finance_limit))
+
+    results = {}
+    for inv_id, master, daily, consumption, finance, dept, vendor in rows:
+        if not master:
+            results[inv_id] = {"error": f"No master data found for inventory ID {inv_id}"}
+            continue
+        results[inv_id] = {"Inventory_Master": master,
+                           "Inventory_Daily": daily,
+                           "Consumption": consumption,
+                           "Finance": finance,
+                           "Department_Mapping": dept,
+                           "Vendor": vendor}
+    return {inv_id: results[inv_id] for inv_id in ids}
+
+
+details_flight = SingleFlight("inventory_details", copy=copy.deepcopy)
+
+
+def fetch_inventory_data(inventory_id: str):
+    inventory_id_clean = _clean_id(inventory_id)
+    return details_flight.do(inventory_id_clean,
+                             lambda: fetch_inventory_data_many([inventory_id_clean])[inventory_id_clean])
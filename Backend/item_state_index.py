@@ -0,0 +1,72 @@
+# item_state_index.py
+# ---------------------------------------
+# Per-item latest-state index over the historical dataset
+# One array row per Inventory_ID (date, closing stock, lags 1-7, limits, lead time)
+# Built once at load time, O(1) lookup, refreshable with an atomic swap
+# ---------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from forecasting import ItemStates, LAG_COLUMNS, states_from_frame
+from historical_store import latest_rows
+
+
+class ItemStateIndex:
+    def __init__(self, states=None):
+        self._swap(states if states is not None else states_from_frame(pd.DataFrame(), []))
+
+    @classmethod
+    def from_frame(cls, historical):
+        """``historical``: the history DataFrame or a HistoricalStore (see historical_store.py)."""
+        index = cls()
+        index.refresh(historical)
+        return index
+
+    def _swap(self, states):
+        positions = {item_id: pos for pos, item_id in enumerate(states.item_ids)}
+        # Single attribute assignment, so readers never see a half-built index
+        self._snapshot = (positions, states)
+
+    def refresh(self, historical):
+        latest = latest_rows(historical)
+        self._swap(states_from_frame(latest, latest.index.tolist()))
+
+    def __len__(self):
+        return len(self._snapshot[1])
+
+    def __contains__(self, item_id):
+        return str(item_id) in self._snapshot[0]
+
+    def ids(self):
+        return list(self._snapshot[1].item_ids)
+
+    def take(self, item_ids):
+        """ItemStates for ``item_ids`` in the given order; unknown IDs come back with found=False."""
+        positions, states = self._snapshot
+        item_ids = [str(i) for i in item_ids]
+        rows = np.array([positions.get(i, -1) for i in item_ids], dtype=np.int64)
+        found = rows >= 0
+        if len(states) == 0:
+            return states_from_frame(pd.DataFrame(), item_ids)
+        safe = np.where(found, rows, 0)
+        return ItemStates(item_ids, found, states.last_date[safe], states.closing_stock[safe],
+                          states.quantity_restocked[safe], states.lead_time_days[safe],
+                          states.lead_time_days_alt[safe], states.min_stock_limit[safe],
+                          states.max_capacity[safe], states.lags[safe])
+
+    def lookup(self, item_id):
+        """Latest state of one item as a plain dict, or None if the item has no history."""
+        positions, states = self._snapshot
+        pos = positions.get(str(item_id))
+        if pos is None:
+            return None
+        state = {"Inventory_ID": states.item_ids[pos],
+                 "Date": pd.Timestamp(states.last_date[pos]),
+                 "Closing_Stock": float(states.closing_stock[pos]),
+                 "Quantity_Restocked": float(states.quantity_restocked[pos]),
+                 "Lead_Time_Days": float(states.lead_time_days[pos]),
+                 "min_stock_limit": float(states.min_stock_limit[pos]),
+                 "max_capacity": float(states.max_capacity[pos])}
+        state.update({col: float(v) for col, v in zip(LAG_COLUMNS, states.lags[pos])})
+        return state
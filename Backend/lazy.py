@@ -0,0 +1,114 @@
+# lazy.py
+# ---------------------------------------
+# Deferred loading of heavy MCP server resources (CSV, models, embeddings, DB snapshots)
+# MCP_STARTUP_MODE:
+#   eager  - load everything before serving (previous behaviour, default)
+#   warmup - start serving immediately, load everything in a background thread
+#   lazy   - load each resource on first use
+# Resources registered with eager=False always load on first use, in every mode.
+# Every load is timed, so the registry doubles as a startup profile and readiness report.
+# ---------------------------------------
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+STARTUP_MODE = os.getenv("MCP_STARTUP_MODE", "eager").lower()
+
+
+class LazyResource:
+    def __init__(self, name, loader, eager: bool = True):
+        self.name = name
+        self.loader = loader
+        self.eager = eager
+        self._value = None
+        self._lock = threading.Lock()
+        self.ready = False
+        self.loading = False
+        self.seconds = None
+        self.error = None
+
+    def get(self):
+        if self.ready:
+            return self._value
+        with self._lock:  # concurrent first callers wait for the one load
+            if not self.ready:
+                self.loading = True
+                started = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                    self.ready, self.error = True, None
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                finally:
+                    self.loading = False
+                    self.seconds = round(time.perf_counter() - started, 3)
+        return self._value
+
+    def status(self):
+        return {"ready": self.ready, "loading": self.loading, "eager": self.eager,
+                "seconds": self.seconds, "error": self.error}
+
+
+class ResourceRegistry:
+    def __init__(self, mode: str = STARTUP_MODE):
+        self.mode = mode
+        self.created = time.perf_counter()
+        self.resources = OrderedDict()
+        self.phases = OrderedDict()  # timings recorded outside the registry (e.g. imports)
+        self.warmup_seconds = None
+        self._warmup_thread = None
+
+    def register(self, name, eager: bool = True):
+        """Decorator: ``@resources.register("xgb_model")`` on a zero-argument loader; eager=False skips load_all()."""
+        def wrap(loader):
+            self.resources[name] = LazyResource(name, loader, eager)
+            return loader
+        return wrap
+
+    def __getitem__(self, name):
+        return self.resources[name].get()
+
+    def record_phase(self, name, seconds):
+        self.phases[name] = round(seconds, 3)
+
+    def load_all(self):
+        started = time.perf_counter()
+        for resource in self.resources.values():
+            if not resource.eager:
+                continue
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"⚠️ Failed to load {resource.name}: {e}")
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        self.print_report()
+
+    def start(self):
+        if self.mode == "eager":
+            self.load_all()
+        elif self.mode == "warmup" and self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self.load_all, name="mcp-warmup", daemon=True)
+            self._warmup_thread.start()
+        return self
+
+    def status(self):
+        components = {name: r.status() for name, r in self.resources.items()}
+        return {"mode": self.mode,
+                "ready": all(c["ready"] for c in components.values() if c["eager"]),
+                "uptime_seconds": round(time.perf_counter() - self.created, 3),
+                "startup_phases_seconds": dict(self.phases),
+                "warmup_seconds": self.warmup_seconds,
+                "components": components}
+
+    def print_report(self):
+        print(f"⏱️ Startup profile ({self.mode}):")
+        for name, seconds in self.phases.items():
+            print(f"   {name:<22} {seconds:8.3f}s")
+        for name, r in self.resources.items():
+            state = ("ready" if r.ready else f"failed: {r.error}" if r.error
+                     else "not loaded" if r.eager else "on first use")
+            seconds = f"{r.seconds:8.3f}s" if r.seconds is not None else " " * 9
+            print(f"   {name:<22} {seconds}  {state}")
@@ -0,0 +1,257 @@
+# reorder_plan.py
+# ---------------------------------------
+# Catalogue-wide reorder plan shared by the MCP servers and GET /api/inventory/reorder-plan
+# - one set-based query over inventory_master, inventory_department_mapping and vendor_master
+#   (plus latest closing stock and open purchase orders, sql/008 + sql/010)
+# - one batched forecast rollout for lead time + review period demand (items without
+#   history fall back to inventory_master.avg_daily_consumption)
+# - safety stock, reorder point and order quantity computed as arrays:
+#     safety stock  = z(service level) x daily demand std x sqrt(lead time)
+#     reorder point = max(lead-time demand + safety stock, min_stock_limit)
+#     order         = up to reorder point + review-period demand, capped at maximum_capacity,
+#                     when stock on hand + on order is at or below the reorder point
+# - order lines grouped into one purchase-order draft per vendor
+# ---------------------------------------
+
+import time
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+import db
+from forecasting import consumption_matrix
+
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_REVIEW_DAYS = 7
+DEFAULT_LEAD_DAYS = 7
+MAX_LEAD_DAYS = 60
+MAX_FORECAST_DAYS = 7  # model rollout length; longer windows continue at its mean daily rate
+TAIL_DAYS = 7
+UNASSIGNED_VENDOR = "UNASSIGNED"
+
+# Minimum stock: the item's inventory_stock_limits row (sql/012, as in the low-stock scan and
+# the feature store); capacity: inventory_master.maximum_capacity, otherwise the largest
+# capacity of the (filtered) departments. On order: purchases not yet delivered.
+REORDER_QUERY = """
+    WITH limits AS (
+        SELECT inventory_id, max(max_capacity) AS max_capacity,
+               max(lead_time_days) AS lead_time_days, min(vendor_id) AS vendor_id
+        FROM inventory_department_mapping
+        WHERE %(department)s::text IS NULL
+           OR department_code = %(department)s
+           OR lower(department_name) = lower(%(department)s)
+        GROUP BY inventory_id
+    ),
+    on_order AS (
+        SELECT inventory_id, sum(quantity) AS quantity
+        FROM finance
+        WHERE delivery_date > current_date
+        GROUP BY inventory_id
+    )
+    SELECT m.inventory_id, m.item_name, m.item_type,
+           coalesce(m.vendor_id, l.vendor_id) AS vendor_id,
+           v.vendor_name, v.contact_number, v.region, v.vendor_rating,
+           coalesce(d.closing_stock, m.initial_stock, 0) AS current_stock,
+           coalesce(o.quantity, 0) AS on_order,
+           coalesce(sl.min_stock_limit, 0) AS min_stock,
+           coalesce(m.maximum_capacity, l.max_capacity) AS max_capacity,
+           coalesce(m.lead_time_days, l.lead_time_days, v.default_lead_time_days) AS lead_time_days,
+           coalesce(m.avg_daily_consumption, 0) AS avg_daily_consumption,
+           coalesce(m.unit_cost, 0) AS unit_cost
+    FROM inventory_master m
+    LEFT JOIN limits l ON l.inventory_id = m.inventory_id
+    LEFT JOIN inventory_stock_limits sl ON sl.inventory_id = m.inventory_id
+    LEFT JOIN vendor_master v ON v.vendor_id = coalesce(m.vendor_id, l.vendor_id)
+    LEFT JOIN on_order o ON o.inventory_id = m.inventory_id
+    LEFT JOIN LATERAL (
+        SELECT closing_stock
+        FROM inventory_daily
+        WHERE inventory_id = m.inventory_id
+        ORDER BY date DESC
+        LIMIT 1
+    ) d ON true
+    WHERE (%(item_type)s::text IS NULL OR m.item_type = %(item_type)s)
+      AND (%(department)s::text IS NULL OR l.inventory_id IS NOT NULL)
+      AND (%(vendor)s::text IS NULL OR coalesce(m.vendor_id, l.vendor_id) = %(vendor)s
+           OR lower(v.vendor_name) = lower(%(vendor)s))
+"""
+
+
+def fetch_reorder_inputs(item_type=None, department=None, vendor=None):
+    return db.fetch_all(REORDER_QUERY, {"item_type": item_type or None, "department": department or None,
+                                        "vendor": vendor or None})
+
+
+def _column(rows, index, default=0.0):
+    return np.fromiter((default if r[index] is None else float(r[index]) for r in rows),
+                       dtype=np.float64, count=len(rows))
+
+
+def window_demand(daily, start, end):
+    """
+    Demand over days (start, end] per item from a daily forecast (items x days); days past
+    the forecast continue at the mean rate of its last TAIL_DAYS days.
+    """
+    horizon = daily.shape[1]
+    cumulative = np.concatenate([np.zeros((len(daily), 1)), np.cumsum(daily, axis=1)], axis=1)
+    tail_rate = daily[:, -min(TAIL_DAYS, horizon):].mean(axis=1) if horizon else np.zeros(len(daily))
+
+    def through(day):
+        within = np.minimum(day, horizon)
+        return (np.take_along_axis(cumulative, within[:, None], axis=1)[:, 0]
+                + np.maximum(day - horizon, 0) * tail_rate)
+
+    return through(end) - through(start)
+
+
+def demand_std(lags, modeled, avg_daily):
+    """Daily demand std: spread of the last week's consumption, Poisson-like sqrt(rate) without history."""
+    std = np.sqrt(np.maximum(avg_daily, 0.0))
+    if len(lags):
+        std[modeled] = lags[modeled].std(axis=1, ddof=1)
+    return std
+
+
+def reorder_quantities(lead_demand, review_demand, daily_std, lead_days, position, min_stock, max_capacity,
+                       service_level: float = DEFAULT_SERVICE_LEVEL):
+    """
+    Vectorized policy for all items: (safety stock, reorder point, order-up-to level, order
+    quantity, capacity limited). ``max_capacity`` is NaN where an item has no capacity.
+    """
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * daily_std * np.sqrt(lead_days)
+    reorder_point = np.maximum(lead_demand + safety_stock, min_stock)
+    target = reorder_point + review_demand
+    capacity = np.where(np.isnan(max_capacity), np.inf, max_capacity)
+    order_up_to = np.minimum(target, capacity)
+    needed = position <= reorder_point
+    quantity = np.where(needed, np.ceil(np.maximum(order_up_to - position, 0.0)), 0.0)
+    return safety_stock, reorder_point, order_up_to, quantity, needed & (target > capacity)
+
+
+def group_by_vendor(vendor_ids, quantity, cost):
+    """(vendor codes, per-line group index, per-vendor line count, quantity and cost) for ordered lines."""
+    vendors, group = np.unique(vendor_ids, return_inverse=True)
+    return (vendors, group, np.bincount(group, minlength=len(vendors)),
+            np.bincount(group, weights=quantity, minlength=len(vendors)),
+            np.bincount(group, weights=cost, minlength=len(vendors)))
+
+
+def reorder_plan(model, state_index, item_type=None, department=None, vendor=None,
+                 service_level: float = DEFAULT_SERVICE_LEVEL, review_days: int = DEFAULT_REVIEW_DAYS,
+                 limit: int = 50, adjust=None):
+    """
+    Reorder point, safety stock and order quantity per item, and the items due for an order
+    grouped into purchase-order drafts per vendor (most urgent vendor first; ``limit`` drafts).
+    """
+    timings = {}
+    started = last = time.perf_counter()
+
+    def mark(stage):
+        nonlocal last
+        now = time.perf_counter()
+        timings[stage] = round((now - last) * 1000, 3)
+        last = now
+
+    service_level = min(max(float(service_level), 0.5), 0.999)
+    review_days = max(0, int(review_days))
+    rows = fetch_reorder_inputs(item_type, department, vendor)
+    mark("query")
+
+    n = len(rows)
+    ids = [str(r[0]) for r in rows]
+    current = _column(rows, 8)
+    on_order = _column(rows, 9)
+    min_stock = _column(rows, 10)
+    max_capacity = _column(rows, 11, default=np.nan)
+    lead_days = np.clip(_column(rows, 12, default=DEFAULT_LEAD_DAYS), 1, MAX_LEAD_DAYS).astype(np.int64)
+    avg_daily = np.maximum(_column(rows, 13), 0.0)
+    unit_cost = _column(rows, 14)
+    mark("arrays")
+
+    horizon = int(min((lead_days.max() if n else 1) + review_days, MAX_FORECAST_DAYS))
+    if n:
+        states = state_index.take(ids)  # one read for both the forecast and the demand spread
+        daily, modeled = consumption_matrix(model, state_index, ids, horizon, adjust=adjust, states=states)
+        daily[~modeled] = avg_daily[~modeled, None]
+        lags = states.lags
+    else:
+        daily, modeled, lags = np.zeros((0, horizon)), np.zeros(0, dtype=bool), np.zeros((0, 0))
+    mark("forecast")
+
+    lead_demand = window_demand(daily, np.zeros(n, dtype=np.int64), lead_days)
+    review_demand = window_demand(daily, lead_days, lead_days + review_days)
+    daily_rate = daily.mean(axis=1) if n else np.zeros(0)
+    position = current + on_order
+    safety_stock, reorder_point, order_up_to, quantity, capacity_limited = reorder_quantities(
+        lead_demand, review_demand, demand_std(lags, modeled, avg_daily), lead_days, position,
+        min_stock, max_capacity, service_level)
+    days_of_cover = np.where(daily_rate > 0, position / np.where(daily_rate > 0, daily_rate, 1.0), np.inf)
+    mark("policy")
+
+    ordered = np.flatnonzero(quantity > 0)
+    vendor_ids = np.array([rows[i][3] or UNASSIGNED_VENDOR for i in ordered], dtype=object)
+    line_cost = quantity[ordered] * unit_cost[ordered]
+    if len(ordered):
+        vendors, group, line_counts, vendor_quantity, vendor_cost = group_by_vendor(
+            vendor_ids.astype(str), quantity[ordered], line_cost)
+    else:
+        vendors, group = np.zeros(0, dtype=str), np.zeros(0, dtype=np.int64)
+        line_counts = vendor_quantity = vendor_cost = np.zeros(0)
+    # Vendors ranked by their most urgent line (least days of cover), then order value
+    urgency = np.full(len(vendors), np.inf)
+    np.minimum.at(urgency, group, days_of_cover[ordered])
+    vendor_order = np.lexsort((-vendor_cost, urgency))[:max(0, int(limit))]
+    # Lines grouped by vendor, least days of cover first within each draft
+    line_order = ordered[np.lexsort((days_of_cover[ordered], group))]
+    starts = np.concatenate([[0], np.cumsum(line_counts)[:-1]]).astype(np.int64)
+    mark("group")
+
+    today = date.today()
+    purchase_orders = []
+    for v in vendor_order:
+        lines = []
+        for i in line_order[starts[v]:starts[v] + line_counts[v]]:
+            lines.append({"Inventory_ID": ids[i],
+                          "Item_Name": rows[i][1],
+                          "Item_Type": rows[i][2],
+                          "Current_Stock": round(float(current[i]), 2),
+                          "On_Order": round(float(on_order[i]), 2),
+                          "Lead_Time_Days": int(lead_days[i]),
+                          "Lead_Time_Demand": round(float(lead_demand[i]), 2),
+                          "Safety_Stock": round(float(safety_stock[i]), 2),
+                          "Reorder_Point": round(float(reorder_point[i]), 2),
+                          "Order_Up_To": round(float(order_up_to[i]), 2),
+                          "Order_Quantity": int(quantity[i]),
+                          "Unit_Cost": round(float(unit_cost[i]), 2),
+                          "Line_Cost": round(float(quantity[i] * unit_cost[i]), 2),
+                          "Days_Of_Cover": None if np.isinf(days_of_cover[i]) else round(float(days_of_cover[i]), 1),
+                          "Capacity_Limited": bool(capacity_limited[i]),
+                          "Forecast_Source": "model" if modeled[i] else "avg_daily_consumption"})
+        first = rows[line_order[starts[v]]]
+        vendor_id = str(vendors[v])
+        max_lead = max(line["Lead_Time_Days"] for line in lines)
+        purchase_orders.append({"Vendor_ID": None if vendor_id == UNASSIGNED_VENDOR else vendor_id,
+                                "Vendor_Name": first[4],
+                                "Contact_Number": first[5],
+                                "Region": first[6],
+                                "Vendor_Rating": None if first[7] is None else float(first[7]),
+                                "Status": "Draft",
+                                "Expected_Delivery": (today + timedelta(days=max_lead)).isoformat(),
+                                "Line_Count": int(line_counts[v]),
+                                "Total_Quantity": int(vendor_quantity[v]),
+                                "Total_Cost": round(float(vendor_cost[v]), 2),
+                                "Lines": lines})
+    mark("format")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+
+    return {"filters": {"item_type": item_type or None, "department": department or None, "vendor": vendor or None},
+            "service_level": service_level,
+            "review_days": review_days,
+            "scanned": n,
+            "items_to_order": int(len(ordered)),
+            "vendors": int(len(vendors)),
+            "total_cost": round(float(line_cost.sum()), 2),
+            "purchase_orders": purchase_orders,
+            "timings_ms": timings}
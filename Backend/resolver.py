@@ -0,0 +1,263 @@
+# resolver.py
+# ---------------------------------------
+# Inventory name resolution shared by the MCP servers
+# NameCatalog builds every name feature once (normalized historical / master maps,
+# ID set, trigram fuzzy index). InventoryResolver normalizes a query once, probes the
+# exact maps, the fuzzy index and the vector index once each, then scores the union of
+# candidates lexically and semantically in a single pass -> ranked top-k + timings.
+# The top match keeps the previous precedence: exact ID, exact name (historical, then
+# master), semantic (>= 0.7), fuzzy token_sort_ratio (>= 55).
+# ---------------------------------------
+
+import re
+import threading
+import time
+
+from cache import TTLCache
+from fuzzy_index import FuzzyNameIndex
+from historical_store import name_rows
+from vector_index import normalize_rows
+
+
+def normalize_text(s: str):
+    if not s:
+        return ""
+    s = str(s)
+    s = s.replace('\xa0', ' ')
+    s = s.lower()
+    s = re.sub(r'\s+', ' ', s)
+    s = re.sub(r'[^\w\s]', ' ', s)
+    s = re.sub(r'\s+', ' ', s)
+    return s.strip()
+
+
+class NameCatalog:
+    """Normalized name maps for historical + inventory_master items, built once."""
+
+    def __init__(self, historical, master_map):
+        historical_df = name_rows(historical)  # the full frame, or the reduced rows of a HistoricalStore
+        names = [normalize_text(n) for n in historical_df['Item_Name'].fillna("").astype(str)]
+        self.historical_name_to_id = dict(zip(names, historical_df['Inventory_ID'].astype(str)))
+        self.master_name_to_id = {normalize_text(k): str(v) for k, v in master_map.items()}
+
+        # Master names first, then historical-only names (fuzzy ties favour master)
+        self.combined_name_to_id = dict(self.master_name_to_id)
+        for name, inv_id in self.historical_name_to_id.items():
+            self.combined_name_to_id.setdefault(name, inv_id)
+        self.combined_names = list(self.combined_name_to_id)
+
+        self.id_to_name = {}
+        for name, inv_id in self.combined_name_to_id.items():
+            self.id_to_name.setdefault(inv_id, name)
+
+        self.inventory_ids = set(historical_df['Inventory_ID'].astype(str))
+        self.inventory_ids.update(self.master_name_to_id.values())
+        self.fuzzy_index = FuzzyNameIndex(self.combined_names)
+
+    def __len__(self):
+        return len(self.inventory_ids)
+
+    def fuzzy_source(self, name):
+        return "Fuzzy Name (master)" if name in self.master_name_to_id else "Fuzzy Name (historical)"
+
+
+class InventoryResolver:
+    """
+    encode(text) -> vector enables the semantic stage (with ``vector_index``);
+    ``embeddings`` = (ids, matrix) lets lexical-only candidates get a semantic score too.
+    resolve_ids() results are memoized per normalized query; "not found" is cached
+    for ``negative_ttl`` only, and update() drops the memo.
+    """
+
+    def __init__(self, catalog, vector_index=None, encode=None, embeddings=None,
+                 semantic_threshold: float = 0.7, fuzzy_threshold: int = 55, candidate_pool: int = 20,
+                 memo_size: int = 4096, memo_ttl: float = 3600.0, negative_ttl: float = 120.0):
+        self.encode = encode
+        self.semantic_threshold = semantic_threshold
+        self.fuzzy_threshold = fuzzy_threshold
+        self.candidate_pool = candidate_pool
+        self.memo = TTLCache(maxsize=memo_size, ttl=memo_ttl)
+        self.negative_ttl = negative_ttl
+        self.negative_stored = 0
+        self.negative_hits = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+        # (catalog, vector_index, embedding_rows, embeddings): replaced as a whole by update()
+        self._snapshot = (catalog, vector_index) + self._embedding_rows(embeddings)
+
+    @staticmethod
+    def _embedding_rows(embeddings):
+        if embeddings is None or not len(embeddings[0]):
+            return {}, None
+        ids, matrix = embeddings
+        return {str(i): row for row, i in enumerate(ids)}, normalize_rows(matrix)
+
+    @property
+    def catalog(self):
+        return self._snapshot[0]
+
+    @property
+    def vector_index(self):
+        return self._snapshot[1]
+
+    def update(self, catalog=None, vector_index=None, embeddings=None):
+        """Atomically swap in reloaded name maps / embeddings and invalidate memoized resolutions."""
+        rows = self._embedding_rows(embeddings) if embeddings is not None else None
+        with self._lock:
+            old_catalog, old_index, old_rows, old_embeddings = self._snapshot
+            self._snapshot = (catalog if catalog is not None else old_catalog,
+                              vector_index if vector_index is not None else old_index) + \
+                             (rows if rows is not None else (old_rows, old_embeddings))
+            self.generation += 1
+            self.memo.invalidate()
+
+    def _semantic_ready(self, vector_index):
+        return self.encode is not None and vector_index is not None and len(vector_index) > 0
+
+    @staticmethod
+    def _match(catalog, inv_id, method, score, lexical=None, semantic=None, accepted=True):
+        return {"Inventory_ID": inv_id,
+                "Item_Name": catalog.id_to_name.get(inv_id),
+                "Search_Method": method,
+                "score": round(float(score), 4),
+                "lexical": lexical,
+                "semantic": None if semantic is None else round(float(semantic), 4),
+                "accepted": accepted}
+
+    def resolve(self, query, top_k: int = 5):
+        """
+        Ranked matches for ``query``: {"query", "matches", "timings_ms"}. matches[0] is the
+        resolved item when its ``accepted`` flag is set; the rest are disambiguation candidates.
+        """
+        timings = {}
+        started = last = time.perf_counter()
+
+        def mark(stage):
+            nonlocal last
+            now = time.perf_counter()
+            timings[stage] = round((now - last) * 1000, 3)
+            last = now
+
+        def result(matches):
+            timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+            return {"query": query, "matches": matches, "timings_ms": timings}
+
+        raw = str(query or "").strip()
+        input_upper = raw.upper()
+        input_clean = normalize_text(raw)
+        mark("normalize")
+        if not raw:
+            return result([])
+
+        # 1️⃣ Exact ID / exact name: dictionary probes, no scoring needed
+        catalog, vector_index, embedding_rows, embeddings = self._snapshot
+        exact = None
+        if input_upper in catalog.inventory_ids:
+            exact = (input_upper, "Exact Inventory_ID")
+        elif input_clean in catalog.historical_name_to_id:
+            exact = (catalog.historical_name_to_id[input_clean], "Exact Name (historical)")
+        elif input_clean in catalog.master_name_to_id:
+            exact = (catalog.master_name_to_id[input_clean], "Exact Name (master)")
+        mark("exact")
+        if exact:
+            return result([self._match(catalog, exact[0], exact[1], 1.0)])
+
+        pool = max(top_k, self.candidate_pool)
+
+        # 2️⃣ One vector probe
+        semantic, query_vec, best_semantic = {}, None, None
+        if self._semantic_ready(vector_index):
+            query_vec = normalize_rows(self.encode(raw))[0]
+            for inv_id, score in vector_index.search(query_vec, k=pool):
+                semantic.setdefault(str(inv_id), score)
+            best_semantic = next(iter(semantic), None)
+        mark("semantic")
+
+        # 3️⃣ One fuzzy index probe (best name per ID, extractOne order)
+        lexical, fuzzy_names = {}, {}
+        for name, score, _ in catalog.fuzzy_index.extract(input_clean, limit=pool):
+            inv_id = catalog.combined_name_to_id[name]
+            if inv_id not in lexical:
+                lexical[inv_id], fuzzy_names[inv_id] = score, name
+        mark("fuzzy")
+
+        # 4️⃣ Shared candidate set: fill in the missing signal for each candidate
+        for inv_id in semantic.keys() - lexical.keys():
+            name = catalog.id_to_name.get(inv_id)
+            lexical[inv_id] = catalog.fuzzy_index.score(input_clean, name) if name else 0
+        if query_vec is not None and embeddings is not None:
+            for inv_id in lexical.keys() - semantic.keys():
+                row = embedding_rows.get(inv_id)
+                if row is not None:
+                    semantic[inv_id] = float(embeddings[row] @ query_vec)
+
+        def method_for(inv_id):
+            sem = semantic.get(inv_id)
+            if sem is not None and sem >= self.semantic_threshold:
+                return f"Semantic Search (score={sem:.2f})"
+            if lexical[inv_id] >= self.fuzzy_threshold:
+                name = fuzzy_names.get(inv_id) or catalog.id_to_name.get(inv_id, "")
+                return f"{catalog.fuzzy_source(name)} (score={lexical[inv_id]})"
+            return None
+
+        def hybrid(inv_id):
+            sem = semantic.get(inv_id)
+            lex = lexical[inv_id] / 100
+            return lex if sem is None else 0.5 * (lex + sem)
+
+        # Resolved item: best semantic hit over the threshold, else the best fuzzy hit
+        primary = None
+        if best_semantic is not None and semantic[best_semantic] >= self.semantic_threshold:
+            primary = best_semantic
+        if primary is None and fuzzy_names:
+            best_lex = next(iter(fuzzy_names))
+            if lexical[best_lex] >= self.fuzzy_threshold:
+                primary = best_lex
+
+        ranked = sorted(lexical, key=hybrid, reverse=True)
+        if primary is not None:
+            ranked.remove(primary)
+            ranked.insert(0, primary)
+
+        matches = []
+        for inv_id in ranked[:top_k]:
+            method = method_for(inv_id)
+            matches.append(self._match(catalog, inv_id, method or "Candidate", hybrid(inv_id),
+                                       lexical[inv_id], semantic.get(inv_id), accepted=method is not None))
+        mark("score")
+        return result(matches)
+
+    def resolve_ids(self, query):
+        """[(Inventory_ID, Search_Method)] of the resolved item, or [] (previous resolver contract)."""
+        raw = str(query or "").strip()
+        if raw.upper() in self.catalog.inventory_ids:
+            return [(raw.upper(), "Exact Inventory_ID")]  # checked first: IDs differ from their normalized form
+
+        key = normalize_text(raw)
+        cached = self.memo.get(key)
+        if cached is not None:
+            if not cached:
+                self.negative_hits += 1
+            return list(cached)
+
+        generation = self.generation
+        matches = self.resolve(raw, top_k=1)["matches"]
+        resolved = []
+        if matches and matches[0]["accepted"]:
+            resolved = [(matches[0]["Inventory_ID"], matches[0]["Search_Method"])]
+
+        with self._lock:
+            if generation == self.generation:  # not computed against maps that were just replaced
+                if resolved:
+                    self.memo.set(key, tuple(resolved))
+                else:
+                    self.memo.set(key, (), ttl=self.negative_ttl)
+                    self.negative_stored += 1
+        return resolved
+
+    def stats(self):
+        return {**self.memo.stats(),
+                "negative_ttl_seconds": self.negative_ttl,
+                "negative_stored": self.negative_stored,
+                "negative_hits": self.negative_hits,
+                "generation": self.generation}
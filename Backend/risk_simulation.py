@@ -0,0 +1,208 @@
+# risk_simulation.py
+# ---------------------------------------
+# Monte Carlo stockout risk: probability that an item runs out before a replenishment
+# ordered today could arrive (its lead_time_days), instead of one point forecast
+# - ResidualPool: the XGBoost model's one-step residuals (actual - predicted consumption)
+#   over each item's recent history; items with too few residuals draw from the pooled set
+# - demand paths = point forecast (forecasting.consumption_matrix) + bootstrapped residuals,
+#   clipped at zero; depletion is simulated as one items x paths x days array per block
+# Sampling is seeded, so the same inputs give the same probabilities.
+# ---------------------------------------
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+from historical_store import frame_columns
+from stock_scan import fetch_stock_levels
+
+RESIDUAL_WINDOW = int(os.getenv("STOCKOUT_RESIDUAL_DAYS", "90"))  # most recent rows per item
+MIN_ITEM_RESIDUALS = 20
+DEFAULT_PATHS = 1000
+MAX_LEAD_DAYS = 60
+DEFAULT_LEAD_DAYS = 7
+BLOCK_ELEMENTS = 4_000_000  # items x paths x days simulated per block (bounds memory)
+
+
+class ResidualPool:
+    """Per-item residual samples stored flat (one segment per item, the pooled set last)."""
+
+    def __init__(self, item_ids, offsets, counts, residuals, pooled_offset, pooled_count):
+        self.positions = {item_id: pos for pos, item_id in enumerate(item_ids)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.residuals = np.asarray(residuals, dtype=np.float32)
+        self.pooled_offset = pooled_offset
+        self.pooled_count = pooled_count
+
+    @classmethod
+    def from_history(cls, model, historical, window: int = RESIDUAL_WINDOW):
+        columns = ["Inventory_ID", "Date", "Quantity_Consumed", "Opening_Stock", "Closing_Stock",
+                   "Quantity_Restocked", "Lead_Time_Days", "lead_time_days", "min_stock_limit",
+                   "max_capacity"] + forecasting.LAG_COLUMNS
+        frame = frame_columns(historical, columns)
+        frame = frame.assign(Inventory_ID=frame["Inventory_ID"].astype(str),
+                             Date=pd.to_datetime(frame["Date"]),
+                             Quantity_Consumed=pd.to_numeric(frame["Quantity_Consumed"], errors="coerce"))
+        frame = frame[frame["Quantity_Consumed"].notna()]
+        frame = frame.sort_values(["Inventory_ID", "Date"], kind="mergesort")
+        frame = frame[frame.groupby("Inventory_ID").cumcount(ascending=False) < window]
+
+        predicted = np.maximum(0.0, forecasting.predict_matrix(model, forecasting.feature_matrix(frame)))
+        residuals = (frame["Quantity_Consumed"].to_numpy(dtype=np.float64) - predicted).astype(np.float32)
+
+        item_ids, starts, counts = np.unique(frame["Inventory_ID"].to_numpy(), return_index=True,
+                                             return_counts=True)
+        pooled = residuals if len(residuals) else np.zeros(1, dtype=np.float32)
+        return cls([str(i) for i in item_ids], starts, counts, np.concatenate([residuals, pooled]),
+                   len(residuals), len(pooled))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def segments(self, item_ids):
+        """(offsets, counts, own) per item: its own residuals when it has enough, else the pooled set."""
+        rows = np.array([self.positions.get(str(i), -1) for i in item_ids], dtype=np.int64)
+        own = rows >= 0
+        own[own] = self.counts[rows[own]] >= MIN_ITEM_RESIDUALS
+        offsets = np.full(len(rows), self.pooled_offset, dtype=np.int64)
+        counts = np.full(len(rows), self.pooled_count, dtype=np.int64)
+        offsets[own] = self.offsets[rows[own]]
+        counts[own] = self.counts[rows[own]]
+        return offsets, counts, own
+
+    def stats(self):
+        return {"items": len(self), "residuals": int(self.pooled_count),
+                "residual_std": round(float(self.residuals[self.pooled_offset:].std()), 4)}
+
+
+def simulate_stockouts(mean, current, min_limit, lead_days, offsets, counts, residuals,
+                       paths: int = DEFAULT_PATHS, seed: int = 0):
+    """
+    Vectorized depletion simulation. ``mean``: items x days point forecast; paths sample
+    residuals[offset + U*count] per item and day. Returns per item: stockout probability,
+    expected stockout day (1-based, among paths that run out; NaN if none) and the
+    probability of falling below ``min_limit`` within ``lead_days``.
+    """
+    n, days = mean.shape
+    p_out = np.zeros(n)
+    expected_day = np.full(n, np.nan)
+    p_below = np.zeros(n)
+    if n == 0 or days == 0:
+        return p_out, expected_day, p_below
+
+    rng = np.random.default_rng(seed)
+    lead_days = np.clip(np.asarray(lead_days, dtype=np.int64), 1, days)
+    # Items grouped by lead time: each block simulates exactly its own window. Demand is
+    # non-negative, so stock only falls: the window's last day decides stockout / below
+    # minimum, and the number of days still in stock gives the first stockout day
+    for lead in np.unique(lead_days):
+        members = np.flatnonzero(lead_days == lead)
+        block = max(1, BLOCK_ELEMENTS // (paths * lead))
+        for start in range(0, len(members), block):
+            rows = members[start:start + block]
+            # days x items x paths, so each day's running total is one contiguous slab add
+            draw = rng.random((lead, len(rows), paths), dtype=np.float32)
+            draw *= counts[rows, None].astype(np.float32)
+            idx = draw.astype(np.int32)
+            idx += offsets[rows, None].astype(np.int32)
+            demand = residuals[idx]
+            demand += mean[rows, :lead].T[:, :, None].astype(np.float32)
+            np.maximum(demand, 0.0, out=demand)
+
+            stock = current[rows, None].astype(np.float32)
+            used = demand[0]
+            days_in_stock = (used < stock).astype(np.int16)
+            for day in range(1, lead):
+                used += demand[day]
+                days_in_stock += used < stock
+
+            ran_out = days_in_stock < lead
+            hits = ran_out.sum(axis=1)
+            p_out[rows] = hits / paths
+            with np.errstate(invalid="ignore", divide="ignore"):
+                expected_day[rows] = np.where(hits > 0, np.where(ran_out, days_in_stock + 1, 0).sum(axis=1) / hits,
+                                              np.nan)
+            last = stock - used
+            p_below[rows] = (last < min_limit[rows, None]).mean(axis=1)
+
+    # Already out of stock / below minimum before the first simulated day
+    empty = current <= 0
+    p_out[empty], expected_day[empty] = 1.0, 0.0
+    p_below[current < min_limit] = 1.0
+    return p_out, expected_day, p_below
+
+
+def stockout_risk(model, state_index, residual_pool, item_ids=None, item_type=None, department=None,
+                  paths: int = DEFAULT_PATHS, min_probability: float = 0.0, limit: int = 100,
+                  adjust=None, seed: int = 0):
+    """
+    Stockout probability before each item's lead time elapses, highest risk first (ties:
+    earlier expected stockout day). ``item_ids`` restricts the run to those items.
+    """
+    timings = {}
+    started = last = time.perf_counter()
+
+    def mark(stage):
+        nonlocal last
+        now = time.perf_counter()
+        timings[stage] = round((now - last) * 1000, 3)
+        last = now
+
+    paths = max(1, int(paths))
+    rows = fetch_stock_levels(item_type, department, item_ids)
+    mark("stock_query")
+
+    n = len(rows)
+    ids = [str(r[0]) for r in rows]
+    current = np.fromiter((float(r[3]) for r in rows), dtype=np.float64, count=n)
+    min_limit = np.fromiter((float(r[5]) for r in rows), dtype=np.float64, count=n)
+    avg_daily = np.fromiter((float(r[6]) for r in rows), dtype=np.float64, count=n)
+    lead_days = np.fromiter((DEFAULT_LEAD_DAYS if r[7] is None else int(r[7]) for r in rows),
+                            dtype=np.int64, count=n)
+    lead_days = np.clip(lead_days, 1, MAX_LEAD_DAYS)
+    horizon = int(lead_days.max()) if n else 1
+
+    if n:
+        mean, modeled = forecasting.consumption_matrix(model, state_index, ids, horizon, adjust=adjust)
+        mean[~modeled] = avg_daily[~modeled, None]
+    else:
+        mean, modeled = np.zeros((0, horizon)), np.zeros(0, dtype=bool)
+    mark("forecast")
+
+    offsets, counts, own = residual_pool.segments(ids)
+    p_out, expected_day, p_below = simulate_stockouts(mean, current, min_limit, lead_days, offsets, counts,
+                                                      residual_pool.residuals, paths=paths, seed=seed)
+    mark("simulate")
+
+    order = np.lexsort((np.nan_to_num(expected_day, nan=MAX_LEAD_DAYS + 1), -p_out))
+    order = order[p_out[order] >= min_probability][:max(0, int(limit))]
+    in_window = np.arange(1, horizon + 1) <= lead_days[:, None]
+    lead_demand = (mean * in_window).sum(axis=1)
+
+    items = []
+    for i in order:
+        items.append({"Inventory_ID": ids[i],
+                      "Item_Name": rows[i][1],
+                      "Item_Type": rows[i][2],
+                      "Current_Stock": round(float(current[i]), 2),
+                      "Min_Stock_Limit": round(float(min_limit[i]), 2),
+                      "Lead_Time_Days": int(lead_days[i]),
+                      "Expected_Demand_Lead_Time": round(float(lead_demand[i]), 2),
+                      "Stockout_Probability": round(float(p_out[i]), 4),
+                      "Expected_Stockout_Day": None if np.isnan(expected_day[i]) else round(float(expected_day[i]), 2),
+                      "Below_Min_Probability": round(float(p_below[i]), 4),
+                      "Forecast_Source": "model" if modeled[i] else "avg_daily_consumption",
+                      "Residual_Source": "item" if own[i] else "pooled"})
+    mark("rank")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+
+    return {"paths": paths,
+            "filters": {"item_type": item_type or None, "department": department or None},
+            "scanned": n,
+            "at_risk": int(((p_out > 0) & (p_out >= min_probability)).sum()),
+            "items": items,
+            "timings_ms": timings}
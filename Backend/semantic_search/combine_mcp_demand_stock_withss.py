@@ -5,25 +5,45 @@
 # Existing fuzzy & exact matching logic preserved
 # ---------------------------------------
 
-import psycopg2
-import pandas as pd
+import time
+_imports_started = time.perf_counter()
+
 from fastmcp import FastMCP
-from xgboost import XGBRegressor
-from thefuzz import fuzz, process
+import asyncio
 import re
 import uuid
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from email.message import EmailMessage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 import os
+import sys
 import pickle
 import base64
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+from inventory_data import fetch_inventory_data, fetch_inventory_data_many
+from vector_index import build_vector_index
+from item_state_index import ItemStateIndex
+from feature_store import FeatureStateIndex
+from historical_store import load_historical
+from xgb_inference import load_model
+from forecast_cache import ForecastCache, fetch_data_versions
+from forecast_store import PrecomputedForecasts
+import stock_scan
+import risk_simulation
+import reorder_plan as reorder_planner
+import singleflight
+import tool_pools
+from tool_pools import call_cpu, limited, run_cpu, run_db, run_io
+from resolver import NameCatalog, InventoryResolver
+from catalog_refresh import CatalogWatcher
+from lazy import ResourceRegistry
+
+# Heavy resources (CSV, XGBoost, SentenceTransformer, DB snapshots) are registered below
+# and loaded according to MCP_STARTUP_MODE=eager|warmup|lazy (see lazy.py)
+resources = ResourceRegistry()
+resources.record_phase("imports", time.perf_counter() - _imports_started)
 
 # ----------------------------
 # Initialize MCP
@@ -33,101 +53,80 @@ mcp = FastMCP("Inventory & Demand MCP 📦🧠")
 # ----------------------------
 # PostgreSQL setup
 # ----------------------------
-conn = psycopg2.connect(
- 
-)
-cur = conn.cursor()
+# Pooled connections from db.py (PG* environment variables). Every tool call
+# borrows its own cursor, so concurrent SSE sessions never share one.
+# The heavy tools are async: queries, model / encode / fuzzy work and Gmail calls run
+# on bounded worker pools with per-tool concurrency limits (tool_pools.py).
 
 # ----------------------------
 # Load historical dataset for demand forecasting
 # ----------------------------
-historical_df = pd.read_csv("models/demand_forecast_base.csv", parse_dates=['Date'])
-historical_df['Inventory_ID'] = historical_df['Inventory_ID'].astype(str)
+@resources.register("historical")
+def load_historical_data():
+    return load_historical()  # memory-mapped store (historical_store.py) or the CSV
 
-# ----------------------------
-# Load inventory_master names from DB
-# ----------------------------
-def load_inventory_master_names():
-    cur.execute("SELECT inventory_id, item_name FROM inventory_master")
-    rows = cur.fetchall()
-    master_map = {}
-    for r in rows:
-        inv_id = str(r[0]).strip()
-        name = r[1] or ""
-        master_map[name] = inv_id
-    return master_map
-
-inventory_master_map = load_inventory_master_names()
+@resources.register("item_state_index")
+def load_item_state_index():
+    return ItemStateIndex.from_frame(resources["historical"])  # latest state per item, O(1) lookup
 
-# ----------------------------
-# Normalization utilities and precompute cleaned name maps
-# ----------------------------
-def normalize_text(s: str):
-    if not s:
-        return ""
-    s = str(s)
-    s = s.replace('\xa0', ' ')
-    s = s.lower()
-    s = re.sub(r'\s+', ' ', s)
-    s = re.sub(r'[^\w\s]', ' ', s)
-    s = re.sub(r'\s+', ' ', s)
-    return s.strip()
-
-historical_names_clean = [normalize_text(n) for n in historical_df['Item_Name'].fillna("").astype(str)]
-historical_name_to_id = dict(zip(historical_names_clean, historical_df['Inventory_ID'].astype(str)))
-
-master_names_clean = [normalize_text(n) for n in inventory_master_map.keys()]
-master_name_to_id = {normalize_text(k): v for k, v in inventory_master_map.items()}
-
-combined_names_clean = []
-combined_name_to_id = {}
-for name in master_name_to_id:
-    combined_names_clean.append(name)
-    combined_name_to_id[name] = master_name_to_id[name]
-for name, inv_id in historical_name_to_id.items():
-    if name not in combined_name_to_id:
-        combined_names_clean.append(name)
-        combined_name_to_id[name] = str(inv_id)
-
-inventory_ids_set = set(historical_df['Inventory_ID'].astype(str))
-inventory_ids_set.update({str(v) for v in inventory_master_map.values()})
+@resources.register("feature_states")
+def load_feature_states():
+    # Latest lags / stock from the SQL feature store (sql/009), the CSV index for unknown items;
+    # dirty items are recomputed by a background thread, never on the read path
+    return FeatureStateIndex(resources["item_state_index"]).start()
 
 # ----------------------------
 # Load trained XGBoost model
 # ----------------------------
 model_path = "models/demand_agent_xgb.json"
-xgb_model = XGBRegressor()
-xgb_model.load_model(model_path)
+
+@resources.register("xgb_model")
+def load_xgb_model():
+    return load_model(model_path, forecasting.FEATURE_COLUMNS)  # NumPy trees, xgboost fallback
+
+@resources.register("residual_pool", eager=False)
+def load_residual_pool():
+    # One-step model residuals per item (recent history) for the stockout simulation; slow
+    # (a full-history model pass), so it is built on the first stockout_risk call, never at startup
+    return risk_simulation.ResidualPool.from_history(resources["xgb_model"], resources["historical"])
 
 # ----------------------------
 # Semantic search setup
 # ----------------------------
-sem_model = SentenceTransformer('paraphrase-MiniLM-L3-v2')  # 128-dim
-
-def load_inventory_embeddings():
-    cur.execute("SELECT inventory_id, embedding FROM inventory_master WHERE embedding IS NOT NULL")
-    rows = cur.fetchall()
-    emb_map = {}
-    for inv_id, emb in rows:
-        if emb:
-            emb_map[str(inv_id)] = np.array(emb, dtype=np.float32)
-    return emb_map
-
-inventory_embeddings = load_inventory_embeddings()
-inventory_ids = list(inventory_embeddings.keys())
-emb_matrix = np.stack(list(inventory_embeddings.values())) if inventory_embeddings else np.zeros((0,128))
-
-def semantic_search(query: str, top_k: int = 1, threshold: float = 0.7):
-    if len(inventory_embeddings) == 0:
-        return None, 0.0
-    query_emb = sem_model.encode(query)
-    emb_norms = np.linalg.norm(emb_matrix, axis=1) * np.linalg.norm(query_emb)
-    sims = np.dot(emb_matrix, query_emb) / (emb_norms + 1e-10)
-    best_idx = np.argmax(sims)
-    best_score = sims[best_idx]
-    if best_score >= threshold:
-        return inventory_ids[best_idx], best_score
-    return None, 0.0
+EMBEDDING_DIM = 128
+
+@resources.register("sem_model")
+def load_sem_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('paraphrase-MiniLM-L3-v2')  # 128-dim
+
+# inventory_master names + embeddings from DB (hot-reloaded, see catalog_refresh.py)
+catalog_watcher = CatalogWatcher(with_embeddings=True)
+
+@resources.register("resolver")
+def load_resolver():
+    snapshot = catalog_watcher.load()
+    ids, matrix = snapshot.embedding_matrix(EMBEDDING_DIM)
+    # Normalized name maps + fuzzy index, and a pre-normalized exact vector index for small
+    # catalogues / IVF / pgvector HNSW for large ones (VECTOR_INDEX=flat|ivf|pgvector|auto).
+    # Exact / semantic / fuzzy stages are scored over one shared candidate set.
+    return InventoryResolver(NameCatalog(resources["historical"], snapshot.master_map()),
+                             build_vector_index(ids, matrix), resources["sem_model"].encode,
+                             embeddings=(ids, matrix),
+                             semantic_threshold=0.7, fuzzy_threshold=55)
+
+def apply_catalog_snapshot(snapshot):
+    """Rebuild name maps and the vector index off the request path, then swap them in at once."""
+    # Never load the resolver from here: its loader calls catalog_watcher.load(), which waits
+    # on the refresh lock this callback runs under. Its first load reads the catalogue itself.
+    if not resources.resources["resolver"].ready:
+        return False
+    ids, matrix = snapshot.embedding_matrix(EMBEDDING_DIM)
+    resources["resolver"].update(catalog=NameCatalog(resources["historical"], snapshot.master_map()),
+                                 vector_index=build_vector_index(ids, matrix),
+                                 embeddings=(ids, matrix))
+
+catalog_watcher.on_change = apply_catalog_snapshot
 
 # ----------------------------
 # Utility functions
@@ -149,141 +148,42 @@ def extract_periods_from_query(query: str, default: int = 7) -> int:
 def resolve_inventory_ids(input_str: str):
     if not input_str:
         return []
-
-    raw = str(input_str).strip()
-    input_upper = raw.upper()
-    input_clean = normalize_text(raw)
-
-    # 1️⃣ Exact Inventory ID
-    if input_upper in inventory_ids_set:
-        return [(input_upper, "Exact Inventory_ID")]
-
-    # 2️⃣ Exact Name
-    if input_clean in historical_name_to_id:
-        return [(str(historical_name_to_id[input_clean]), "Exact Name (historical)")]
-    if input_clean in master_name_to_id:
-        return [(str(master_name_to_id[input_clean]), "Exact Name (master)")]
-
-    # 3️⃣ Semantic search
-    sem_id, sem_score = semantic_search(raw, top_k=1, threshold=0.7)
-    if sem_id:
-        return [(sem_id, f"Semantic Search (score={sem_score:.2f})")]
-
-    # 4️⃣ Fuzzy fallback
-    if input_clean:
-        match = process.extractOne(input_clean, combined_names_clean, scorer=fuzz.token_sort_ratio)
-        if match:
-            match_name, score = match
-            if score >= 55:
-                inv_id = combined_name_to_id.get(match_name)
-                source = "Fuzzy Name (master)" if match_name in master_name_to_id else "Fuzzy Name (historical)"
-                return [(str(inv_id), f"{source} (score={score})")]
-
-    return []
+    return resources["resolver"].resolve_ids(input_str)
 
 # ----------------------------
 # Forecasting functions
 # ----------------------------
-def forecast_item(item_id: str, periods: int = 7, method: str = "Unknown"):
-    df_item = historical_df[historical_df['Inventory_ID'] == str(item_id)].sort_values('Date').copy()
-    if df_item.empty:
-        return [{"Date": None, "Inventory_ID": item_id, "Predicted_Consumption": 0,
-                 "Available_Stock": 0, "Stock_Warning": True, "Search_Method": method,
-                 "error": f"No historical data found for Inventory_ID '{item_id}'"}]
-
-    last_row = df_item.iloc[-1].copy()
-    defaults = {'Closing_Stock': 100, 'Lead_Time_Days': 3, 'lead_time_days': 3,
-                'min_stock_limit': 10, 'max_capacity': 500, 'Quantity_Consumed': 0}
-    for col, val in defaults.items():
-        if col not in last_row or pd.isna(last_row[col]):
-            last_row[col] = val
-
-    preds = []
-    available_stock = last_row['Closing_Stock']
-    min_stock_limit = float(last_row.get('min_stock_limit', 10))
-
-    for lag in range(1, 8):
-        last_row[f'lag_{lag}'] = last_row.get(f'lag_{lag}', 0.0)
-
-    for day in range(periods):
-        feat = {
-            'Opening_Stock': float(available_stock),
-            'Closing_Stock': float(available_stock),
-            'Quantity_Restocked': float(last_row.get('Quantity_Restocked', 0.0)),
-            'Lead_Time_Days': float(last_row.get('Lead_Time_Days', last_row.get('lead_time_days', 3))),
-            'lead_time_days': float(last_row.get('lead_time_days', last_row.get('Lead_Time_Days', 3))),
-            'min_stock_limit': float(last_row.get('min_stock_limit', min_stock_limit)),
-            'max_capacity': float(last_row.get('max_capacity', 500)),
-            'day_of_week': int((last_row['Date'].dayofweek + day + 1) % 7) if 'Date' in last_row and pd.notna(last_row['Date']) else 0,
-            'month': int((last_row['Date'] + pd.Timedelta(days=day + 1)).month) if 'Date' in last_row and pd.notna(last_row['Date']) else 1
-        }
-
-        for lag in range(1, 8):
-            feat[f'lag_{lag}'] = float(last_row.get(f'lag_{lag}', 0.0))
-
-        X_pred = pd.DataFrame([feat])
-        try:
-            y_pred_raw = xgb_model.predict(X_pred)[0]
-            y_pred = float(max(0.0, y_pred_raw))
-        except Exception:
-            y_pred = 0.0
-
-        stock_warning = (available_stock - y_pred) < min_stock_limit
-
-        preds.append({'Date': (last_row['Date'] + pd.Timedelta(days=day + 1)).strftime("%Y-%m-%d") if 'Date' in last_row and pd.notna(last_row['Date']) else None,
-                      'Inventory_ID': str(item_id),
-                      'Predicted_Consumption': round(y_pred, 2),
-                      'Available_Stock': round(float(available_stock), 2),
-                      'Stock_Warning': stock_warning,
-                      'Search_Method': method})
-
-        for lag in range(7, 1, -1):
-            last_row[f'lag_{lag}'] = last_row.get(f'lag_{lag-1}', 0.0)
-        last_row['lag_1'] = y_pred
-        available_stock = max(0.0, available_stock - y_pred)
-        last_row['Closing_Stock'] = available_stock
-
-    return preds
+FORECAST_VARIANT = "xgb_shaped"  # XGBoost output shaped by flat_history_adjust, synthetic rows for unknown items (forecasting.VARIANTS)
 
-# ----------------------------
-# Fetch inventory related data
-# ----------------------------
-def fetch_inventory_data(inventory_id: str):
-    inventory_id_clean = str(inventory_id).strip().upper()
-    data = {}
-
-    def execute_and_format(query, params, limit=None):
-        cur.execute(query + (f" LIMIT {limit}" if limit else ""), params)
-        rows = cur.fetchall()
-        if not rows:
-            return None if limit == 1 else []
-        column_names = [desc[0] for desc in cur.description]
-        return dict(zip(column_names, rows[0])) if limit == 1 else [dict(zip(column_names, r)) for r in rows]
-
-    master_data = execute_and_format("""SELECT * FROM inventory_master WHERE inventory_id=%s""", (inventory_id_clean,), limit=1)
-    if not master_data:
-        return {"error": f"No master data found for inventory ID {inventory_id_clean}"}
-    data["Inventory_Master"] = master_data
-
-    data["Inventory_Daily"] = execute_and_format("""SELECT * FROM inventory_daily WHERE inventory_id=%s ORDER BY date DESC""", (inventory_id_clean,), limit=7)
-    data["Consumption"] = execute_and_format("""SELECT * FROM consumption WHERE inventory_id=%s ORDER BY date DESC""", (inventory_id_clean,), limit=7)
-    data["Finance"] = execute_and_format("""SELECT * FROM finance WHERE inventory_id=%s ORDER BY purchase_date DESC""", (inventory_id_clean,), limit=5)
-    data["Department_Mapping"] = execute_and_format("""SELECT * FROM inventory_department_mapping WHERE inventory_id=%s""", (inventory_id_clean,))
-
-    vendor_id = master_data.get("vendor_id")
-    if vendor_id:
-        data["Vendor"] = execute_and_format("""SELECT * FROM vendor_master WHERE vendor_id=%s""", (vendor_id,), limit=1)
-    else:
-        data["Vendor"] = None
-
-    return data
+def compute_forecasts(item_ids, periods: int = 7, methods="Unknown"):
+    # Feature read on the calling (db pool) thread, only the rollout on the cpu pool
+    states = resources["feature_states"].take(item_ids)
+    return call_cpu(forecasting.forecast_many, resources["xgb_model"], resources["feature_states"], item_ids,
+                    periods, methods=methods, states=states, **forecasting.VARIANTS[FORECAST_VARIANT])
+
+# Nightly precomputed rows (forecast_batch.py) where fresh, live compute for the rest
+precomputed_forecasts = PrecomputedForecasts(FORECAST_VARIANT)
+
+def serve_forecasts(item_ids, periods: int = 7, methods="Unknown"):
+    return precomputed_forecasts.forecast_many(item_ids, periods, methods, compute_forecasts)
+
+# Cache misses first bring their SQL features up to date (feature_store.py)
+forecast_cache = ForecastCache(fetch_data_versions,
+                               refresh_fn=lambda ids: resources["feature_states"].refresh_items(ids))
+
+def forecast_many(item_ids, periods: int = 7, methods="Unknown"):
+    return forecast_cache.forecast_many(item_ids, periods, methods, serve_forecasts)
+
+def forecast_item(item_id: str, periods: int = 7, method: str = "Unknown"):
+    return forecast_many([item_id], periods, method)[str(item_id)]
 
 # ----------------------------
 # User-facing MCP tools
 # ----------------------------
 
 @mcp.tool
-def predict_demand(inventory_id_or_name: str):
+@limited
+async def predict_demand(inventory_id_or_name: str):
     """
     Predicts future demand and stock consumption for a specified inventory item.
     
@@ -314,21 +214,12 @@ def predict_demand(inventory_id_or_name: str):
     periods = extract_periods_from_query(inventory_id_or_name, default=7)
 
     # -----------------------------
-    # 1️⃣ Check if input is exact Inventory ID first
+    # 1️⃣ Resolve: exact ID / exact name / semantic / fuzzy in one pass
     # -----------------------------
-    inv_id_candidate = str(inventory_id_or_name).strip().upper()
-    if inv_id_candidate in inventory_ids_set:
-        inv_id = inv_id_candidate
-        method = "Exact Inventory_ID"
-        resolved_list = [(inv_id, method)]
-    else:
-        # -----------------------------
-        # 2️⃣ Fallback: resolve via names / fuzzy / semantic
-        # -----------------------------
-        resolved_list = resolve_inventory_ids(inventory_id_or_name)
+    resolved_list = await run_cpu(resolve_inventory_ids, inventory_id_or_name)
 
     # -----------------------------
-    # 3️⃣ If still nothing found, return error
+    # 2️⃣ If nothing found, return error
     # -----------------------------
     if not resolved_list:
         return [{
@@ -342,11 +233,14 @@ def predict_demand(inventory_id_or_name: str):
         }]
 
     # -----------------------------
-    # 4️⃣ Generate forecasts
+    # 3️⃣ Generate forecasts
     # -----------------------------
+    # DB reads on the db pool; forecast_many hands the rollout to the cpu pool
+    forecasts_by_id = await run_db(forecast_many, [inv_id for inv_id, _ in resolved_list], periods,
+                                   dict(resolved_list))
     all_forecasts = []
     for inv_id, method in resolved_list:
-        forecasts = forecast_item(inv_id, periods, method)
+        forecasts = forecasts_by_id[str(inv_id)]
         for f in forecasts:
             f.setdefault("Date", None)
             f.setdefault("Inventory_ID", inv_id)
@@ -360,7 +254,8 @@ def predict_demand(inventory_id_or_name: str):
     return all_forecasts
 
 @mcp.tool
-def check_stock(inventory_id_or_name: str):
+@limited
+async def check_stock(inventory_id_or_name: str):
     """
     Retrieves comprehensive stock status and consumption forecast for an inventory item.
     
@@ -400,34 +295,22 @@ def check_stock(inventory_id_or_name: str):
                 "Last_Consumption_7_Days": [],
                 "Predicted_Consumption_7_Days": []}
 
-    inv_id_candidate = str(inventory_id_or_name).strip().upper()
-    if inv_id_candidate in inventory_ids_set:
-        inv_id = inv_id_candidate
-        method = "Exact Inventory_ID"
-    else:
-        input_clean = normalize_text(inventory_id_or_name.strip())
-        if input_clean in historical_name_to_id:
-            inv_id = str(historical_name_to_id[input_clean])
-            method = "Exact Name (historical)"
-        elif input_clean in master_name_to_id:
-            inv_id = str(master_name_to_id[input_clean])
-            method = "Exact Name (master)"
-        else:
-            resolved = resolve_inventory_ids(inventory_id_or_name)
-            if resolved:
-                inv_id, method = resolved[0]
-            else:
-                return {"Inventory_ID": inventory_id_or_name,
-                        "Item_Name": None,
-                        "Closing_Stock": 0.0,
-                        "Min_Stock_Limit": 0.0,
-                        "Stock_Warning": True,
-                        "Search_Method": "Not Found",
-                        "Last_Consumption_7_Days": [],
-                        "Predicted_Consumption_7_Days": [],
-                        "error": f"Inventory '{inventory_id_or_name}' not found"}
-
-    data = fetch_inventory_data(inv_id)
+    resolved = await run_cpu(resolve_inventory_ids, inventory_id_or_name)
+    if not resolved:
+        return {"Inventory_ID": inventory_id_or_name,
+                "Item_Name": None,
+                "Closing_Stock": 0.0,
+                "Min_Stock_Limit": 0.0,
+                "Stock_Warning": True,
+                "Search_Method": "Not Found",
+                "Last_Consumption_7_Days": [],
+                "Predicted_Consumption_7_Days": [],
+                "error": f"Inventory '{inventory_id_or_name}' not found"}
+    inv_id, method = resolved[0]
+
+    # Stock lookup and forecast are independent: run them concurrently
+    data, forecast = await asyncio.gather(run_db(fetch_inventory_data, inv_id),
+                                          run_db(forecast_item, inv_id, periods=7, method=method))
     if "error" in data:
         return {"Inventory_ID": inv_id,
                 "Item_Name": None,
@@ -445,7 +328,6 @@ def check_stock(inventory_id_or_name: str):
     stock_warning = closing_stock < min_stock_limit
     last_consumption = data.get("Consumption", [])
 
-    forecast = forecast_item(inv_id, periods=7, method=method)
     predicted_7_days = [{"Date": f["Date"], "Predicted_Consumption": f["Predicted_Consumption"]} for f in forecast]
 
     return {
@@ -459,156 +341,177 @@ def check_stock(inventory_id_or_name: str):
         "Predicted_Consumption_7_Days": predicted_7_days
     }
 
-# ----------------------------
-# Dashboard / Report MCP tool
-# ----------------------------
-# ----------------------------
-# Improved Forecasting Engine (Non-Flat Predictions)
-# ----------------------------
-def forecast_item(item_id: str, periods: int = 7, method: str = "Unknown"):
-    df_item = historical_df[historical_df['Inventory_ID'] == str(item_id)].sort_values('Date').copy()
-
-    # ----------------------------
-    # 0️⃣ No historical data → generate synthetic pattern
-    # ----------------------------
-    if df_item.empty:
-        synthetic_forecast = []
-        base = 2  # mild consumption default
-        for d in range(periods):
-            synthetic_forecast.append({
-                "Date": None,
-                "Inventory_ID": item_id,
-                "Predicted_Consumption": round(base + np.sin(d) + np.random.uniform(0, 0.5), 2),
-                "Available_Stock": 0,
-                "Stock_Warning": True,
-                "Search_Method": method
-            })
-        return synthetic_forecast
-
-    # ----------------------------
-    # 1️⃣ Extract last row + fill missing values
-    # ----------------------------
-    df_item = df_item.sort_values("Date")
-    last_row = df_item.iloc[-1].copy()
-
-    defaults = {
-        "Closing_Stock": 100,
-        "Lead_Time_Days": 3,
-        "min_stock_limit": 10,
-        "max_capacity": 500
-    }
+@mcp.tool
+@limited
+async def scan_low_stock(item_type: str = "", department: str = "", horizon_days: int = 7, limit: int = 50,
+                         include_details: bool = False):
+    """
+    Fleet-wide stock warning scan: every inventory item (or one item type / department)
+    evaluated in one call, e.g. "what will run out this week?".
 
-    for c, v in defaults.items():
-        if c not in last_row or pd.isna(last_row[c]):
-            last_row[c] = v
-
-    # ----------------------------
-    # 2️⃣ Handle lag columns (ensure 1–7 lags exist)
-    # ----------------------------
-    for lag in range(1, 8):
-        col = f"lag_{lag}"
-        if col not in last_row or pd.isna(last_row[col]):
-            last_row[col] = 0.0
-
-    # ----------------------------
-    # 3️⃣ Check if historical consumption is flat
-    # ----------------------------
-    lags = [last_row[f'lag_{i}'] for i in range(1, 8)]
-    lags_sum = sum(lags)
-
-    force_variation = (lags_sum == 0)
-
-    # ----------------------------
-    # 4️⃣ Prepare rolling forecast
-    # ----------------------------
-    preds = []
-    available_stock = float(last_row["Closing_Stock"])
-    min_stock_limit = float(last_row["min_stock_limit"])
-
-    for day in range(periods):
-
-        # ----------------------------
-        # Build X features for XGBoost
-        # ----------------------------
-        feat = {
-            "Opening_Stock": float(available_stock),
-            "Closing_Stock": float(available_stock),
-            "Quantity_Restocked": float(last_row.get("Quantity_Restocked", 0.0)),
-            "Lead_Time_Days": float(last_row.get("Lead_Time_Days", 3)),
-            "min_stock_limit": min_stock_limit,
-            "max_capacity": float(last_row.get("max_capacity", 500)),
-            "day_of_week": int((last_row["Date"].dayofweek + day + 1) % 7) if pd.notna(last_row["Date"]) else 0,
-            "month": int((last_row["Date"] + pd.Timedelta(days=day + 1)).month) if pd.notna(last_row["Date"]) else 1
-        }
-
-        for lag in range(1, 8):
-            feat[f'lag_{lag}'] = float(last_row[f'lag_{lag}'])
-
-        # ----------------------------
-        # Predict from XGBoost
-        # ----------------------------
-        try:
-            raw_pred = float(xgb_model.predict(pd.DataFrame([feat]))[0])
-            y_pred = max(0.0, raw_pred)
-        except Exception:
-            y_pred = 0.0
-
-        # ----------------------------
-        # Enforce natural variance if historical values are flat
-        # ----------------------------
-        if force_variation:
-            y_pred = round(1 + np.sin(day) + np.random.uniform(0.2, 0.8), 2)
-
-        # ----------------------------
-        # Smooth seasonal pattern (simple)
-        # ----------------------------
-        seasonal_factor = 1 + 0.1 * np.sin(day)
-        y_pred = round(y_pred * seasonal_factor, 2)
-
-        # ----------------------------
-        # Avoid completely flat predictions
-        # ----------------------------
-        if day > 0 and y_pred == preds[-1]["Predicted_Consumption"]:
-            y_pred += np.random.uniform(0.1, 0.5)
-
-        # ----------------------------
-        # Stock warning
-        # ----------------------------
-        stock_warning = (available_stock - y_pred) < min_stock_limit
-
-        # ----------------------------
-        # Save forecast
-        # ----------------------------
-        next_date = (
-            (last_row["Date"] + pd.Timedelta(days=day + 1)).strftime("%Y-%m-%d")
-            if pd.notna(last_row["Date"])
-            else None
-        )
-
-        preds.append({
-            "Date": next_date,
-            "Inventory_ID": item_id,
-            "Predicted_Consumption": round(y_pred, 2),
-            "Available_Stock": round(available_stock, 2),
-            "Stock_Warning": stock_warning,
-            "Search_Method": method
-        })
-
-        # ----------------------------
-        # Update lags (lag_1 becomes today's prediction)
-        # ----------------------------
-        for lag in range(7, 1, -1):
-            last_row[f"lag_{lag}"] = last_row[f"lag_{lag-1}"]
-        last_row["lag_1"] = y_pred
-
-        # ----------------------------
-        # Update stock
-        # ----------------------------
-        available_stock = max(0.0, available_stock - y_pred)
-
-    return preds
+    Current stock (latest daily closing stock) is compared against the minimum stock limit
+    in one set-based query, and one batched forecast projects each item forward to find
+    the day it drops below its minimum and the day it runs out.
 
-    
+    Args:
+        item_type (str, optional): Medication, Consumable or Equipment.
+        department (str, optional): Department code or name; only that department's items.
+        horizon_days (int): Days to project forward (1-90, default 7).
+        limit (int): Maximum items returned (default 50).
+        include_details (bool): Attach each item's full details (master, recent daily stock,
+            consumption, finance, departments, vendor) from one batched query.
+
+    Returns:
+        dict: scanned / below_min_now / at_risk counts and ``items`` ranked most urgent first:
+            - Inventory_ID, Item_Name, Item_Type
+            - Current_Stock, Min_Stock_Limit, Stock_Warning (already below minimum)
+            - Predicted_Consumption, Projected_Stock (over the horizon)
+            - Days_To_Min_Stock, Days_To_Stockout (None when beyond the horizon)
+            - Details (include_details only): same layout as get_inventory_details
+
+    Example:
+        >>> scan_low_stock(item_type="Medication", horizon_days=7)
+        >>> scan_low_stock(horizon_days=3, limit=20, include_details=True)
+    """
+    result = await run_cpu(lambda: stock_scan.scan_low_stock(
+        resources["xgb_model"], resources["feature_states"], item_type=item_type, department=department,
+        horizon=max(1, min(horizon_days, 90)), limit=max(1, min(limit, 500)),
+        adjust=forecasting.VARIANTS[FORECAST_VARIANT].get("adjust")))
+    if include_details and result["items"]:
+        # One batched details query for every reported item instead of one get_inventory_details each
+        details = await run_db(fetch_inventory_data_many, [item["Inventory_ID"] for item in result["items"]])
+        for item in result["items"]:
+            item["Details"] = details.get(item["Inventory_ID"])
+    return result
+
+@mcp.tool
+@limited
+async def stockout_risk(inventory_id_or_name: str = "", item_type: str = "", department: str = "",
+                        paths: int = 1000, min_probability: float = 0.05, limit: int = 50):
+    """
+    Monte Carlo stockout risk: the probability that an item runs out before a replenishment
+    ordered today could arrive (its lead_time_days), for one item or the whole catalogue.
+
+    Thousands of demand paths per item are sampled from the XGBoost forecast plus the model's
+    historical residuals for that item, and stock depletion is simulated for every path.
+
+    Args:
+        inventory_id_or_name (str, optional): One item (ID or name); empty scans all items.
+        item_type (str, optional): Medication, Consumable or Equipment.
+        department (str, optional): Department code or name; only that department's items.
+        paths (int): Simulated demand paths per item (100-5000, default 1000).
+        min_probability (float): Only return items at or above this stockout probability.
+        limit (int): Maximum items returned (default 50).
+
+    Returns:
+        dict: scanned / at_risk counts and ``items`` ranked by risk:
+            - Inventory_ID, Item_Name, Item_Type, Current_Stock, Min_Stock_Limit, Lead_Time_Days
+            - Expected_Demand_Lead_Time: point-forecast demand until the lead time elapses
+            - Stockout_Probability, Expected_Stockout_Day (among paths that run out)
+            - Below_Min_Probability
+
+    Example:
+        >>> stockout_risk(item_type="Medication", min_probability=0.2)
+        >>> stockout_risk("Syringes")
+    """
+    item_ids = None
+    if inventory_id_or_name:
+        item_ids = [inv_id for inv_id, _ in await run_cpu(resolve_inventory_ids, inventory_id_or_name)]
+        if not item_ids:
+            return {"error": f"Inventory '{inventory_id_or_name}' not found"}
+        min_probability = 0.0  # a named item is always reported
+    return await run_cpu(lambda: risk_simulation.stockout_risk(
+        resources["xgb_model"], resources["feature_states"], resources["residual_pool"], item_ids=item_ids,
+        item_type=item_type, department=department, paths=max(100, min(paths, 5000)),
+        min_probability=max(0.0, min_probability), limit=max(1, min(limit, 500)),
+        adjust=forecasting.VARIANTS[FORECAST_VARIANT].get("adjust")))
+
+@mcp.tool
+@limited
+async def reorder_plan(item_type: str = "", department: str = "", vendor: str = "",
+                       service_level: float = 0.95, review_days: int = 7, limit: int = 20):
+    """
+    Reorder plan for the whole catalogue: reorder point, safety stock and order quantity per
+    item, with the items due for an order grouped into one purchase-order draft per vendor.
+
+    Demand over each item's lead time (and the review period after it) comes from one batched
+    XGBoost forecast; safety stock covers the item's recent demand variability at the requested
+    service level. Orders fill up to the reorder point plus review-period demand, never above
+    maximum_capacity, counting stock already on order. Drafts are not submitted anywhere.
+
+    Args:
+        item_type (str, optional): Medication, Consumable or Equipment.
+        department (str, optional): Department code or name; only its items and limits.
+        vendor (str, optional): Vendor ID or name.
+        service_level (float): Target probability of no stockout during lead time (default 0.95).
+        review_days (int): Days until the next planning run the order should also cover (default 7).
+        limit (int): Maximum purchase-order drafts returned, most urgent vendor first (default 20).
+
+    Returns:
+        dict: scanned / items_to_order / vendors / total_cost and ``purchase_orders``:
+            - Vendor_ID, Vendor_Name, Contact_Number, Region, Vendor_Rating, Status ("Draft")
+            - Expected_Delivery, Line_Count, Total_Quantity, Total_Cost
+            - Lines: Inventory_ID, Item_Name, Current_Stock, On_Order, Lead_Time_Days,
+              Lead_Time_Demand, Safety_Stock, Reorder_Point, Order_Up_To, Order_Quantity,
+              Unit_Cost, Line_Cost, Days_Of_Cover, Capacity_Limited
+
+    Example:
+        >>> reorder_plan(item_type="Medication")
+        >>> reorder_plan(vendor="V001", service_level=0.99)
+    """
+    return await run_cpu(lambda: reorder_planner.reorder_plan(
+        resources["xgb_model"], resources["feature_states"], item_type=item_type, department=department,
+        vendor=vendor, service_level=service_level, review_days=max(0, min(review_days, 60)),
+        limit=max(1, min(limit, 500)), adjust=forecasting.VARIANTS[FORECAST_VARIANT].get("adjust")))
+
+@mcp.tool
+def forecast_cache_stats():
+    """Size and hit/miss counters of the forecast result cache, and how many items the nightly table served."""
+    features = resources.resources["feature_states"]
+    return dict(forecast_cache.stats(), precomputed=precomputed_forecasts.stats(),
+                feature_store=features.get().stats() if features.ready else None)
+
+@mcp.tool
+def resolution_cache_stats():
+    """Size, hit rate and negative ("not found") entries of the query-resolution memo."""
+    return resources["resolver"].stats()
+
+@mcp.tool
+def tool_concurrency_stats():
+    """Worker pool utilisation (db / cpu / io), per-tool in-flight / queued / rejected calls and coalesced calls."""
+    return dict(tool_pools.stats(), coalescing=singleflight.stats())
+
+@mcp.tool
+def readiness():
+    """
+    Which heavy components (historical data, XGBoost, SentenceTransformer, name/vector
+    indexes) are loaded, with per-component load times and the startup mode. Components
+    loaded on first use (eager=False, e.g. the residual pool) are listed but do not gate "ready".
+    """
+    return resources.status()
+
+@mcp.tool
+def catalog_status():
+    """Item / embedding counts of the live name catalog and its background hot-reload status."""
+    status = catalog_watcher.stats()
+    if resources.resources["resolver"].ready:  # a status call should not trigger the load
+        status["resolvable_ids"] = len(resources["resolver"].catalog)
+    return status
+
+@mcp.tool
+@limited
+async def resolve_inventory(query: str, top_k: int = 5):
+    """
+    Ranked inventory matches for a free-text item name or ID, for disambiguation.
+
+    Lexical (token-sort ratio) and semantic (embedding cosine) similarity are scored
+    together over one candidate set. matches[0] is the item the other tools would use
+    when its ``accepted`` flag is set; timings_ms breaks the lookup down per stage.
+
+    Example:
+        >>> resolve_inventory("nitrile glovs", top_k=3)
+    """
+    return await run_cpu(lambda: resources["resolver"].resolve(query, top_k=max(1, min(top_k, 20))))
 
 # ----------------------------
 # Gmail OAuth Send Email Tool
@@ -618,6 +521,10 @@ CLIENT_SECRET_FILE = "client_secret.json"  # <-- your Google credentials
 TOKEN_FILE = "token.pickle"
 
 def authenticate_gmail():
+    # Google client libraries are imported on first use: they are slow to import
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
     if os.path.exists(TOKEN_FILE):
         with open(TOKEN_FILE, "rb") as t:
@@ -633,6 +540,7 @@ def authenticate_gmail():
     return creds
 
 def send_email_oauth(recipient: str, subject: str, body: str):
+    from googleapiclient.discovery import build
     service = build("gmail", "v1", credentials=authenticate_gmail())
     msg = MIMEMultipart()
     msg["to"] = recipient
@@ -643,7 +551,8 @@ def send_email_oauth(recipient: str, subject: str, body: str):
     return True
 
 @mcp.tool
-def send_email(recipient: str, subject: str, body: str):
+@limited
+async def send_email(recipient: str, subject: str, body: str):
     """
     Sends email notifications using Gmail OAuth authentication.
     
@@ -680,7 +589,7 @@ def send_email(recipient: str, subject: str, body: str):
             return {"status": "error", "error": "Recipient, subject, or body missing"}
         
         # Send via Gmail OAuth
-        ok = send_email_oauth(recipient, subject, body)
+        ok = await run_io(send_email_oauth, recipient, subject, body)
         if ok:
             return {"status": "success", "message": f"Email sent to {recipient}"}
         else:
@@ -692,7 +601,10 @@ def send_email(recipient: str, subject: str, body: str):
 # ----------------------------
 # MCP Server Run
 # ----------------------------
+resources.start()  # eager: load now; warmup: background thread; lazy: on first use
+
 if __name__ == "__main__":
+    catalog_watcher.start()  # picks up new / renamed / deleted items without a restart
     print("🚀 Inventory & Demand MCP running on port 8000 (SSE enabled)")
     mcp.run(transport="sse", port=8000)
 # ----------------------------
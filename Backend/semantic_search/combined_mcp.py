@@ -4,12 +4,21 @@
 # Optimized: Exact Inventory_ID match + Fuzzy Name matching
 # ---------------------------------------
 
-import psycopg2
-import pandas as pd
 from fastmcp import FastMCP
-from xgboost import XGBRegressor
-from thefuzz import fuzz, process
 import re
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+from inventory_data import fetch_inventory_data
+from item_state_index import ItemStateIndex
+from feature_store import FeatureStateIndex
+from historical_store import load_historical, name_rows
+from xgb_inference import load_model
+from forecast_cache import ForecastCache, fetch_data_versions
+from fuzzy_index import FuzzyNameIndex
+from tool_pools import call_cpu, limited, run_cpu, run_db
 
 # ----------------------------
 # Initialize MCP
@@ -19,29 +28,30 @@ mcp = FastMCP("Inventory & Demand MCP 📦🧠")
 # ----------------------------
 # PostgreSQL setup
 # ----------------------------
-conn = psycopg2.connect(
- 
-)
-cur = conn.cursor()
+# Pooled connections from db.py (PG* environment variables). Every tool call
+# borrows its own cursor, so concurrent SSE sessions never share one.
 
 # ----------------------------
 # Load historical dataset for demand forecasting
 # ----------------------------
-historical_df = pd.read_csv("models/demand_forecast_base.csv", parse_dates=['Date'])
+historical = load_historical()  # memory-mapped store (historical_store.py) or the CSV
+item_state_index = ItemStateIndex.from_frame(historical)  # latest state per item, O(1) lookup
+feature_states = FeatureStateIndex(item_state_index).start()  # SQL feature store (sql/009) first
 
 # ----------------------------
 # Precompute cleaned historical names & inventory IDs
 # ----------------------------
-historical_names_clean = [str(n).replace('\xa0', ' ').strip().lower() for n in historical_df['Item_Name']]
-historical_name_to_id = dict(zip(historical_names_clean, historical_df['Inventory_ID']))
-inventory_ids_set = set(historical_df['Inventory_ID'].astype(str))
+historical_names_df = name_rows(historical)
+historical_names_clean = [str(n).replace('\xa0', ' ').strip().lower() for n in historical_names_df['Item_Name']]
+historical_name_to_id = dict(zip(historical_names_clean, historical_names_df['Inventory_ID']))
+fuzzy_index = FuzzyNameIndex(historical_names_clean)  # unique names, trigram-pruned
+inventory_ids_set = set(historical_names_df['Inventory_ID'].astype(str))
 
 # ----------------------------
 # Load trained XGBoost model
 # ----------------------------
 model_path = "models/demand_agent_xgb.json"
-xgb_model = XGBRegressor()
-xgb_model.load_model(model_path)
+xgb_model = load_model(model_path, forecasting.FEATURE_COLUMNS)  # NumPy trees, xgboost fallback
 
 # ----------------------------
 # Utility functions
@@ -79,122 +89,61 @@ def resolve_inventory_ids(input_str: str):
         return [(historical_name_to_id[input_clean], "Exact Name (historical)")]
 
     # 3️⃣ Fuzzy Name match
-    match = process.extractOne(input_clean, historical_names_clean, scorer=fuzz.token_sort_ratio)
+    match = fuzzy_index.extract_one(input_clean)
     if match:
-        match_name, score, idx = match
+        match_name, score, _ = match
         if score >= 60:
-            inv_id = historical_df.iloc[idx]['Inventory_ID']
+            inv_id = historical_name_to_id[match_name]
             return [(inv_id, f"Fuzzy Name (score={score}, historical)")]
 
     # Not found
     return []
 
+def compute_forecasts(item_ids, periods: int = 7, methods="Unknown"):
+    states = feature_states.take(item_ids)
+    states.quantity_restocked[:] = 0.0  # this agent never assumes a pending restock
+    return call_cpu(forecasting.forecast_many, xgb_model, feature_states, item_ids, periods,
+                    methods=methods, states=states)
+
+forecast_cache = ForecastCache(fetch_data_versions, refresh_fn=feature_states.refresh_items)
+
+def forecast_many(item_ids, periods: int = 7, methods="Unknown"):
+    return forecast_cache.forecast_many(item_ids, periods, methods, compute_forecasts)
+
 def forecast_item(item_id: str, periods: int = 7, method: str = "Unknown"):
-    df_item = historical_df[historical_df['Inventory_ID'] == item_id].sort_values('Date').copy()
-    if df_item.empty:
-        return [{"Date": None, "Inventory_ID": item_id, "Predicted_Consumption": 0,
-                 "Available_Stock": 0, "Stock_Warning": True, "Search_Method": method,
-                 "error": f"No historical data found for Inventory_ID '{item_id}'"}]
-
-    last_row = df_item.iloc[-1].copy()
-    defaults = {'Closing_Stock': 100, 'Lead_Time_Days': 3, 'lead_time_days': 3,
-                'min_stock_limit': 10, 'max_capacity': 500, 'Quantity_Consumed': 0}
-    for col, val in defaults.items():
-        if col not in last_row or pd.isna(last_row[col]):
-            last_row[col] = val
-
-    preds = []
-    available_stock = last_row['Closing_Stock']
-    min_stock_limit = float(last_row.get('min_stock_limit', 10))
-
-    # Initialize lag columns
-    for lag in range(1, 8):
-        last_row[f'lag_{lag}'] = last_row.get(f'lag_{lag}', 0.0)
-
-    for day in range(periods):
-        feat = {'Opening_Stock': float(available_stock),
-                'Closing_Stock': float(available_stock),
-                'Quantity_Restocked': 0.0,
-                'Lead_Time_Days': float(last_row.get('Lead_Time_Days', 3)),
-                'lead_time_days': float(last_row.get('lead_time_days', 3)),
-                'min_stock_limit': min_stock_limit,
-                'max_capacity': float(last_row.get('max_capacity', 500)),
-                'day_of_week': int((last_row['Date'].dayofweek + day + 1) % 7),
-                'month': int((last_row['Date'] + pd.Timedelta(days=day + 1)).month)}
-
-        for lag in range(1, 8):
-            feat[f'lag_{lag}'] = float(last_row.get(f'lag_{lag}', 0.0))
-
-        X_pred = pd.DataFrame([feat])
-        y_pred = float(max(0, xgb_model.predict(X_pred)[0]))
-        stock_warning = (available_stock - y_pred) < min_stock_limit
-
-        preds.append({'Date': (last_row['Date'] + pd.Timedelta(days=day + 1)).strftime("%Y-%m-%d"),
-                      'Inventory_ID': str(item_id),
-                      'Predicted_Consumption': round(y_pred, 2),
-                      'Available_Stock': round(float(available_stock), 2),
-                      'Stock_Warning': stock_warning,
-                      'Search_Method': method})
-
-        for lag in range(7, 1, -1):
-            last_row[f'lag_{lag}'] = last_row[f'lag_{lag-1}']
-        last_row['lag_1'] = y_pred
-        available_stock = max(0.0, available_stock - y_pred)
-        last_row['Closing_Stock'] = available_stock
-
-    return preds
-
-def fetch_inventory_data(inventory_id: str):
-    inventory_id_clean = inventory_id.strip().upper()
-    data = {}
-
-    def execute_and_format(query, params, limit=None):
-        cur.execute(query + (f" LIMIT {limit}" if limit else ""), params)
-        rows = cur.fetchall()
-        if not rows:
-            return None if limit == 1 else []
-        column_names = [desc[0] for desc in cur.description]
-        return dict(zip(column_names, rows[0])) if limit == 1 else [dict(zip(column_names, r)) for r in rows]
-
-    master_data = execute_and_format("""SELECT * FROM inventory_master WHERE inventory_id=%s""", (inventory_id_clean,), limit=1)
-    if not master_data:
-        return {"error": f"No master data found for inventory ID {inventory_id_clean}"}
-    data["Inventory_Master"] = master_data
-
-    data["Inventory_Daily"] = execute_and_format("""SELECT * FROM inventory_daily WHERE inventory_id=%s ORDER BY date DESC""", (inventory_id_clean,), limit=7)
-    data["Consumption"] = execute_and_format("""SELECT * FROM consumption WHERE inventory_id=%s ORDER BY date DESC""", (inventory_id_clean,), limit=7)
-    data["Finance"] = execute_and_format("""SELECT * FROM finance WHERE inventory_id=%s ORDER BY purchase_date DESC""", (inventory_id_clean,), limit=5)
-    data["Department_Mapping"] = execute_and_format("""SELECT * FROM inventory_department_mapping WHERE inventory_id=%s""", (inventory_id_clean,))
-    
-    vendor_id = master_data.get("vendor_id")
-    if vendor_id:
-        data["Vendor"] = execute_and_format("""SELECT * FROM vendor_master WHERE vendor_id=%s""", (vendor_id,), limit=1)
-    else:
-        data["Vendor"] = None
-
-    return data
+    return forecast_many([item_id], periods, method)[str(item_id)]
 
 # ----------------------------
 # MCP Tools
 # ----------------------------
 @mcp.tool
-def get_inventory_details(inventory_id: str):
+@limited
+async def get_inventory_details(inventory_id: str):
     if not inventory_id:
         return {"error": "Inventory_ID is required"}
-    return fetch_inventory_data(inventory_id)
+    return await run_db(fetch_inventory_data, inventory_id)
 
 @mcp.tool
-def predict_demand(Input: str):
+@limited
+async def predict_demand(Input: str):
     periods = extract_periods_from_query(Input, default=7)
-    resolved_list = resolve_inventory_ids(Input)
+    resolved_list = await run_cpu(resolve_inventory_ids, Input)
     if not resolved_list:
         return [{"error": f"Inventory '{Input}' not found"}]
 
+    # DB reads on the db pool; forecast_many hands the rollout to the cpu pool
+    forecasts = await run_db(forecast_many, [inv_id for inv_id, _ in resolved_list], periods,
+                             dict(resolved_list))
     all_forecasts = []
-    for inv_id, method in resolved_list:
-        all_forecasts.extend(forecast_item(inv_id, periods, method))
+    for inv_id, _ in resolved_list:
+        all_forecasts.extend(forecasts[str(inv_id)])
     return all_forecasts
 
+@mcp.tool
+def forecast_cache_stats():
+    """Size and hit/miss counters of the forecast result cache."""
+    return forecast_cache.stats()
+
 # ----------------------------
 # Run MCP
 # ----------------------------
@@ -5,12 +5,36 @@
 # Fix: Stock tool 500-error fix for min_stock/closing_stock
 # ---------------------------------------
 
-import psycopg2
-import pandas as pd
+import time
+_imports_started = time.perf_counter()
+
 from fastmcp import FastMCP
-from xgboost import XGBRegressor
-from thefuzz import fuzz, process
 import re
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+from inventory_data import fetch_inventory_data, fetch_inventory_data_many
+from item_state_index import ItemStateIndex
+from feature_store import FeatureStateIndex
+from historical_store import load_historical
+from xgb_inference import load_model
+from forecast_cache import ForecastCache, fetch_data_versions
+from forecast_store import PrecomputedForecasts
+import stock_scan
+import risk_simulation
+import reorder_plan as reorder_planner
+import singleflight
+import tool_pools
+from tool_pools import call_cpu, limited, run_cpu, run_db
+from resolver import NameCatalog, InventoryResolver
+from catalog_refresh import CatalogWatcher
+from lazy import ResourceRegistry
+
+# Heavy resources are loaded according to MCP_STARTUP_MODE=eager|warmup|lazy (see lazy.py)
+resources = ResourceRegistry()
+resources.record_phase("imports", time.perf_counter() - _imports_started)
 
 # ----------------------------
 # Initialize MCP
@@ -20,71 +44,63 @@ mcp = FastMCP("Inventory & Demand MCP 📦🧠")
 # ----------------------------
 # PostgreSQL setup
 # ----------------------------
-conn = psycopg2.connect(
- 
-)
-cur = conn.cursor()
+# Pooled connections from db.py (PG* environment variables). Every tool call
+# borrows its own cursor, so concurrent SSE sessions never share one.
+# The heavy tools are async: queries and model / fuzzy work run on bounded worker
+# pools with per-tool concurrency limits (tool_pools.py).
 
 # ----------------------------
 # Load historical dataset for demand forecasting
 # ----------------------------
-historical_df = pd.read_csv("models/demand_forecast_base.csv", parse_dates=['Date'])
-historical_df['Inventory_ID'] = historical_df['Inventory_ID'].astype(str)
+@resources.register("historical")
+def load_historical_data():
+    return load_historical()  # memory-mapped store (historical_store.py) or the CSV
 
-# ----------------------------
-# Load inventory_master names from DB (used for fuzzy matching on stock queries)
-# ----------------------------
-def load_inventory_master_names():
-    cur.execute("SELECT inventory_id, item_name FROM inventory_master")
-    rows = cur.fetchall()
-    master_map = {}
-    for r in rows:
-        inv_id = str(r[0]).strip()
-        name = r[1] or ""
-        master_map[name] = inv_id
-    return master_map
-
-inventory_master_map = load_inventory_master_names()
+@resources.register("item_state_index")
+def load_item_state_index():
+    return ItemStateIndex.from_frame(resources["historical"])  # latest state per item, O(1) lookup
+
+@resources.register("feature_states")
+def load_feature_states():
+    # Latest lags / stock from the SQL feature store (sql/009), the CSV index for unknown items;
+    # dirty items are recomputed by a background thread, never on the read path
+    return FeatureStateIndex(resources["item_state_index"]).start()
 
 # ----------------------------
-# Normalization utilities and precompute cleaned name maps
+# Name features for resolution (normalized maps, ID set, fuzzy index), built once per
+# inventory_master snapshot (hot-reloaded, see catalog_refresh.py)
 # ----------------------------
-def normalize_text(s: str):
-    if not s:
-        return ""
-    s = str(s)
-    s = s.replace('\xa0', ' ')
-    s = s.lower()
-    s = re.sub(r'\s+', ' ', s)
-    s = re.sub(r'[^\w\s]', ' ', s)
-    s = re.sub(r'\s+', ' ', s)
-    return s.strip()
-
-historical_names_clean = [normalize_text(n) for n in historical_df['Item_Name'].fillna("").astype(str)]
-historical_name_to_id = dict(zip(historical_names_clean, historical_df['Inventory_ID'].astype(str)))
-
-master_names_clean = [normalize_text(n) for n in inventory_master_map.keys()]
-master_name_to_id = {normalize_text(k): v for k, v in inventory_master_map.items()}
-
-combined_names_clean = []
-combined_name_to_id = {}
-for name in master_name_to_id:
-    combined_names_clean.append(name)
-    combined_name_to_id[name] = master_name_to_id[name]
-for name, inv_id in historical_name_to_id.items():
-    if name not in combined_name_to_id:
-        combined_names_clean.append(name)
-        combined_name_to_id[name] = str(inv_id)
-
-inventory_ids_set = set(historical_df['Inventory_ID'].astype(str))
-inventory_ids_set.update({str(v) for v in inventory_master_map.values()})
+catalog_watcher = CatalogWatcher(with_embeddings=False)
+
+@resources.register("resolver")
+def load_resolver():
+    master_map = catalog_watcher.load().master_map()
+    # lexical only: no embeddings here
+    return InventoryResolver(NameCatalog(resources["historical"], master_map), fuzzy_threshold=55)
+
+def apply_catalog_snapshot(snapshot):
+    # Never load the resolver from here: its loader calls catalog_watcher.load(), which waits
+    # on the refresh lock this callback runs under. Its first load reads the catalogue itself.
+    if not resources.resources["resolver"].ready:
+        return False
+    resources["resolver"].update(catalog=NameCatalog(resources["historical"], snapshot.master_map()))
+
+catalog_watcher.on_change = apply_catalog_snapshot
 
 # ----------------------------
 # Load trained XGBoost model
 # ----------------------------
 model_path = "models/demand_agent_xgb.json"
-xgb_model = XGBRegressor()
-xgb_model.load_model(model_path)
+
+@resources.register("xgb_model")
+def load_xgb_model():
+    return load_model(model_path, forecasting.FEATURE_COLUMNS)  # NumPy trees, xgboost fallback
+
+@resources.register("residual_pool", eager=False)
+def load_residual_pool():
+    # One-step model residuals per item (recent history) for the stockout simulation; slow
+    # (a full-history model pass), so it is built on the first stockout_risk call, never at startup
+    return risk_simulation.ResidualPool.from_history(resources["xgb_model"], resources["historical"])
 
 # ----------------------------
 # Utility functions
@@ -106,149 +122,67 @@ def extract_periods_from_query(query: str, default: int = 7) -> int:
 def resolve_inventory_ids(input_str: str):
     if not input_str:
         return []
+    return resources["resolver"].resolve_ids(input_str)
+
+FORECAST_VARIANT = "xgb"  # plain XGBoost output (forecasting.VARIANTS)
+
+def compute_forecasts(item_ids, periods: int = 7, methods="Unknown"):
+    # Feature read on the calling (db pool) thread, only the rollout on the cpu pool
+    states = resources["feature_states"].take(item_ids)
+    return call_cpu(forecasting.forecast_many, resources["xgb_model"], resources["feature_states"], item_ids,
+                    periods, methods=methods, states=states, **forecasting.VARIANTS[FORECAST_VARIANT])
 
-    raw = str(input_str).strip()
-    input_upper = raw.upper()
-    input_clean = normalize_text(raw)
+# Nightly precomputed rows (forecast_batch.py) where fresh, live compute for the rest
+precomputed_forecasts = PrecomputedForecasts(FORECAST_VARIANT)
 
-    if input_upper in inventory_ids_set:
-        return [(input_upper, "Exact Inventory_ID")]
+def serve_forecasts(item_ids, periods: int = 7, methods="Unknown"):
+    return precomputed_forecasts.forecast_many(item_ids, periods, methods, compute_forecasts)
 
-    if input_clean in historical_name_to_id:
-        return [(str(historical_name_to_id[input_clean]), "Exact Name (historical)")]
-    if input_clean in master_name_to_id:
-        return [(str(master_name_to_id[input_clean]), "Exact Name (master)")]
+# Cache misses first bring their SQL features up to date (feature_store.py)
+forecast_cache = ForecastCache(fetch_data_versions,
+                               refresh_fn=lambda ids: resources["feature_states"].refresh_items(ids))
 
-    if input_clean:
-        match = process.extractOne(input_clean, combined_names_clean, scorer=fuzz.token_sort_ratio)
-        if match:
-            match_name, score = match
-            if score >= 55:
-                inv_id = combined_name_to_id.get(match_name)
-                source = "Fuzzy Name (master)" if match_name in master_name_to_id else "Fuzzy Name (historical)"
-                return [(str(inv_id), f"{source} (score={score})")]
-    return []
+def forecast_many(item_ids, periods: int = 7, methods="Unknown"):
+    return forecast_cache.forecast_many(item_ids, periods, methods, serve_forecasts)
 
 def forecast_item(item_id: str, periods: int = 7, method: str = "Unknown"):
-    df_item = historical_df[historical_df['Inventory_ID'] == str(item_id)].sort_values('Date').copy()
-    if df_item.empty:
-        return [{"Date": None, "Inventory_ID": item_id, "Predicted_Consumption": 0,
-                 "Available_Stock": 0, "Stock_Warning": True, "Search_Method": method,
-                 "error": f"No historical data found for Inventory_ID '{item_id}'"}]
-
-    last_row = df_item.iloc[-1].copy()
-    defaults = {'Closing_Stock': 100, 'Lead_Time_Days': 3, 'lead_time_days': 3,
-                'min_stock_limit': 10, 'max_capacity': 500, 'Quantity_Consumed': 0}
-    for col, val in defaults.items():
-        if col not in last_row or pd.isna(last_row[col]):
-            last_row[col] = val
-
-    preds = []
-    available_stock = last_row['Closing_Stock']
-    min_stock_limit = float(last_row.get('min_stock_limit', 10))
-
-    for lag in range(1, 8):
-        last_row[f'lag_{lag}'] = last_row.get(f'lag_{lag}', 0.0)
-
-    for day in range(periods):
-        feat = {
-            'Opening_Stock': float(available_stock),
-            'Closing_Stock': float(available_stock),
-            'Quantity_Restocked': float(last_row.get('Quantity_Restocked', 0.0)),
-            'Lead_Time_Days': float(last_row.get('Lead_Time_Days', last_row.get('lead_time_days', 3))),
-            'lead_time_days': float(last_row.get('lead_time_days', last_row.get('Lead_Time_Days', 3))),
-            'min_stock_limit': float(last_row.get('min_stock_limit', min_stock_limit)),
-            'max_capacity': float(last_row.get('max_capacity', 500)),
-            'day_of_week': int((last_row['Date'].dayofweek + day + 1) % 7) if 'Date' in last_row and pd.notna(last_row['Date']) else 0,
-            'month': int((last_row['Date'] + pd.Timedelta(days=day + 1)).month) if 'Date' in last_row and pd.notna(last_row['Date']) else 1
-        }
-
-        for lag in range(1, 8):
-            feat[f'lag_{lag}'] = float(last_row.get(f'lag_{lag}', 0.0))
-
-        X_pred = pd.DataFrame([feat])
-        try:
-            y_pred_raw = xgb_model.predict(X_pred)[0]
-            y_pred = float(max(0.0, y_pred_raw))
-        except Exception:
-            y_pred = 0.0
-
-        stock_warning = (available_stock - y_pred) < min_stock_limit
-
-        preds.append({'Date': (last_row['Date'] + pd.Timedelta(days=day + 1)).strftime("%Y-%m-%d") if 'Date' in last_row and pd.notna(last_row['Date']) else None,
-                      'Inventory_ID': str(item_id),
-                      'Predicted_Consumption': round(y_pred, 2),
-                      'Available_Stock': round(float(available_stock), 2),
-                      'Stock_Warning': stock_warning,
-                      'Search_Method': method})
-
-        for lag in range(7, 1, -1):
-            last_row[f'lag_{lag}'] = last_row.get(f'lag_{lag-1}', 0.0)
-        last_row['lag_1'] = y_pred
-        available_stock = max(0.0, available_stock - y_pred)
-        last_row['Closing_Stock'] = available_stock
-
-    return preds
-
-def fetch_inventory_data(inventory_id: str):
-    inventory_id_clean = str(inventory_id).strip().upper()
-    data = {}
-
-    def execute_and_format(query, params, limit=None):
-        cur.execute(query + (f" LIMIT {limit}" if limit else ""), params)
-        rows = cur.fetchall()
-        if not rows:
-            return None if limit == 1 else []
-        column_names = [desc[0] for desc in cur.description]
-        return dict(zip(column_names, rows[0])) if limit == 1 else [dict(zip(column_names, r)) for r in rows]
-
-    master_data = execute_and_format("""SELECT * FROM inventory_master WHERE inventory_id=%s""", (inventory_id_clean,), limit=1)
-    if not master_data:
-        return {"error": f"No master data found for inventory ID {inventory_id_clean}"}
-    data["Inventory_Master"] = master_data
-
-    data["Inventory_Daily"] = execute_and_format("""SELECT * FROM inventory_daily WHERE inventory_id=%s ORDER BY date DESC""", (inventory_id_clean,), limit=7)
-    data["Consumption"] = execute_and_format("""SELECT * FROM consumption WHERE inventory_id=%s ORDER BY date DESC""", (inventory_id_clean,), limit=7)
-    data["Finance"] = execute_and_format("""SELECT * FROM finance WHERE inventory_id=%s ORDER BY purchase_date DESC""", (inventory_id_clean,), limit=5)
-    data["Department_Mapping"] = execute_and_format("""SELECT * FROM inventory_department_mapping WHERE inventory_id=%s""", (inventory_id_clean,))
-
-    vendor_id = master_data.get("vendor_id")
-    if vendor_id:
-        data["Vendor"] = execute_and_format("""SELECT * FROM vendor_master WHERE vendor_id=%s""", (vendor_id,), limit=1)
-    else:
-        data["Vendor"] = None
-
-    return data
+    return forecast_many([item_id], periods, method)[str(item_id)]
 
 # ----------------------------
 # MCP Tools
 # ----------------------------
 @mcp.tool
-def get_inventory_details(inventory_id: str):
+@limited
+async def get_inventory_details(inventory_id: str):
     if not inventory_id:
         return {"error": "Inventory_ID is required"}
 
-    resolved = resolve_inventory_ids(inventory_id)
+    resolved = await run_cpu(resolve_inventory_ids, inventory_id)
     if not resolved:
         try_id = str(inventory_id).strip().upper()
-        return fetch_inventory_data(try_id)
+        return await run_db(fetch_inventory_data, try_id)
     inv_id, method = resolved[0]
-    return fetch_inventory_data(inv_id)
+    return await run_db(fetch_inventory_data, inv_id)
 
 @mcp.tool
-def predict_demand(Input: str):
+@limited
+async def predict_demand(Input: str):
     periods = extract_periods_from_query(Input, default=7)
-    resolved_list = resolve_inventory_ids(Input)
+    resolved_list = await run_cpu(resolve_inventory_ids, Input)
     if not resolved_list:
         return [{"error": f"Inventory '{Input}' not found"}]
 
+    # DB reads on the db pool; forecast_many hands the rollout to the cpu pool
+    forecasts = await run_db(forecast_many, [inv_id for inv_id, _ in resolved_list], periods,
+                             dict(resolved_list))
     all_forecasts = []
-    for inv_id, method in resolved_list:
-        all_forecasts.extend(forecast_item(inv_id, periods, method))
+    for inv_id, _ in resolved_list:
+        all_forecasts.extend(forecasts[str(inv_id)])
     return all_forecasts
 
 @mcp.tool
-def check_stock(inventory_id_or_name: str):
+@limited
+async def check_stock(inventory_id_or_name: str):
     """
     Returns current stock, min stock limit, stock warning, last 7-day consumption
     Safe defaults applied to prevent 500 errors.
@@ -256,30 +190,15 @@ def check_stock(inventory_id_or_name: str):
     if not inventory_id_or_name:
         return {"error": "Inventory_ID or name is required"}
 
-    inv_id_candidate = str(inventory_id_or_name).strip().upper()
-    if inv_id_candidate in inventory_ids_set:
-        inv_id = inv_id_candidate
-        method = "Exact Inventory_ID"
-    else:
-        input_clean = normalize_text(inventory_id_or_name.strip())
-        if input_clean in historical_name_to_id:
-            inv_id = str(historical_name_to_id[input_clean])
-            method = "Exact Name (historical)"
-        elif input_clean in master_name_to_id:
-            inv_id = str(master_name_to_id[input_clean])
-            method = "Exact Name (master)"
-        else:
-            match = process.extractOne(input_clean, combined_names_clean, scorer=fuzz.token_sort_ratio)
-            if not match:
-                return {"error": f"Inventory '{inventory_id_or_name}' not found"}
-            match_name, score = match
-            if score >= 55:
-                inv_id = combined_name_to_id.get(match_name)
-                method = f"Fuzzy Name (score={score})"
-            else:
-                return {"error": f"Inventory '{inventory_id_or_name}' not found (best_score={score})"}
-
-    data = fetch_inventory_data(inv_id)
+    matches = (await run_cpu(resources["resolver"].resolve, inventory_id_or_name, top_k=1))["matches"]
+    if not matches:
+        return {"error": f"Inventory '{inventory_id_or_name}' not found"}
+    best = matches[0]
+    if not best["accepted"]:
+        return {"error": f"Inventory '{inventory_id_or_name}' not found (best_score={best['lexical']})"}
+    inv_id, method = best["Inventory_ID"], best["Search_Method"]
+
+    data = await run_db(fetch_inventory_data, inv_id)
     if "error" in data:
         return data
 
@@ -299,9 +218,103 @@ def check_stock(inventory_id_or_name: str):
         "Last_Consumption_7_Days": last_consumption
     }
 
+@mcp.tool
+@limited
+async def scan_low_stock(item_type: str = "", department: str = "", horizon_days: int = 7, limit: int = 50,
+                         include_details: bool = False):
+    """
+    Items below, or forecast to fall below, their minimum stock within ``horizon_days``
+    across the whole catalogue (optionally one item_type / department), most urgent first.
+    One set-based stock query plus one batched forecast for all items; include_details adds
+    each item's full details from one batched query.
+    """
+    result = await run_cpu(lambda: stock_scan.scan_low_stock(
+        resources["xgb_model"], resources["feature_states"], item_type=item_type, department=department,
+        horizon=max(1, min(horizon_days, 90)), limit=max(1, min(limit, 500)),
+        adjust=forecasting.VARIANTS[FORECAST_VARIANT].get("adjust")))
+    if include_details and result["items"]:
+        # One batched details query for every reported item instead of one get_inventory_details each
+        details = await run_db(fetch_inventory_data_many, [item["Inventory_ID"] for item in result["items"]])
+        for item in result["items"]:
+            item["Details"] = details.get(item["Inventory_ID"])
+    return result
+
+@mcp.tool
+@limited
+async def stockout_risk(inventory_id_or_name: str = "", item_type: str = "", department: str = "",
+                        paths: int = 1000, min_probability: float = 0.05, limit: int = 50):
+    """
+    Probability of running out before each item's lead time elapses (Monte Carlo over
+    forecast + historical model residuals), for one item or the catalogue, highest risk first.
+    """
+    item_ids = None
+    if inventory_id_or_name:
+        item_ids = [inv_id for inv_id, _ in await run_cpu(resolve_inventory_ids, inventory_id_or_name)]
+        if not item_ids:
+            return {"error": f"Inventory '{inventory_id_or_name}' not found"}
+        min_probability = 0.0  # a named item is always reported
+    return await run_cpu(lambda: risk_simulation.stockout_risk(
+        resources["xgb_model"], resources["feature_states"], resources["residual_pool"], item_ids=item_ids,
+        item_type=item_type, department=department, paths=max(100, min(paths, 5000)),
+        min_probability=max(0.0, min_probability), limit=max(1, min(limit, 500)),
+        adjust=forecasting.VARIANTS[FORECAST_VARIANT].get("adjust")))
+
+@mcp.tool
+@limited
+async def reorder_plan(item_type: str = "", department: str = "", vendor: str = "",
+                       service_level: float = 0.95, review_days: int = 7, limit: int = 20):
+    """
+    Reorder point, safety stock and order quantity per item for the whole catalogue (optionally
+    one item_type / department / vendor), with the items due for an order grouped into
+    purchase-order drafts per vendor. One set-based query plus one batched forecast.
+    """
+    return await run_cpu(lambda: reorder_planner.reorder_plan(
+        resources["xgb_model"], resources["feature_states"], item_type=item_type, department=department,
+        vendor=vendor, service_level=service_level, review_days=max(0, min(review_days, 60)),
+        limit=max(1, min(limit, 500)), adjust=forecasting.VARIANTS[FORECAST_VARIANT].get("adjust")))
+
+@mcp.tool
+def forecast_cache_stats():
+    """Size and hit/miss counters of the forecast result cache, and how many items the nightly table served."""
+    features = resources.resources["feature_states"]
+    return dict(forecast_cache.stats(), precomputed=precomputed_forecasts.stats(),
+                feature_store=features.get().stats() if features.ready else None)
+
+@mcp.tool
+def resolution_cache_stats():
+    """Size, hit rate and negative ("not found") entries of the query-resolution memo."""
+    return resources["resolver"].stats()
+
+@mcp.tool
+def tool_concurrency_stats():
+    """Worker pool utilisation (db / cpu), per-tool in-flight / queued / rejected calls and coalesced calls."""
+    return dict(tool_pools.stats(), coalescing=singleflight.stats())
+
+@mcp.tool
+def readiness():
+    """Which heavy components are loaded, with per-component load times and the startup mode."""
+    return resources.status()
+
+@mcp.tool
+def catalog_status():
+    """Item counts of the live name catalog and its background hot-reload status."""
+    status = catalog_watcher.stats()
+    if resources.resources["resolver"].ready:  # a status call should not trigger the load
+        status["resolvable_ids"] = len(resources["resolver"].catalog)
+    return status
+
+@mcp.tool
+@limited
+async def resolve_inventory(query: str, top_k: int = 5):
+    """Ranked inventory matches (exact / fuzzy) for a free-text name or ID, with per-stage timings."""
+    return await run_cpu(lambda: resources["resolver"].resolve(query, top_k=max(1, min(top_k, 20))))
+
 # ----------------------------
 # Run MCP
 # ----------------------------
+resources.start()  # eager: load now; warmup: background thread; lazy: on first use
+
 if __name__ == "__main__":
+    catalog_watcher.start()  # picks up new / renamed / deleted items without a restart
     print("🚀 Inventory & Demand MCP running on port 8000...")
     mcp.run(transport="sse", port=8000)
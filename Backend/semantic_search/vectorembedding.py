@@ -1,29 +1,133 @@
+# vectorembedding.py
+# ---------------------------------------
+# Bulk, incremental embedding builder for inventory_master
+# - re-embeds only rows whose item_name hash or embedding model changed
+# - encodes in batches (optionally with a multi-process encode pool)
+# - writes each chunk with COPY into a staging table + one UPDATE ... FROM
+# Usage: python3 semantic_search/vectorembedding.py [--full] [--batch-size 256] [--processes 4]
+# ---------------------------------------
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import time
+
 from sentence_transformers import SentenceTransformer
-import psycopg2
-import numpy as np
-
-# Load model
-model = SentenceTransformer('all-MiniLM-L6-v2')  # produces 384-dim embeddings
-
-conn = psycopg2.connect(
-    host="",        # replace with your host
-    port="",             # replace with your port
-    dbname="",
-    user="",
-    password="" # replace with your password
-)
-cur = conn.cursor()
-
-# Fetch items
-cur.execute("SELECT inventory_id, item_name FROM inventory_master")
-items = cur.fetchall()
-
-for inventory_id, item_name in items:
-    emb = model.encode(item_name).tolist()  # list of floats
-    emb_str = "[" + ",".join(map(str, emb)) + "]"
-    cur.execute("UPDATE inventory_master SET embedding=%s WHERE inventory_id=%s", (emb_str, inventory_id))
-
-conn.commit()
-cur.close()
-conn.close()
-print("✅ Embeddings saved for all items")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # produces 384-dim embeddings
+
+STALE_ROWS_QUERY = """
+    SELECT inventory_id, coalesce(item_name, '')
+    FROM inventory_master
+    WHERE %(full)s
+       OR embedding IS NULL
+       OR embedding_model IS DISTINCT FROM %(model)s
+       OR embedding_name_hash IS DISTINCT FROM md5(coalesce(item_name, ''))
+    ORDER BY inventory_id
+"""
+
+
+def name_hash(name: str) -> str:
+    # Same digest as Postgres md5(text) on a UTF-8 database
+    return hashlib.md5(name.encode("utf-8")).hexdigest()
+
+
+def fetch_stale_rows(model_name: str, full: bool = False):
+    return db.fetch_all(STALE_ROWS_QUERY, {"full": full, "model": model_name})
+
+
+def _copy_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def write_embeddings(rows, vectors, model_name: str):
+    """COPY one chunk into a temp staging table, then apply it with a single UPDATE ... FROM."""
+    buf = io.StringIO()
+    for (inventory_id, item_name), vec in zip(rows, vectors):
+        buf.write(f"{_copy_escape(str(inventory_id))}\t{{{','.join(map(str, vec.tolist()))}}}\t{name_hash(item_name)}\n")
+    buf.seek(0)
+
+    with db.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE embedding_staging (
+                inventory_id text PRIMARY KEY,
+                embedding double precision[],
+                name_hash text
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert("COPY embedding_staging (inventory_id, embedding, name_hash) FROM STDIN", buf)
+        cur.execute("""
+            UPDATE inventory_master m
+            SET embedding = s.embedding,
+                embedding_name_hash = s.name_hash,
+                embedding_model = %s,
+                embedding_updated_at = now()
+            FROM embedding_staging s
+            WHERE m.inventory_id = s.inventory_id
+        """, (model_name,))
+        return cur.rowcount
+
+
+def build_embeddings(model_name: str = MODEL_NAME, batch_size: int = 256, chunk_size: int = 4096,
+                     processes: int = 0, full: bool = False):
+    started = time.perf_counter()
+    rows = fetch_stale_rows(model_name, full)
+    stats = {"rows": len(rows), "updated": 0, "encode_seconds": 0.0, "write_seconds": 0.0}
+    if not rows:
+        stats["total_seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    model = SentenceTransformer(model_name)
+    pool = model.start_multi_process_pool(target_devices=["cpu"] * processes) if processes > 0 else None
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            names = [name for _, name in chunk]
+
+            t0 = time.perf_counter()
+            if pool is not None:
+                vectors = model.encode_multi_process(names, pool, batch_size=batch_size)
+            else:
+                vectors = model.encode(names, batch_size=batch_size, convert_to_numpy=True,
+                                       show_progress_bar=False)
+            t1 = time.perf_counter()
+            stats["updated"] += write_embeddings(chunk, vectors, model_name)
+            t2 = time.perf_counter()
+
+            stats["encode_seconds"] += t1 - t0
+            stats["write_seconds"] += t2 - t1
+            done = start + len(chunk)
+            print(f"  {done}/{len(rows)} rows · {done / (t2 - started):.1f} rows/s")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    total = time.perf_counter() - started
+    stats.update(encode_seconds=round(stats["encode_seconds"], 3),
+                 write_seconds=round(stats["write_seconds"], 3),
+                 total_seconds=round(total, 3),
+                 rows_per_second=round(len(rows) / total, 1))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build inventory_master embeddings incrementally")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=4096, help="rows encoded and written per transaction")
+    parser.add_argument("--processes", type=int, default=0, help="multi-process encode pool size (0 = in-process)")
+    parser.add_argument("--full", action="store_true", help="re-embed every row, not only new/renamed ones")
+    args = parser.parse_args()
+
+    stats = build_embeddings(args.model, args.batch_size, args.chunk_size, args.processes, args.full)
+    if stats["rows"] == 0:
+        print("✅ Embeddings already up to date")
+    else:
+        print(f"✅ Embeddings saved for {stats['updated']} items "
+              f"(encode {stats['encode_seconds']}s, write {stats['write_seconds']}s, "
+              f"{stats['rows_per_second']} rows/s)")
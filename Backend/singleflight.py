@@ -0,0 +1,124 @@
+# singleflight.py
+# ---------------------------------------
+# Request coalescing: concurrent identical calls share one in-flight computation
+# - the first caller for a key runs it, callers arriving while it runs wait and receive
+#   the same result (or exception); nothing is kept once it finishes, so this is not a
+#   cache and never serves anything older than a computation already in progress
+# - do_many() coalesces per key inside batched calls (e.g. forecasts for many items)
+# - every flight counts calls, executions and collapsed calls; stats() reports all of them
+# ---------------------------------------
+
+import threading
+
+_flights = {}
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    def __init__(self, name, copy=None):
+        """``copy``: applied to the shared result for waiting callers (mutable results)."""
+        self.name = name
+        self.copy = copy
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executed = 0
+        self.collapsed = 0
+        self.errors = 0
+        self.peak_waiters = 0
+        _flights[name] = self
+
+    def _join(self, key):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.collapsed += 1
+                self.peak_waiters = max(self.peak_waiters, call.waiters)
+                return call, False
+            call = self._calls[key] = _Call()
+            self.executed += 1
+            return call, True
+
+    def _finish(self, key, call, value=None, error=None):
+        call.value, call.error = value, error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            if error is not None:
+                self.errors += 1
+        call.done.set()
+
+    def _shared(self, call):
+        value = call.result()
+        return self.copy(value) if self.copy is not None else value
+
+    def do(self, key, fn):
+        """``fn()`` once for all concurrent callers with the same ``key``."""
+        call, leader = self._join(key)
+        if not leader:
+            return self._shared(call)
+        try:
+            value = fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, value=value)
+        return value
+
+    def do_many(self, keys, compute):
+        """
+        ``compute(keys) -> {key: value}`` runs once for the keys no one else is computing;
+        keys already in flight are waited on. Returns {key: value} for every key.
+        """
+        led, followed = {}, {}
+        for key in dict.fromkeys(keys):
+            call, leader = self._join(key)
+            (led if leader else followed)[key] = call
+
+        results = {}
+        if led:
+            try:
+                fresh = compute(list(led))
+                for key in led:
+                    results[key] = fresh[key]
+            except BaseException as e:
+                for key, call in led.items():
+                    self._finish(key, call, error=e)
+                raise
+            for key, call in led.items():
+                self._finish(key, call, value=results[key])
+        # Own keys first: waiting before computing could deadlock two overlapping batches
+        for key, call in followed.items():
+            results[key] = self._shared(call)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls,
+                    "executed": self.executed,
+                    "collapsed": self.collapsed,
+                    "collapse_rate": round(self.collapsed / self.calls, 4) if self.calls else 0.0,
+                    "in_flight": len(self._calls),
+                    "peak_waiters": self.peak_waiters,
+                    "errors": self.errors}
+
+
+def stats():
+    return {name: flight.stats() for name, flight in _flights.items()}
@@ -0,0 +1,41 @@
+--
+-- Per-item data version, advanced whenever consumption or inventory_daily rows change.
+-- Used as part of the forecast cache key (forecast_cache.py).
+--
+
+CREATE TABLE IF NOT EXISTS public.inventory_data_version (
+    inventory_id text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 0,
+    updated_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+
+CREATE OR REPLACE FUNCTION public.bump_inventory_data_version() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.inventory_id IS NOT NULL THEN
+        INSERT INTO public.inventory_data_version AS v (inventory_id, version)
+        VALUES (OLD.inventory_id, 1)
+        ON CONFLICT (inventory_id) DO UPDATE SET version = v.version + 1, updated_at = now();
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.inventory_id IS NOT NULL
+       AND (TG_OP = 'INSERT' OR NEW.inventory_id IS DISTINCT FROM OLD.inventory_id) THEN
+        INSERT INTO public.inventory_data_version AS v (inventory_id, version)
+        VALUES (NEW.inventory_id, 1)
+        ON CONFLICT (inventory_id) DO UPDATE SET version = v.version + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+
+DROP TRIGGER IF EXISTS consumption_bump_data_version ON public.consumption;
+CREATE TRIGGER consumption_bump_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON public.consumption
+    FOR EACH ROW EXECUTE FUNCTION public.bump_inventory_data_version();
+
+DROP TRIGGER IF EXISTS inventory_daily_bump_data_version ON public.inventory_daily;
+CREATE TRIGGER inventory_daily_bump_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON public.inventory_daily
+    FOR EACH ROW EXECUTE FUNCTION public.bump_inventory_data_version();
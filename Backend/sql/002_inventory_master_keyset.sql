@@ -0,0 +1,13 @@
+--
+-- Indexes backing /api/inventory: keyset pagination on (item_name, inventory_id)
+-- and case-insensitive name-prefix filtering.
+--
+
+CREATE INDEX IF NOT EXISTS inventory_master_name_id_idx
+    ON public.inventory_master USING btree (item_name, inventory_id);
+
+CREATE INDEX IF NOT EXISTS inventory_master_lower_name_prefix_idx
+    ON public.inventory_master USING btree (lower(item_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS inventory_master_item_type_idx
+    ON public.inventory_master USING btree (item_type);
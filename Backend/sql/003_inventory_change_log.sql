@@ -0,0 +1,61 @@
+--
+-- Change log feeding /api/inventory/changes and the /api/inventory/stream SSE feed.
+-- Every relevant change to inventory_master / inventory_daily appends a row with a
+-- monotonically increasing version and sends NOTIFY inventory_changes.
+--
+
+CREATE TABLE IF NOT EXISTS public.inventory_change_log (
+    version bigserial PRIMARY KEY,
+    inventory_id text NOT NULL,
+    source text NOT NULL,
+    operation text NOT NULL,
+    changed_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS inventory_change_log_item_idx
+    ON public.inventory_change_log USING btree (inventory_id, version);
+
+
+CREATE OR REPLACE FUNCTION public.log_inventory_change() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    changed_id text;
+    new_version bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.inventory_id;
+    ELSE
+        changed_id := NEW.inventory_id;
+    END IF;
+
+    -- Embedding rebuilds are not visible to clients; skip updates that only touch them
+    IF TG_OP = 'UPDATE' AND TG_TABLE_NAME = 'inventory_master'
+       AND (to_jsonb(NEW) - 'embedding') = (to_jsonb(OLD) - 'embedding') THEN
+        RETURN NULL;
+    END IF;
+
+    IF changed_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO public.inventory_change_log (inventory_id, source, operation)
+    VALUES (changed_id, TG_TABLE_NAME, TG_OP)
+    RETURNING version INTO new_version;
+
+    PERFORM pg_notify('inventory_changes',
+                      json_build_object('version', new_version, 'inventory_id', changed_id)::text);
+    RETURN NULL;
+END;
+$$;
+
+
+DROP TRIGGER IF EXISTS inventory_master_log_change ON public.inventory_master;
+CREATE TRIGGER inventory_master_log_change
+    AFTER INSERT OR UPDATE OR DELETE ON public.inventory_master
+    FOR EACH ROW EXECUTE FUNCTION public.log_inventory_change();
+
+DROP TRIGGER IF EXISTS inventory_daily_log_change ON public.inventory_daily;
+CREATE TRIGGER inventory_daily_log_change
+    AFTER INSERT OR UPDATE OR DELETE ON public.inventory_daily
+    FOR EACH ROW EXECUTE FUNCTION public.log_inventory_change();
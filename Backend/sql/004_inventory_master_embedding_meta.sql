@@ -0,0 +1,9 @@
+--
+-- Bookkeeping for the incremental embedding builder (semantic_search/vectorembedding.py):
+-- rows are re-embedded only when the item name hash or the embedding model changes.
+--
+
+ALTER TABLE public.inventory_master
+    ADD COLUMN IF NOT EXISTS embedding_name_hash text,
+    ADD COLUMN IF NOT EXISTS embedding_model text,
+    ADD COLUMN IF NOT EXISTS embedding_updated_at timestamp with time zone;
@@ -0,0 +1,15 @@
+--
+-- pgvector copy of inventory_master.embedding with an HNSW index, used by
+-- vector_index.PgVectorIndex (VECTOR_INDEX=pgvector). The generated column keeps it in
+-- sync with the double precision[] embedding written by vectorembedding.py.
+--
+
+CREATE EXTENSION IF NOT EXISTS vector WITH SCHEMA public;
+
+ALTER TABLE public.inventory_master
+    ADD COLUMN IF NOT EXISTS embedding_vec public.vector(384)
+    GENERATED ALWAYS AS (public.l2_normalize(embedding::public.vector(384))) STORED;
+
+CREATE INDEX IF NOT EXISTS inventory_master_embedding_hnsw_idx
+    ON public.inventory_master USING hnsw (embedding_vec public.vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,11 @@
+--
+-- Cheap change detection for the MCP servers' catalog hot reload (catalog_refresh.py):
+-- latest inventory_master change-log version and latest embedding rebuild.
+--
+
+CREATE INDEX IF NOT EXISTS inventory_change_log_master_version_idx
+    ON public.inventory_change_log USING btree (version)
+    WHERE source = 'inventory_master';
+
+CREATE INDEX IF NOT EXISTS inventory_master_embedding_updated_idx
+    ON public.inventory_master USING btree (embedding_updated_at);
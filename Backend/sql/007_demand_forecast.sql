@@ -0,0 +1,27 @@
+--
+-- Nightly precomputed demand forecasts (forecast_batch.py), served by the MCP tools
+-- through forecast_store.py. One row per (run, variant, item) holding the whole horizon
+-- as the tools return it, so a lookup is a single primary-key read in one partition.
+-- Partitions are per run_date; forecast_batch.py creates them and drops expired ones.
+--
+
+CREATE TABLE IF NOT EXISTS public.demand_forecast (
+    run_date date NOT NULL,
+    variant text NOT NULL,
+    inventory_id text NOT NULL,
+    data_version bigint NOT NULL DEFAULT 0,
+    forecast jsonb NOT NULL,
+    PRIMARY KEY (run_date, variant, inventory_id)
+) PARTITION BY RANGE (run_date);
+
+
+-- A run is published (visible to the MCP tools) once finished_at is set
+CREATE TABLE IF NOT EXISTS public.demand_forecast_run (
+    run_date date NOT NULL,
+    variant text NOT NULL,
+    horizon integer NOT NULL,
+    items integer NOT NULL DEFAULT 0,
+    started_at timestamp with time zone NOT NULL DEFAULT now(),
+    finished_at timestamp with time zone,
+    PRIMARY KEY (variant, run_date)
+);
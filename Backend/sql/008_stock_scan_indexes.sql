@@ -0,0 +1,13 @@
+--
+-- Indexes backing the fleet-wide low-stock scan (stock_scan.py): latest closing stock
+-- per item as one index probe, department limits by item and by department code.
+--
+
+CREATE INDEX IF NOT EXISTS inventory_daily_item_date_idx
+    ON public.inventory_daily USING btree (inventory_id, date DESC) INCLUDE (closing_stock);
+
+CREATE INDEX IF NOT EXISTS inventory_department_mapping_item_idx
+    ON public.inventory_department_mapping USING btree (inventory_id);
+
+CREATE INDEX IF NOT EXISTS inventory_department_mapping_department_idx
+    ON public.inventory_department_mapping USING btree (department_code);
@@ -0,0 +1,159 @@
+--
+-- Forecast feature store (feature_store.py): one row per item and day with the model's
+-- inventory_daily features and consumption lags 1-7, computed with window functions.
+-- Maintained incrementally: statement triggers on inventory_daily record the earliest
+-- changed date per item in inventory_features_dirty, and refresh_inventory_features()
+-- recomputes only those items from that date on (plus a 7-row lookback for the lags).
+--
+
+CREATE TABLE IF NOT EXISTS public.inventory_features (
+    inventory_id text NOT NULL,
+    date date NOT NULL,
+    opening_stock integer,
+    quantity_consumed integer,
+    quantity_restocked integer,
+    closing_stock integer,
+    lead_time_days integer,
+    lag_1 integer,
+    lag_2 integer,
+    lag_3 integer,
+    lag_4 integer,
+    lag_5 integer,
+    lag_6 integer,
+    lag_7 integer,
+    computed_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (inventory_id, date)
+);
+
+
+CREATE TABLE IF NOT EXISTS public.inventory_features_dirty (
+    inventory_id text PRIMARY KEY,
+    from_date date NOT NULL,
+    marked_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+
+CREATE OR REPLACE FUNCTION public.mark_inventory_features_dirty() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.inventory_features_dirty AS f (inventory_id, from_date)
+        SELECT inventory_id, min(date) FROM new_rows
+        WHERE inventory_id IS NOT NULL AND date IS NOT NULL
+        GROUP BY inventory_id
+        ON CONFLICT (inventory_id) DO UPDATE
+        SET from_date = least(f.from_date, EXCLUDED.from_date), marked_at = now();
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.inventory_features_dirty AS f (inventory_id, from_date)
+        SELECT inventory_id, min(date) FROM old_rows
+        WHERE inventory_id IS NOT NULL AND date IS NOT NULL
+        GROUP BY inventory_id
+        ON CONFLICT (inventory_id) DO UPDATE
+        SET from_date = least(f.from_date, EXCLUDED.from_date), marked_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+
+-- Statement-level with transition tables: a bulk daily load marks each item once
+DROP TRIGGER IF EXISTS inventory_daily_features_insert ON public.inventory_daily;
+CREATE TRIGGER inventory_daily_features_insert
+    AFTER INSERT ON public.inventory_daily
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mark_inventory_features_dirty();
+
+DROP TRIGGER IF EXISTS inventory_daily_features_update ON public.inventory_daily;
+CREATE TRIGGER inventory_daily_features_update
+    AFTER UPDATE ON public.inventory_daily
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mark_inventory_features_dirty();
+
+DROP TRIGGER IF EXISTS inventory_daily_features_delete ON public.inventory_daily;
+CREATE TRIGGER inventory_daily_features_delete
+    AFTER DELETE ON public.inventory_daily
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mark_inventory_features_dirty();
+
+
+-- Recompute up to p_limit dirty items (only those in p_items when given); returns the count.
+-- Claimed queue rows are deleted in the same transaction, SKIP LOCKED lets refreshes overlap.
+CREATE OR REPLACE FUNCTION public.refresh_inventory_features(p_items text[] DEFAULT NULL,
+                                                             p_limit integer DEFAULT 5000)
+    RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    claimed_ids text[];
+    claimed_from date[];
+BEGIN
+    WITH claimed AS (
+        DELETE FROM public.inventory_features_dirty d
+        WHERE d.inventory_id IN (
+            SELECT inventory_id FROM public.inventory_features_dirty
+            WHERE p_items IS NULL OR inventory_id = ANY (p_items)
+            ORDER BY from_date
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED)
+        RETURNING d.inventory_id, d.from_date
+    )
+    SELECT array_agg(inventory_id), array_agg(from_date) INTO claimed_ids, claimed_from FROM claimed;
+
+    IF claimed_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM public.inventory_features f
+    USING unnest(claimed_ids, claimed_from) AS c(inventory_id, from_date)
+    WHERE f.inventory_id = c.inventory_id AND f.date >= c.from_date;
+
+    INSERT INTO public.inventory_features
+        (inventory_id, date, opening_stock, quantity_consumed, quantity_restocked, closing_stock,
+         lead_time_days, lag_1, lag_2, lag_3, lag_4, lag_5, lag_6, lag_7)
+    SELECT w.*
+    FROM unnest(claimed_ids, claimed_from) AS c(inventory_id, from_date)
+    CROSS JOIN LATERAL (
+        SELECT x.inventory_id, x.date, x.opening_stock, x.quantity_consumed, x.quantity_restocked,
+               x.closing_stock, x.lead_time_days, x.lag_1, x.lag_2, x.lag_3, x.lag_4, x.lag_5, x.lag_6, x.lag_7
+        FROM (
+            SELECT d.*,
+                   lag(d.quantity_consumed, 1) OVER w AS lag_1,
+                   lag(d.quantity_consumed, 2) OVER w AS lag_2,
+                   lag(d.quantity_consumed, 3) OVER w AS lag_3,
+                   lag(d.quantity_consumed, 4) OVER w AS lag_4,
+                   lag(d.quantity_consumed, 5) OVER w AS lag_5,
+                   lag(d.quantity_consumed, 6) OVER w AS lag_6,
+                   lag(d.quantity_consumed, 7) OVER w AS lag_7
+            FROM (
+                -- one row per day (latest record wins), starting 7 days of history before from_date
+                SELECT DISTINCT ON (date) inventory_id, date, opening_stock, quantity_consumed,
+                       quantity_restocked, closing_stock, lead_time_days
+                FROM public.inventory_daily
+                WHERE inventory_id = c.inventory_id
+                  AND date >= coalesce((SELECT min(p.date) FROM (
+                                            SELECT DISTINCT date FROM public.inventory_daily
+                                            WHERE inventory_id = c.inventory_id AND date < c.from_date
+                                            ORDER BY date DESC
+                                            LIMIT 7) p),
+                                       c.from_date)
+                ORDER BY date, record_id DESC
+            ) d
+            WINDOW w AS (ORDER BY d.date)
+        ) x
+        WHERE x.date >= c.from_date
+    ) w;
+
+    RETURN array_length(claimed_ids, 1);
+END;
+$$;
+
+
+-- Backfill: every item with daily rows starts dirty from the beginning of its history
+-- (drained by `python3 feature_store.py`)
+INSERT INTO public.inventory_features_dirty (inventory_id, from_date)
+SELECT inventory_id, min(date) FROM public.inventory_daily
+WHERE inventory_id IS NOT NULL AND date IS NOT NULL
+GROUP BY inventory_id
+ON CONFLICT (inventory_id) DO NOTHING;
@@ -0,0 +1,7 @@
+--
+-- Index backing the reorder plan (reorder_plan.py): purchases not yet delivered
+-- (finance.delivery_date in the future) count as stock on order.
+--
+
+CREATE INDEX IF NOT EXISTS finance_delivery_date_idx
+    ON public.finance USING btree (delivery_date) INCLUDE (inventory_id, quantity);
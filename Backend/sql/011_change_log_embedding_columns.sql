@@ -0,0 +1,42 @@
+--
+-- Change-log trigger (sql/003) also ignores the embedding bookkeeping columns added
+-- by sql/004 and the pgvector column of sql/005: an incremental re-embed must not append
+-- a change-log row and NOTIFY per item. Replaces the function in place, so databases
+-- that already applied 003 pick it up; the triggers keep pointing at it.
+--
+
+CREATE OR REPLACE FUNCTION public.log_inventory_change() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    changed_id text;
+    new_version bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.inventory_id;
+    ELSE
+        changed_id := NEW.inventory_id;
+    END IF;
+
+    -- Embedding rebuilds are not visible to clients; skip updates that only touch them
+    IF TG_OP = 'UPDATE' AND TG_TABLE_NAME = 'inventory_master'
+       AND (to_jsonb(NEW) - ARRAY['embedding', 'embedding_vec', 'embedding_name_hash',
+                                  'embedding_model', 'embedding_updated_at'])
+         = (to_jsonb(OLD) - ARRAY['embedding', 'embedding_vec', 'embedding_name_hash',
+                                  'embedding_model', 'embedding_updated_at']) THEN
+        RETURN NULL;
+    END IF;
+
+    IF changed_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO public.inventory_change_log (inventory_id, source, operation)
+    VALUES (changed_id, TG_TABLE_NAME, TG_OP)
+    RETURNING version INTO new_version;
+
+    PERFORM pg_notify('inventory_changes',
+                      json_build_object('version', new_version, 'inventory_id', changed_id)::text);
+    RETURN NULL;
+END;
+$$;
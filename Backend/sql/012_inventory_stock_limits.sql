@@ -0,0 +1,21 @@
+--
+-- One definition of an item's stock limits, shared by the forecast feature store
+-- (feature_store.py), the low-stock scan (stock_scan.py) and the reorder plan
+-- (reorder_plan.py): the strictest (largest) department limit from
+-- inventory_department_mapping, otherwise the inventory_master value.
+-- "Below minimum stock" means current stock < min_stock_limit everywhere.
+-- Per-item lookups probe inventory_department_mapping_item_idx (sql/008).
+--
+
+CREATE OR REPLACE VIEW public.inventory_stock_limits AS
+SELECT m.inventory_id,
+       coalesce(lim.min_stock_limit, m.minimum_required) AS min_stock_limit,
+       coalesce(lim.max_capacity, m.maximum_capacity) AS max_capacity,
+       coalesce(lim.lead_time_days, m.lead_time_days) AS lead_time_days
+FROM public.inventory_master m
+LEFT JOIN LATERAL (
+    SELECT max(min_stock_limit) AS min_stock_limit, max(max_capacity) AS max_capacity,
+           max(lead_time_days) AS lead_time_days
+    FROM public.inventory_department_mapping
+    WHERE inventory_id = m.inventory_id
+) lim ON true;
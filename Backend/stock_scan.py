@@ -0,0 +1,131 @@
+# stock_scan.py
+# ---------------------------------------
+# Fleet-wide low-stock scan shared by the MCP servers and GET /api/inventory/low-stock
+# - one set-based query: latest inventory_daily closing stock per item (index-backed
+#   LATERAL probe, sql/008) against min_stock_limit from inventory_stock_limits (sql/012)
+# - one batched forecast rollout for every scanned item (items without history fall
+#   back to inventory_master.avg_daily_consumption)
+# - projected stock, days to min-stock and days to stockout computed as arrays, ranked
+# ---------------------------------------
+
+import time
+
+import numpy as np
+
+import db
+from forecasting import consumption_matrix
+
+# Minimum stock: the item's inventory_stock_limits row (strictest department limit, otherwise
+# inventory_master.minimum_required), the same with or without a department filter
+STOCK_LEVELS_QUERY = """
+    SELECT m.inventory_id, m.item_name, m.item_type,
+           coalesce(d.closing_stock, m.initial_stock, 0) AS current_stock,
+           d.date AS stock_date,
+           coalesce(l.min_stock_limit, 0) AS min_stock_limit,
+           coalesce(m.avg_daily_consumption, 0) AS avg_daily_consumption,
+           coalesce(m.lead_time_days, v.default_lead_time_days) AS lead_time_days
+    FROM inventory_master m
+    LEFT JOIN inventory_stock_limits l ON l.inventory_id = m.inventory_id
+    LEFT JOIN vendor_master v ON v.vendor_id = m.vendor_id
+    LEFT JOIN LATERAL (
+        SELECT closing_stock, date
+        FROM inventory_daily
+        WHERE inventory_id = m.inventory_id
+        ORDER BY date DESC
+        LIMIT 1
+    ) d ON true
+    WHERE (%(item_type)s::text IS NULL OR m.item_type = %(item_type)s)
+      AND (%(department)s::text IS NULL OR EXISTS (
+              SELECT 1 FROM inventory_department_mapping dm
+              WHERE dm.inventory_id = m.inventory_id
+                AND (dm.department_code = %(department)s OR lower(dm.department_name) = lower(%(department)s))))
+      AND (%(item_ids)s::text[] IS NULL OR m.inventory_id = ANY(%(item_ids)s))
+"""
+
+
+def fetch_stock_levels(item_type=None, department=None, item_ids=None):
+    return db.fetch_all(STOCK_LEVELS_QUERY, {"item_type": item_type or None, "department": department or None,
+                                             "item_ids": list(item_ids) if item_ids is not None else None})
+
+
+def _first_day(mask, already):
+    """1-based first day where ``mask`` holds (0 when ``already``), -1 when never within the horizon."""
+    first = np.where(mask.any(axis=1), mask.argmax(axis=1) + 1, -1)
+    return np.where(already, 0, first)
+
+
+def project_stock(current, min_limit, consumption):
+    """Vectorized projection: (projected stock items x days, days to min-stock, days to stockout)."""
+    projected = current[:, None] - np.cumsum(consumption, axis=1)
+    days_to_min = _first_day(projected < min_limit[:, None], current < min_limit)
+    days_to_stockout = _first_day(projected <= 0, current <= 0)
+    return projected, days_to_min, days_to_stockout
+
+
+def scan_low_stock(model, state_index, item_type=None, department=None, horizon: int = 7,
+                   limit: int = 100, include_ok: bool = False, adjust=None):
+    """
+    Items that are below, or are forecast to fall below, their minimum stock within
+    ``horizon`` days; most urgent first (days to min-stock, days to stockout, shortfall).
+    """
+    timings = {}
+    started = last = time.perf_counter()
+
+    def mark(stage):
+        nonlocal last
+        now = time.perf_counter()
+        timings[stage] = round((now - last) * 1000, 3)
+        last = now
+
+    horizon = max(1, int(horizon))
+    rows = fetch_stock_levels(item_type, department)
+    mark("stock_query")
+
+    n = len(rows)
+    item_ids = [str(r[0]) for r in rows]
+    current = np.fromiter((float(r[3]) for r in rows), dtype=np.float64, count=n)
+    min_limit = np.fromiter((float(r[5]) for r in rows), dtype=np.float64, count=n)
+    avg_daily = np.fromiter((float(r[6]) for r in rows), dtype=np.float64, count=n)
+
+    if n:
+        consumption, modeled = consumption_matrix(model, state_index, item_ids, horizon, adjust=adjust)
+        consumption[~modeled] = avg_daily[~modeled, None]
+    else:
+        consumption, modeled = np.zeros((0, horizon)), np.zeros(0, dtype=bool)
+    mark("forecast")
+
+    projected, days_to_min, days_to_stockout = project_stock(current, min_limit, consumption)
+    at_risk = days_to_min >= 0
+    never = horizon + 1
+    order = np.lexsort((current - min_limit,
+                        np.where(days_to_stockout >= 0, days_to_stockout, never),
+                        np.where(at_risk, days_to_min, never)))
+    if not include_ok:
+        order = order[at_risk[order]]
+    order = order[:max(0, int(limit))]
+
+    items = []
+    for i in order:
+        name, kind, stock_date = rows[i][1], rows[i][2], rows[i][4]
+        items.append({"Inventory_ID": item_ids[i],
+                      "Item_Name": name,
+                      "Item_Type": kind,
+                      "Current_Stock": round(float(current[i]), 2),
+                      "Stock_Date": stock_date.isoformat() if stock_date is not None else None,
+                      "Min_Stock_Limit": round(float(min_limit[i]), 2),
+                      "Stock_Warning": bool(current[i] < min_limit[i]),
+                      "Predicted_Consumption": round(float(consumption[i].sum()), 2),
+                      "Projected_Stock": round(float(projected[i, -1]), 2),
+                      "Days_To_Min_Stock": int(days_to_min[i]) if days_to_min[i] >= 0 else None,
+                      "Days_To_Stockout": int(days_to_stockout[i]) if days_to_stockout[i] >= 0 else None,
+                      "Forecast_Source": "model" if modeled[i] else "avg_daily_consumption"})
+    mark("rank")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+
+    return {"horizon_days": horizon,
+            "filters": {"item_type": item_type or None, "department": department or None},
+            "scanned": n,
+            "below_min_now": int((current < min_limit).sum()),
+            "at_risk": int(at_risk.sum()),
+            "items": items,
+            "timings_ms": timings}
@@ -0,0 +1,118 @@
+# test_xgb_inference.py
+# ---------------------------------------
+# TreeEnsemble (xgb_inference.py) against xgboost's own predictor on the shipped model:
+# outputs must be bit-identical, including missing values and values exactly at splits
+# Usage: python3 -m pytest tests/
+# ---------------------------------------
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forecasting
+from xgb_inference import TreeEnsemble
+
+xgboost = pytest.importorskip("xgboost")
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "models", "demand_agent_xgb.json")
+
+
+@pytest.fixture(scope="module")
+def ensemble():
+    return TreeEnsemble.from_json(MODEL_PATH, forecasting.FEATURE_COLUMNS)
+
+
+@pytest.fixture(scope="module")
+def booster():
+    booster = xgboost.Booster()
+    booster.load_model(MODEL_PATH)
+    return booster
+
+
+@pytest.fixture(scope="module")
+def thresholds():
+    """Every split condition of the model, per feature index (float32, as xgboost compares)."""
+    with open(MODEL_PATH) as f:
+        trees = json.load(f)["learner"]["gradient_booster"]["model"]["trees"]
+    splits = {}
+    for tree in trees:
+        for node, feature in enumerate(tree["split_indices"]):
+            if tree["left_children"][node] != -1:
+                splits.setdefault(feature, set()).add(np.float32(tree["split_conditions"][node]))
+    return {feature: np.array(sorted(values), dtype=np.float32) for feature, values in splits.items()}
+
+
+def realistic_rows(n, rng):
+    """Rows in FEATURE_COLUMNS order with the value ranges of the historical CSV."""
+    rows = np.column_stack([
+        rng.uniform(0, 500, n), rng.uniform(0, 500, n), rng.choice([0.0, 0.0, 50.0, 100.0], n),
+        rng.integers(1, 15, n), rng.integers(1, 15, n), rng.uniform(5, 60, n), rng.uniform(200, 800, n),
+        rng.integers(0, 7, n), rng.integers(1, 13, n)] + [rng.uniform(0, 30, n) for _ in range(7)])
+    return rows.astype(np.float32)
+
+
+def booster_predict(booster, X):
+    return booster.predict(xgboost.DMatrix(X, missing=np.nan, feature_names=forecasting.FEATURE_COLUMNS))
+
+
+def assert_identical(ensemble, booster, X):
+    X = np.asarray(X, dtype=np.float32)
+    expected = booster_predict(booster, X)
+    actual = ensemble.predict(X)
+    assert actual.dtype == np.float32
+    assert np.array_equal(actual, expected), f"{int((actual != expected).sum())} of {len(X)} rows differ"
+
+
+def test_realistic_rows(ensemble, booster):
+    assert_identical(ensemble, booster, realistic_rows(1000, np.random.default_rng(0)))
+
+
+def test_single_row(ensemble, booster):
+    row = realistic_rows(1, np.random.default_rng(1))[0]
+    expected = booster_predict(booster, row[None, :])
+    assert np.array_equal(ensemble.predict(row), expected)
+
+
+def test_missing_features(ensemble, booster):
+    rng = np.random.default_rng(2)
+    X = realistic_rows(600, rng)
+    X[rng.random(X.shape) < 0.3] = np.nan        # scattered missing values
+    X[:16] = realistic_rows(16, rng)
+    X[np.arange(16), np.arange(16)] = np.nan      # each feature missing on its own
+    X[16] = np.nan                                # every feature missing
+    assert_identical(ensemble, booster, X)
+
+
+def test_values_at_split_thresholds(ensemble, booster, thresholds):
+    rng = np.random.default_rng(3)
+    rows = []
+    for feature, values in thresholds.items():
+        for value in values:
+            # exactly at the split (goes right), and one float32 step either side
+            for probe in (value, np.nextafter(value, np.float32(-np.inf)), np.nextafter(value, np.float32(np.inf))):
+                row = realistic_rows(1, rng)[0]
+                row[feature] = probe
+                rows.append(row)
+    assert_identical(ensemble, booster, np.array(rows))
+
+
+def test_all_features_at_thresholds(ensemble, booster, thresholds):
+    # Every feature of a row sits on one of its own split values at once
+    rng = np.random.default_rng(4)
+    X = realistic_rows(500, rng)
+    for feature, values in thresholds.items():
+        X[:, feature] = rng.choice(values, len(X))
+    assert_identical(ensemble, booster, X)
+
+
+def test_extreme_values(ensemble, booster):
+    # (xgboost rejects inf in a DMatrix, so the float32 range ends stand in for it)
+    big = np.finfo(np.float32).max
+    X = np.array([np.zeros(16), -np.ones(16), np.full(16, 1e30), np.full(16, -1e30),
+                  np.full(16, big), np.full(16, -big)], dtype=np.float32)
+    assert_identical(ensemble, booster, X)
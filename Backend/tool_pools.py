@@ -0,0 +1,187 @@
+# tool_pools.py
+# ---------------------------------------
+# Async execution for the MCP tools: blocking work runs off the event loop, so one slow
+# call no longer stalls every other SSE session on the server
+# - db pool:  psycopg2 queries (db.py), sized to the connection pool (PGPOOL_MAX) so a
+#             worker never waits for a connection slot
+# - cpu pool: XGBoost / NumPy prediction, SentenceTransformer encode, fuzzy matching
+#             (their native code releases the GIL), MCP_CPU_WORKERS (default: CPU count)
+# - io pool:  outbound HTTP such as the Gmail API, MCP_IO_WORKERS (default 4)
+# - forecasts run on the db pool (version / feature / forecast-store reads) and hand only the
+#   model rollout to the cpu pool with call_cpu(), so slow queries never hold a cpu worker
+# - per-tool concurrency limits: MCP_TOOL_CONCURRENCY (default 8) for every tool,
+#   MCP_TOOL_LIMITS="predict_demand=4,check_stock=16" per tool; calls over the limit
+#   queue for up to MCP_TOOL_QUEUE_TIMEOUT seconds, then fail with a "busy" error
+# ---------------------------------------
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+CPU_WORKERS = int(os.getenv("MCP_CPU_WORKERS", str(os.cpu_count() or 2)))
+IO_WORKERS = int(os.getenv("MCP_IO_WORKERS", "4"))
+TOOL_CONCURRENCY = int(os.getenv("MCP_TOOL_CONCURRENCY", "8"))
+QUEUE_TIMEOUT = float(os.getenv("MCP_TOOL_QUEUE_TIMEOUT", "30"))
+
+
+def parse_limits(spec: str):
+    """'predict_demand=4, check_stock=16' -> {"predict_demand": 4, "check_stock": 16}"""
+    limits = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = max(1, int(value))
+    return limits
+
+# ----------------------------
+# Worker pools
+# ----------------------------
+class WorkerPool:
+    """Bounded thread pool awaited from the event loop; created on first use."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self._executor = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.peak_active = 0
+        self.busy_seconds = 0.0
+
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"mcp-{self.name}")
+        return self._executor
+
+    def _timed(self, fn, args, kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.calls += 1
+                self.busy_seconds += time.perf_counter() - started
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(), self._timed, fn, args, kwargs)
+
+    def call(self, fn, *args, **kwargs):
+        """Blocking run on this pool from another pool's worker (inline on our own workers)."""
+        if threading.current_thread().name.startswith(f"mcp-{self.name}_"):
+            return fn(*args, **kwargs)
+        return self.executor().submit(self._timed, fn, args, kwargs).result()
+
+    def stats(self):
+        return {"workers": self.workers, "active": self.active, "peak_active": self.peak_active,
+                "calls": self.calls, "busy_seconds": round(self.busy_seconds, 3)}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+db_pool = WorkerPool("db", db.POOL_MAX)
+cpu_pool = WorkerPool("cpu", CPU_WORKERS)
+io_pool = WorkerPool("io", IO_WORKERS)
+
+run_db = db_pool.run
+run_cpu = cpu_pool.run
+run_io = io_pool.run
+call_cpu = cpu_pool.call
+
+# ----------------------------
+# Per-tool concurrency limits
+# ----------------------------
+class ToolBusyError(RuntimeError):
+    pass
+
+
+class _ToolSlot:
+    def __init__(self, limit):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queued = 0
+        self.calls = 0
+        self.rejected = 0
+        self.errors = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+
+class ToolLimiter:
+    def __init__(self, default_limit: int = TOOL_CONCURRENCY, limits=None, queue_timeout: float = QUEUE_TIMEOUT):
+        self.default_limit = max(1, default_limit)
+        self.limits = dict(limits or {})
+        self.queue_timeout = queue_timeout
+        self.slots = {}
+
+    def _slot(self, tool):
+        if tool not in self.slots:
+            self.slots[tool] = _ToolSlot(self.limits.get(tool, self.default_limit))
+        return self.slots[tool]
+
+    def __call__(self, fn):
+        """Decorator for an async tool: at most ``limit`` concurrent calls, the rest queue."""
+        tool = fn.__name__
+
+        @functools.wraps(fn)
+        async def limited_tool(*args, **kwargs):
+            slot = self._slot(tool)
+            queued_at = time.perf_counter()
+            slot.queued += 1
+            try:
+                await asyncio.wait_for(slot.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                slot.rejected += 1
+                raise ToolBusyError(f"{tool} is busy ({slot.limit} calls in flight); retry shortly") from None
+            finally:
+                slot.queued -= 1
+            started = time.perf_counter()
+            slot.wait_seconds += started - queued_at
+            slot.in_flight += 1
+            slot.peak_in_flight = max(slot.peak_in_flight, slot.in_flight)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                slot.errors += 1
+                raise
+            finally:
+                slot.in_flight -= 1
+                slot.calls += 1
+                slot.run_seconds += time.perf_counter() - started
+                slot.semaphore.release()
+
+        return limited_tool
+
+    def stats(self):
+        return {tool: {"limit": s.limit, "in_flight": s.in_flight, "peak_in_flight": s.peak_in_flight,
+                       "queued": s.queued, "calls": s.calls, "rejected": s.rejected, "errors": s.errors,
+                       "avg_wait_ms": round(s.wait_seconds / s.calls * 1000, 3) if s.calls else 0.0,
+                       "avg_run_ms": round(s.run_seconds / s.calls * 1000, 3) if s.calls else 0.0}
+                for tool, s in self.slots.items()}
+
+
+limited = ToolLimiter(TOOL_CONCURRENCY, parse_limits(os.getenv("MCP_TOOL_LIMITS", "")))
+
+
+def stats():
+    return {"pools": {p.name: p.stats() for p in (db_pool, cpu_pool, io_pool)},
+            "tools": limited.stats(),
+            "queue_timeout_s": limited.queue_timeout}
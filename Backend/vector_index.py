@@ -0,0 +1,150 @@
+# vector_index.py
+# ---------------------------------------
+# Pluggable vector index behind semantic item resolution
+# - FlatIndex:     exact cosine search over a pre-normalized matrix (small catalogues)
+# - IVFIndex:      in-process inverted-file ANN index (spherical k-means lists)
+# - PgVectorIndex: HNSW index on inventory_master.embedding_vec (sql/005_pgvector_hnsw.sql)
+# All return ranked [(Inventory_ID, cosine_score), ...]
+# ---------------------------------------
+
+import os
+
+import numpy as np
+
+import db
+
+IVF_MIN_ITEMS = int(os.getenv("VECTOR_INDEX_IVF_MIN_ITEMS", "20000"))
+IVF_FORCED_MIN_ITEMS = 64  # below this even a forced IVF index falls back to flat search
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-10)
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class FlatIndex:
+    kind = "flat"
+
+    def __init__(self, ids, matrix):
+        self.ids = list(ids)
+        self.vectors = normalize_rows(matrix) if len(self.ids) else np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k: int = 1):
+        if not self.ids:
+            return []
+        scores = self.vectors @ normalize_rows(query)[0]
+        return [(self.ids[i], float(scores[i])) for i in _top_k(scores, k)]
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are clustered into ``n_lists`` cells with spherical k-means
+    and stored contiguously per cell; a query scores only the ``n_probe`` closest cells.
+    """
+    kind = "ivf"
+
+    def __init__(self, ids, matrix, n_lists: int = None, n_probe: int = None,
+                 iterations: int = 10, seed: int = 0):
+        ids = list(ids)
+        vectors = normalize_rows(matrix)
+        n = len(ids)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = max(1, min(self.n_lists, n_probe or max(8, self.n_lists // 32)))
+
+        if n == 0:  # nothing to cluster: one empty cell, searches return []
+            self.centroids = np.zeros((1, vectors.shape[1]), dtype=np.float32)
+            self.ids, self.vectors, self.offsets = [], vectors, np.zeros(2, dtype=np.int64)
+            return
+        self.centroids = self._train(vectors, iterations, np.random.default_rng(seed))
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind="stable")
+        self.ids = [ids[i] for i in order]
+        self.vectors = vectors[order]
+        self.offsets = np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+
+    def _assign(self, vectors, chunk: int = 8192):
+        out = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            out[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ self.centroids.T, axis=1)
+        return out
+
+    def _train(self, vectors, iterations, rng):
+        sample_size = min(len(vectors), 64 * self.n_lists)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        self.centroids = sample[rng.choice(sample_size, self.n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=self.n_lists) == 0
+            sums[empty] = self.centroids[empty]
+            self.centroids = normalize_rows(sums)
+        return self.centroids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k: int = 1):
+        if not self.ids:
+            return []
+        q = normalize_rows(query)[0]
+        cells = _top_k(self.centroids @ q, self.n_probe)
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+        scores = self.vectors[rows] @ q
+        return [(self.ids[rows[i]], float(scores[i])) for i in _top_k(scores, k)]
+
+
+class PgVectorIndex:
+    """HNSW search on the local Postgres via pgvector; nothing is held in process memory."""
+    kind = "pgvector"
+
+    def __init__(self, ef_search: int = 64):
+        self.ef_search = ef_search
+        (self.size,) = db.fetch_one("SELECT count(*) FROM inventory_master WHERE embedding_vec IS NOT NULL")
+
+    def __len__(self):
+        return self.size
+
+    def search(self, query, k: int = 1):
+        literal = "[" + ",".join(map(str, normalize_rows(query)[0].tolist())) + "]"
+        with db.cursor() as cur:
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (max(self.ef_search, k),))
+            cur.execute("""
+                SELECT inventory_id, 1 - (embedding_vec <=> %s::vector) AS score
+                FROM inventory_master
+                WHERE embedding_vec IS NOT NULL
+                ORDER BY embedding_vec <=> %s::vector
+                LIMIT %s
+            """, (literal, literal, k))
+            return [(str(inv_id), float(score)) for inv_id, score in cur.fetchall()]
+
+
+def build_vector_index(ids, matrix, kind: str = None):
+    """kind: flat | ivf | pgvector | auto (default; VECTOR_INDEX env overrides)."""
+    kind = (kind or os.getenv("VECTOR_INDEX", "auto")).lower()
+    if kind == "pgvector":
+        return PgVectorIndex()
+    if kind == "ivf" and len(ids) < IVF_FORCED_MIN_ITEMS:
+        # Forced IVF on an empty / new catalogue: too few vectors to cluster, exact search is cheaper
+        print(f"⚠️ VECTOR_INDEX=ivf with {len(ids)} vectors (< {IVF_FORCED_MIN_ITEMS}); using the flat index")
+        return FlatIndex(ids, matrix)
+    if kind == "ivf" or (kind == "auto" and len(ids) >= IVF_MIN_ITEMS):
+        return IVFIndex(ids, matrix)
+    return FlatIndex(ids, matrix)
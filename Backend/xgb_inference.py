@@ -0,0 +1,195 @@
+# xgb_inference.py
+# ---------------------------------------
+# NumPy inference for the demand XGBoost model (models/demand_agent_xgb.json)
+# The JSON tree dump is flattened once into node arrays (feature, threshold, children,
+# default direction, leaf value); predict() walks every tree for the whole batch at once.
+# No DataFrame / DMatrix construction, so a single-row forecast step costs microseconds.
+# Predictions are bit-identical to XGBRegressor.predict:
+#   - inputs are cast to float32, NaN is "missing" and follows the default direction
+#   - a row goes left when value < split_condition
+#   - leaves are added to a float32 base_score one tree at a time, in model order
+# Only plain numerical splits with an identity objective are supported; anything else
+# raises ValueError so callers can fall back to xgboost.
+# ---------------------------------------
+
+import json
+import os
+
+import numpy as np
+
+# Objectives whose prediction is the raw margin
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:squaredlogerror", "reg:pseudohubererror",
+                       "reg:absoluteerror", "reg:quantileerror", "reg:linear"}
+MAX_DEPTH = 16  # complete-tree padding grows as 2**depth per tree
+ROW_BLOCK = 128
+# Above this many rows xgboost's compiled predictor is faster than NumPy gathers; when
+# xgboost is installed, load_model() hands such batches to it (same output bits)
+MAX_NUMPY_ROWS = int(os.getenv("XGB_NUMPY_MAX_ROWS", "200"))
+
+
+def _base_score(learner_model_param):
+    raw = learner_model_param["base_score"].strip()
+    if raw.startswith("["):  # xgboost >= 3 stores a per-target vector
+        values = [v for v in raw.strip("[]").split(",") if v.strip()]
+        if len(values) != 1:
+            raise ValueError("Multi-target models are not supported")
+        raw = values[0]
+    return np.float32(float(raw))
+
+
+class TreeEnsemble:
+    """
+    Every tree is padded to a complete binary tree of the ensemble's depth (heap layout:
+    children of node i are 2i+1 / 2i+2), so traversal is pure index arithmetic. A leaf that
+    sits above the bottom level is copied to all bottom-level positions below it.
+    """
+
+    def __init__(self, feature, threshold, default_left, leaf_value, depth, base_score,
+                 n_features, feature_names=None):
+        self.feature = feature            # int32 trees x (2**depth - 1), split feature
+        self.threshold = threshold        # float32 trees x (2**depth - 1), split condition
+        self.default_left = default_left  # bool trees x (2**depth - 1), direction for missing values
+        self.leaf_value = leaf_value      # float32 trees x 2**depth
+        self.depth = depth
+        self.base_score = base_score
+        self.n_features = n_features
+        self.feature_names = feature_names
+        self.large_batch_model = None  # optional XGBRegressor for batches over MAX_NUMPY_ROWS
+        n_trees = len(leaf_value)
+        self._feature = feature.ravel()
+        self._threshold = threshold.ravel()
+        self._default_left = default_left.ravel()
+        self._leaf_value = leaf_value.ravel()
+        self._tree_offset = np.arange(n_trees, dtype=np.int32) * feature.shape[1]
+        self._leaf_offset = np.arange(n_trees, dtype=np.intp) * leaf_value.shape[1] - feature.shape[1]
+
+    def __len__(self):
+        return len(self.leaf_value)
+
+    @classmethod
+    def from_json(cls, path: str, feature_names=None):
+        """Load a model saved with ``XGBRegressor.save_model(path)`` (JSON format)."""
+        with open(path) as f:
+            learner = json.load(f)["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objective {objective} is not supported by xgb_inference")
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise ValueError(f"Booster {booster['name']} is not supported by xgb_inference")
+        if int(learner["learner_model_param"].get("num_class", 0)) > 1:
+            raise ValueError("Multi-class models are not supported by xgb_inference")
+
+        model_features = learner.get("feature_names") or None
+        if feature_names is not None and model_features is not None and list(feature_names) != model_features:
+            raise ValueError(f"Feature order mismatch: model has {model_features}")
+
+        trees = booster["model"]["trees"]
+        best_iteration = learner.get("attributes", {}).get("best_iteration")
+        if best_iteration is not None:  # XGBRegressor.predict stops at the best iteration too
+            per_round = int(booster["model"]["gbtree_model_param"].get("num_parallel_tree", 1))
+            trees = trees[:(int(best_iteration) + 1) * per_round]
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported by xgb_inference")
+
+        depth = max((_tree_depth(tree["left_children"], tree["right_children"]) for tree in trees), default=0)
+        if depth > MAX_DEPTH:
+            raise ValueError(f"Tree depth {depth} exceeds {MAX_DEPTH}")
+        n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+
+        feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+        threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), n_internal), dtype=bool)
+        leaf_value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            stack = [(0, 0, 0)]  # (node id, heap position, level)
+            while stack:
+                node, pos, level = stack.pop()
+                if left[node] == -1:
+                    first = (pos + 1) * 2 ** (depth - level) - 1 - n_internal  # leftmost bottom-level position
+                    leaf_value[t, first:first + 2 ** (depth - level)] = cond[node]
+                    continue
+                feature[t, pos] = tree["split_indices"][node]
+                threshold[t, pos] = cond[node]
+                default_left[t, pos] = bool(tree["default_left"][node])
+                stack.append((left[node], 2 * pos + 1, level + 1))
+                stack.append((right[node], 2 * pos + 2, level + 1))
+
+        return cls(feature, threshold, default_left, leaf_value, depth,
+                   _base_score(learner["learner_model_param"]),
+                   int(learner["learner_model_param"]["num_feature"]), model_features)
+
+    def leaves(self, X):
+        """Bottom-level heap position reached by every row in every tree (rows x trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        if len(X) <= ROW_BLOCK:
+            return self._leaves_block(X)
+        # Row blocks keep the rows x trees temporaries cache-sized
+        return np.concatenate([self._leaves_block(X[start:start + ROW_BLOCK])
+                               for start in range(0, len(X), ROW_BLOCK)])
+
+    def _leaves_block(self, X):
+        flat = X.ravel()
+        row_offset = (np.arange(len(X), dtype=np.int32) * X.shape[1])[:, None]
+        pos = np.zeros((len(X), len(self)), dtype=np.int32)
+        for _ in range(self.depth):
+            node = self._tree_offset + pos
+            value = np.take(flat, np.take(self._feature, node) + row_offset)
+            go_right = ~(value < np.take(self._threshold, node))
+            missing = np.isnan(value)
+            if missing.any():
+                go_right[missing] = ~self._default_left[node[missing]]
+            pos = 2 * pos + 1 + go_right
+        return pos
+
+    def predict(self, X):
+        """float32 predictions for an array shaped rows x features (or a single row)."""
+        if self.large_batch_model is not None and np.ndim(X) == 2 and len(X) > MAX_NUMPY_ROWS:
+            return self.large_batch_model.predict(np.asarray(X, dtype=np.float32))
+        pos = self.leaves(X)
+        contributions = np.empty((len(pos), len(self) + 1), dtype=np.float32)
+        contributions[:, 0] = self.base_score
+        contributions[:, 1:] = self._leaf_value[self._leaf_offset + pos]
+        # cumsum accumulates strictly left to right in float32, like xgboost's per-tree +=
+        # (np.sum would use pairwise summation and drift in the last bits)
+        return np.cumsum(contributions, axis=1, dtype=np.float32)[:, -1]
+
+
+def _tree_depth(left, right):
+    depth, level = 0, [0]
+    while True:
+        level = [node for node in level if left[node] != -1]
+        if not level:
+            return depth
+        level = [child for node in level for child in (left[node], right[node])]
+        depth += 1
+
+
+def load_model(path: str, feature_names=None):
+    """
+    TreeEnsemble for ``path`` (with xgboost attached for large batches when installed),
+    or a plain XGBRegressor when the model uses features the NumPy path does not support.
+    """
+    try:
+        model = TreeEnsemble.from_json(path, feature_names)
+    except ValueError as e:
+        print(f"⚠️ NumPy tree inference unavailable ({e}); using xgboost")
+        from xgboost import XGBRegressor
+        model = XGBRegressor()
+        model.load_model(path)
+        return model
+    try:
+        from xgboost import XGBRegressor
+        model.large_batch_model = XGBRegressor()
+        model.large_batch_model.load_model(path)
+    except ImportError:
+        pass
+    return model